@@ -52,6 +52,12 @@ class OutgoingMessage:
 class ChannelAdapter(ABC):
     """Channelアダプター基底クラス"""
     
+    CHANNEL_TYPE: str = ""  # "line", "telegram" など（サブクラスで設定）
+    
+    def channel_name(self) -> str:
+        """チャネル名（NormalizedMessage.channel_type と同じ値）"""
+        return self.CHANNEL_TYPE
+    
     @abstractmethod
     async def handle_webhook(self, request: dict) -> dict:
         """Webhook受信処理"""
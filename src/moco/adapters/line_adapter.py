@@ -12,6 +12,7 @@ logger = logging.getLogger(__name__)
 class LINEAdapter(ChannelAdapter):
     """LINE Messaging API 用のアダプター"""
     
+    CHANNEL_TYPE = "line"
     API_BASE = "https://api.line.me/v2/bot"
     DATA_BASE = "https://api-data.line.me/v2/bot"
     
@@ -82,7 +83,7 @@ class LINEAdapter(ChannelAdapter):
             
             normalized = NormalizedMessage(
                 message_id=msg.get("id"),
-                channel_type="line",
+                channel_type=self.CHANNEL_TYPE,
                 sender_id=sender_id,
                 sender_name="LINE User", # プロフィール取得が必要なら別途実装
                 conversation_id=group_id if is_group else sender_id,
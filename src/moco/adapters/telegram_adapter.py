@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 class TelegramAdapter(ChannelAdapter):
     """Telegram Bot API 用のアダプター"""
     
+    CHANNEL_TYPE = "telegram"
     API_BASE = "https://api.telegram.org/bot"
     
     def __init__(self, bot_token: str):
@@ -83,7 +84,7 @@ class TelegramAdapter(ChannelAdapter):
             
         normalized = NormalizedMessage(
             message_id=message_id,
-            channel_type="telegram",
+            channel_type=self.CHANNEL_TYPE,
             sender_id=sender_id,
             sender_name=sender_name,
             conversation_id=chat_id,
@@ -50,6 +50,9 @@ def init_environment():
     env_path = find_dotenv(usecwd=True) or (Path(__file__).parent.parent.parent / ".env")
     if env_path:
         load_dotenv(env_path, override=True)
+        # キャッシュ済みの設定を読み直した環境変数に合わせる
+        from .config import reload_settings
+        reload_settings()
 
 
 def resolve_provider(provider_str: str, model: Optional[str] = None) -> tuple:
@@ -0,0 +1,72 @@
+"""
+環境変数から読み込む設定
+
+ホットパス（ツール呼び出し・通知送信）で毎回 os.environ を引かないよう、
+初回アクセス時に読み込んだ値をプロセス内で使い回す。
+.env を読み直した場合は reload_settings() を呼ぶこと。
+"""
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# /api/file で返すファイルの上限サイズの既定値（バイト）
+DEFAULT_MAX_FILE_CONTENT_SIZE = 10 * 1024 * 1024
+
+
+def _int_env(name: str, default: int) -> int:
+    """整数の環境変数を読む（未設定・不正値なら既定値）"""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={value!r}; using {default}")
+        return default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """環境変数のスナップショット"""
+    genai_api_key: Optional[str] = None
+    openai_api_key: Optional[str] = None
+    openrouter_api_key: Optional[str] = None
+    line_channel_access_token: Optional[str] = None
+    line_channel_secret: Optional[str] = None
+    line_user_id: Optional[str] = None
+    telegram_bot_token: Optional[str] = None
+    telegram_chat_id: Optional[str] = None
+    # /api/file の上限サイズ（バイト）。0 以下で無制限
+    max_file_content_size: int = DEFAULT_MAX_FILE_CONTENT_SIZE
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """現在の環境変数から生成"""
+        env = os.environ
+        return cls(
+            genai_api_key=env.get("GENAI_API_KEY") or env.get("GEMINI_API_KEY") or env.get("GOOGLE_API_KEY"),
+            openai_api_key=env.get("OPENAI_API_KEY"),
+            openrouter_api_key=env.get("OPENROUTER_API_KEY"),
+            line_channel_access_token=env.get("LINE_CHANNEL_ACCESS_TOKEN"),
+            line_channel_secret=env.get("LINE_CHANNEL_SECRET"),
+            line_user_id=env.get("LINE_USER_ID"),
+            telegram_bot_token=env.get("TELEGRAM_BOT_TOKEN"),
+            telegram_chat_id=env.get("TELEGRAM_CHAT_ID"),
+            max_file_content_size=_int_env("MOCO_MAX_FILE_CONTENT_SIZE", DEFAULT_MAX_FILE_CONTENT_SIZE),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """キャッシュ済みの設定を取得"""
+    return Settings.from_env()
+
+
+def reload_settings() -> Settings:
+    """環境変数を読み直して設定を更新（.env の再読み込み後やテスト用）"""
+    get_settings.cache_clear()
+    return get_settings()
@@ -177,6 +177,7 @@ class QualityTracker:
 
             # インデックス作成
             conn.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON metrics(timestamp)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_session ON metrics(session_id)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_profile ON metrics(profile)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_depth ON metrics(depth)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_task_type ON metrics(task_type)')
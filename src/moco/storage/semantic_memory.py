@@ -4,7 +4,7 @@ import json
 import logging
 import numpy as np
 import faiss
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -18,6 +18,38 @@ except ImportError:
     GENAI_AVAILABLE = False
 
 DEFAULT_EMBEDDING_MODEL = "gemini-embedding-001"
+# embed_content に一度に渡すテキスト数の上限（Gemini の batch 上限）
+EMBED_BATCH_SIZE = 100
+
+def _get_genai_client():
+    api_key = (
+        os.environ.get("GENAI_API_KEY") or
+        os.environ.get("GEMINI_API_KEY") or
+        os.environ.get("GOOGLE_API_KEY")
+    )
+    if not api_key:
+        raise ValueError("Gemini API key not found in environment variables.")
+    return genai.Client(api_key=api_key)
+
+
+def embed_texts(texts: List[str], model: str = DEFAULT_EMBEDDING_MODEL) -> np.ndarray:
+    """Embed texts with Gemini, EMBED_BATCH_SIZE texts per API request.
+
+    Returns a float32 matrix with one row per text.
+    """
+    if not GENAI_AVAILABLE:
+        raise RuntimeError("google-genai library is not installed.")
+
+    client = _get_genai_client()
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        response = client.models.embed_content(
+            model=model,
+            contents=texts[start:start + EMBED_BATCH_SIZE]
+        )
+        vectors.extend(e.values for e in response.embeddings)
+    return np.array(vectors).astype('float32')
+
 
 class SemanticMemory:
     """
@@ -29,22 +61,26 @@ class SemanticMemory:
         self.db_path = db_path
         self.embedding_model = embedding_model
         self.dimension = 768  # text-embedding-004 dimension
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = self._new_index()
         self.doc_ids = []  # List to map index position to doc_id
         
         # Initialize DB and load existing data
         self._init_db()
         self._load_all_documents()
 
+    def _new_index(self):
+        """Create an empty inner-product index (vectors are L2-normalized before use)."""
+        return faiss.IndexFlatIP(self.dimension)
+
+    @staticmethod
+    def _normalized(vectors) -> np.ndarray:
+        """Return vectors as a contiguous float32 matrix with unit-length rows."""
+        matrix = np.array(vectors, dtype='float32', ndmin=2)
+        faiss.normalize_L2(matrix)
+        return matrix
+
     def _get_client(self):
-        api_key = (
-            os.environ.get("GENAI_API_KEY") or
-            os.environ.get("GEMINI_API_KEY") or
-            os.environ.get("GOOGLE_API_KEY")
-        )
-        if not api_key:
-            raise ValueError("Gemini API key not found in environment variables.")
-        return genai.Client(api_key=api_key)
+        return _get_genai_client()
 
     def _init_db(self):
         """Initialize SQLite table for documents."""
@@ -87,7 +123,7 @@ class SemanticMemory:
                     logger.warning(f"Embedding dimension mismatch for {doc_id}: {emb.shape[0]}")
 
             if embeddings:
-                self.index.add(np.array(embeddings).astype('float32'))
+                self.index.add(self._normalized(embeddings))
                 logger.info(f"Loaded {len(embeddings)} documents into semantic memory.")
         except Exception as e:
             logger.error(f"Failed to load documents into semantic memory: {e}")
@@ -106,6 +142,44 @@ class SemanticMemory:
         embedding = response.embeddings[0].values
         return np.array(embedding).astype('float32')
 
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Get embeddings for many texts, EMBED_BATCH_SIZE texts per API request."""
+        return embed_texts(texts, model=self.embedding_model)
+
+    def add_documents_batch(self, docs: List[Tuple[str, str, Optional[Dict[str, Any]]]]):
+        """Add many (doc_id, content, metadata) documents with batched embedding requests."""
+        if not docs:
+            return
+        try:
+            embeddings = self._get_embeddings([content for _, content, _ in docs])
+            if len(embeddings) != len(docs):
+                raise ValueError(f"Expected {len(docs)} embeddings, got {len(embeddings)}")
+
+            now = datetime.now().isoformat()
+            rows = [
+                (doc_id, content, json.dumps(metadata or {}, ensure_ascii=False),
+                 embedding.tobytes(), now)
+                for (doc_id, content, metadata), embedding in zip(docs, embeddings)
+            ]
+
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR REPLACE INTO semantic_documents (doc_id, content, metadata, embedding, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+            conn.close()
+
+            # Update in-memory index in one shot
+            self.index.add(self._normalized(embeddings))
+            self.doc_ids.extend(doc_id for doc_id, _, _ in docs)
+
+            logger.info(f"Added {len(docs)} documents to semantic memory.")
+        except Exception as e:
+            logger.error(f"Failed to add {len(docs)} documents: {e}")
+            raise e
+
     def add_document(self, doc_id: str, content: str, metadata: Optional[Dict[str, Any]] = None):
         """Add a document to semantic memory."""
         try:
@@ -127,7 +201,7 @@ class SemanticMemory:
             conn.close()
             
             # Update in-memory index
-            self.index.add(np.array([embedding]))
+            self.index.add(self._normalized([embedding]))
             self.doc_ids.append(doc_id)
             
             logger.info(f"Added document {doc_id} to semantic memory.")
@@ -160,40 +234,57 @@ class SemanticMemory:
             return False
 
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents."""
+        """Search for similar documents.
+
+        'score' is the squared L2 distance between the normalized vectors
+        (2 - 2 * cosine similarity), so lower is more similar.
+        """
         if self.index.ntotal == 0:
             return []
+        results = self.search_batch([query], top_k=top_k)
+        return results[0] if results else []
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one embedding request and one FAISS search.
+
+        Returns one result list per query, in the same order as queries.
+        """
+        if self.index.ntotal == 0 or not queries:
+            return [[] for _ in queries]
             
         try:
-            query_embedding = self._get_embedding(query)
+            query_embeddings = self._normalized(self._get_embeddings(list(queries)))
             
-            # Search FAISS
-            distances, indices = self.index.search(np.array([query_embedding]), top_k)
+            # Search FAISS (inner product of unit vectors = cosine similarity)
+            similarities, indices = self.index.search(query_embeddings, top_k)
             
-            results = []
+            all_results = []
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            for i, idx in enumerate(indices[0]):
-                if idx == -1:
-                    continue
-                
-                doc_id = self.doc_ids[idx]
-                cursor.execute("SELECT doc_id, content, metadata FROM semantic_documents WHERE doc_id = ?", (doc_id,))
-                row = cursor.fetchone()
-                
-                if row:
-                    res = dict(row)
-                    res['score'] = float(distances[0][i])
-                    res['metadata'] = json.loads(res['metadata'])
-                    results.append(res)
+            for q_sims, q_indices in zip(similarities, indices):
+                results = []
+                for sim, idx in zip(q_sims, q_indices):
+                    if idx == -1 or idx >= len(self.doc_ids):
+                        continue
+                    
+                    doc_id = self.doc_ids[idx]
+                    cursor.execute("SELECT doc_id, content, metadata FROM semantic_documents WHERE doc_id = ?", (doc_id,))
+                    row = cursor.fetchone()
+                    
+                    if row:
+                        res = dict(row)
+                        res['score'] = max(0.0, 2.0 - 2.0 * float(sim))
+                        res['metadata'] = json.loads(res['metadata'])
+                        results.append(res)
+                all_results.append(results)
             
             conn.close()
-            return results
+            return all_results
         except Exception as e:
             logger.error(f"Search failed: {e}")
-            return []
+            return [[] for _ in queries]
 
     def clear(self):
         """Clear all documents."""
@@ -204,7 +295,7 @@ class SemanticMemory:
             conn.commit()
             conn.close()
             
-            self.index = faiss.IndexFlatL2(self.dimension)
+            self.index = self._new_index()
             self.doc_ids = []
             logger.info("Cleared semantic memory.")
         except Exception as e:
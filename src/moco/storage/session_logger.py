@@ -173,16 +173,69 @@ class ContextHealthMonitor:
         }
 
 
+class _DepthRLock:
+    """RLock that knows how deeply the current thread holds it."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    @property
+    def depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._local.depth = self.depth + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._local.depth -= 1
+        self._lock.release()
+
+
+class _ReusableConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() only resets it for the next user.
+
+    Used by SessionLogger(persistent_connection=True): callers keep their
+    usual open/close pattern while the underlying connection (and sqlite3's
+    prepared statement cache) stays open for the thread. It is lent to one
+    caller at a time; see SessionLogger._get_connection for nested use.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked_out = False
+        self.borrow_depth = 0  # 貸し出した時点の SessionLogger._lock の保持深さ
+
+    def close(self):
+        # close() と同様に未確定の変更は破棄し、呼び出し側が変えた状態を戻す
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+        self.checked_out = False
+
+    def really_close(self):
+        super().close()
+
+
 class SessionLogger:
     """
     Logger for persisting session history to SQLite.
     Supports rolling summarization for long sessions.
+
+    With persistent_connection=True, one connection per thread is kept open
+    and reused instead of connecting for every operation.
     """
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, persistent_connection: bool = False):
         self.db_path = db_path or _get_default_db_path()
-        self._lock = threading.RLock()
+        self.persistent_connection = persistent_connection
+        self._local = threading.local()  # スレッドごとの使い回し接続
+        self._lock = _DepthRLock()
         self.context_monitor = ContextHealthMonitor()
+        # sessions.parent_session_id（生成カラム）が使えるか（_init_db で判定）
+        self._has_parent_column = False
         # Transcript directory (same parent as db)
         self.transcript_dir = Path(self.db_path).parent / "transcripts"
         try:
@@ -226,8 +279,37 @@ class SessionLogger:
         except Exception as e:
             logger.debug(f"Failed to append to transcript: {e}")
 
+    def _is_nested_borrow(self) -> bool:
+        """使い回し接続が、同じスレッドで実行中の外側のメソッドに貸し出し中か。
+
+        メソッドは self._lock の内側で接続を借りるため、貸し出した時点より深い位置からの要求は入れ子。
+        同じ深さ以下なら借り手はもう抜けている（例外で close() されなかった）とみなす。
+        """
+        conn = getattr(self._local, "conn", None)
+        return conn is not None and conn.checked_out and 0 < conn.borrow_depth < self._lock.depth
+
     def _get_connection(self, timeout: float = 10.0) -> sqlite3.Connection:
         """データベース接続を取得し、PRAGMAを設定する。"""
+        # 入れ子の場合は外側のトランザクションを巻き戻さないよう、使い回さない通常の接続を使う
+        if self.persistent_connection and not self._is_nested_borrow():
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                # 例外で close() されなかった前回のトランザクションを破棄
+                conn.close()
+                conn.checked_out, conn.borrow_depth = True, self._lock.depth
+                return conn
+
+            conn = sqlite3.connect(self.db_path, timeout=timeout, factory=_ReusableConnection)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode = WAL")
+            # 長寿命の接続なのでキャッシュ等の設定が活きる
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -64000")
+            conn.checked_out, conn.borrow_depth = True, self._lock.depth
+            self._local.conn = conn
+            return conn
+
         conn = sqlite3.connect(self.db_path, timeout=timeout)
         conn.execute("PRAGMA foreign_keys = ON")
         conn.execute("PRAGMA journal_mode = WAL")
@@ -260,6 +342,28 @@ class SessionLogger:
                 if "duplicate column name" not in str(e):
                     raise
 
+            # metadata.parent_session_id を生成カラムとして公開し、インデックスを張る
+            # （サブセッション検索で metadata の LIKE 全件スキャンを避ける）
+            try:
+                cursor.execute("""
+                    ALTER TABLE sessions ADD COLUMN parent_session_id TEXT
+                    GENERATED ALWAYS AS (
+                        CASE WHEN json_valid(metadata)
+                        THEN json_extract(metadata, '$.parent_session_id') END
+                    ) VIRTUAL
+                """)
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    # 古い SQLite（生成カラム / JSON1 非対応）では LIKE 検索にフォールバック
+                    logger.debug(f"parent_session_id column unavailable: {e}")
+            try:
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_sessions_parent ON sessions(parent_session_id)"
+                )
+                self._has_parent_column = True
+            except sqlite3.OperationalError as e:
+                logger.debug(f"parent_session_id index unavailable: {e}")
 
             # Session Events table
             cursor.execute("""
@@ -769,35 +873,36 @@ class SessionLogger:
         try:
             with self._lock:
                 conn = self._get_connection()
-                cursor = conn.cursor()
+                try:
+                    cursor = conn.cursor()
 
-                # Delete existing todos for this session
-                cursor.execute("DELETE FROM todos WHERE session_id = ?", (session_id,))
+                    # Delete existing todos for this session
+                    cursor.execute("DELETE FROM todos WHERE session_id = ?", (session_id,))
 
-                # Insert or replace todos
-                now = datetime.now().isoformat()
-                for todo in todos:
-                    # セッション固有のIDを生成（session_id + todo_id）
-                    unique_id = f"{session_id}-{todo.get('id', 'unknown')}"
-                    # NOT NULL制約対策: デフォルト値を設定
-                    content = todo.get("content") or "(no content)"
-                    status = todo.get("status") or "pending"
-                    priority = todo.get("priority") or "medium"
-                    cursor.execute("""
+                    # Insert or replace todos（同一トランザクション内で一括挿入）
+                    now = datetime.now().isoformat()
+                    cursor.executemany("""
                         INSERT OR REPLACE INTO todos (id, session_id, content, status, priority, created_at, updated_at)
                         VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        unique_id,
-                        session_id,
-                        content,
-                        status,
-                        priority,
-                        now,
-                        now
-                    ))
-
-                conn.commit()
-                conn.close()
+                    """, [
+                        (
+                            # セッション固有のIDを生成（session_id + todo_id）
+                            f"{session_id}-{todo.get('id', 'unknown')}",
+                            session_id,
+                            # NOT NULL制約対策: デフォルト値を設定
+                            todo.get("content") or "(no content)",
+                            todo.get("status") or "pending",
+                            todo.get("priority") or "medium",
+                            now,
+                            now
+                        )
+                        for todo in todos
+                    ])
+
+                    conn.commit()
+                finally:
+                    # 失敗時も接続を閉じ、未確定の書き込みトランザクション（ロック）を解放する
+                    conn.close()
         except Exception as e:
             logger.error(f"Failed to save todos: {e}")
             raise e
@@ -825,6 +930,73 @@ class SessionLogger:
             logger.error(f"Failed to get todos: {e}")
             return []
 
+    def get_parent_session_id(self, session_id: str) -> Optional[str]:
+        """Get the parent session ID of a sub-session (None for top-level sessions)."""
+        column = "parent_session_id" if self._has_parent_column else "metadata"
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                row = conn.execute(
+                    f"SELECT {column} FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+            finally:
+                conn.close()
+
+        if not row or not row[0]:
+            return None
+        if self._has_parent_column:
+            return row[0]
+        try:
+            return json.loads(row[0]).get("parent_session_id")
+        except (ValueError, AttributeError):
+            return None
+
+    def get_sub_session_todos(self, parent_session_id: str) -> List[Dict[str, Any]]:
+        """Get the sub-sessions of a session together with their todo lists.
+
+        Uses a single query (sessions LEFT JOIN todos). Returns
+        [{"session_id", "title", "todos": [...]}] ordered by session creation.
+        """
+        if self._has_parent_column:
+            where = "s.parent_session_id = ?"
+            param = parent_session_id
+        else:
+            where = "s.metadata LIKE ?"
+            param = f'%"parent_session_id": "{parent_session_id}"%'
+
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT s.session_id, s.title, t.id, t.content, t.status, t.priority
+                    FROM sessions s
+                    LEFT JOIN todos t ON t.session_id = s.session_id
+                    WHERE {where}
+                    ORDER BY s.created_at, s.session_id, t.created_at, t.rowid
+                """, (param,))
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+
+        sub_sessions: Dict[str, Dict[str, Any]] = {}
+        for session_id, title, todo_id, content, status, priority in rows:
+            entry = sub_sessions.get(session_id)
+            if entry is None:
+                entry = sub_sessions[session_id] = {
+                    "session_id": session_id,
+                    "title": title,
+                    "todos": [],
+                }
+            if todo_id is not None:
+                entry["todos"].append({
+                    "id": todo_id,
+                    "content": content,
+                    "status": status,
+                    "priority": priority,
+                })
+        return list(sub_sessions.values())
+
     def clear_summary(self, session_id: str):
         """Clear the rolling summary for a session."""
         try:
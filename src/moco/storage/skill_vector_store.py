@@ -0,0 +1,193 @@
+"""Qdrant-backed vector store for skill search.
+
+Skills live in a dedicated ``moco_skills`` collection, one point per skill.
+Point ids are deterministic UUIDv5 values derived from the registry and skill
+name, and each payload carries a hash of the embedded text, so a sync only
+embeds and upserts skills that are new or whose text changed.
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+    QDRANT_AVAILABLE = True
+except ImportError:
+    QdrantClient = None
+    qmodels = None
+    QDRANT_AVAILABLE = False
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+SKILLS_COLLECTION = "moco_skills"
+DEFAULT_QDRANT_URL = "http://localhost:6333"
+
+# UUIDv5 の名前空間（同じスキルは常に同じ point id になり、再同期しても冪等）
+_SKILL_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "moco:skills")
+
+
+def content_hash(text: str) -> str:
+    """Hash of the embedded text (BLAKE3 if installed, otherwise BLAKE2b)."""
+    data = text.encode("utf-8")
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+def skill_point_id(registry: str, skill_name: str) -> str:
+    """Deterministic point id for a skill."""
+    return str(uuid.uuid5(_SKILL_NAMESPACE, f"{registry}/{skill_name}"))
+
+
+class QdrantSkillStore:
+    """Skill embeddings stored in Qdrant with delta upserts and native ANN search."""
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], "object"],
+        url: Optional[str] = None,
+        collection: str = SKILLS_COLLECTION,
+    ):
+        """
+        Args:
+            embed: Function mapping a list of texts to a matrix of embeddings
+                (one row per text), e.g. semantic_memory.embed_texts.
+            url: Qdrant URL. Defaults to $QDRANT_URL or http://localhost:6333.
+            collection: Collection name.
+        """
+        if not QDRANT_AVAILABLE:
+            raise RuntimeError("qdrant-client library is not installed.")
+
+        self.embed = embed
+        self.collection = collection
+        self.client = QdrantClient(
+            url=url or os.environ.get("QDRANT_URL", DEFAULT_QDRANT_URL),
+            api_key=os.environ.get("QDRANT_API_KEY"),
+            timeout=5,
+        )
+
+    def _ensure_collection(self, dimension: int) -> None:
+        if self.client.collection_exists(self.collection):
+            return
+        self.client.create_collection(
+            collection_name=self.collection,
+            vectors_config=qmodels.VectorParams(size=dimension, distance=qmodels.Distance.COSINE),
+        )
+
+    def _existing_hashes(self, registry: str) -> Dict[str, str]:
+        """Scroll all points of a registry and return {skill_name: content_hash}."""
+        hashes: Dict[str, str] = {}
+        if not self.client.collection_exists(self.collection):
+            return hashes
+
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=self._registry_filter(registry),
+                with_payload=["skill_name", "content_hash"],
+                with_vectors=False,
+                limit=256,
+                offset=offset,
+            )
+            for point in points:
+                payload = point.payload or {}
+                if payload.get("skill_name"):
+                    hashes[payload["skill_name"]] = payload.get("content_hash", "")
+            if offset is None:
+                return hashes
+
+    @staticmethod
+    def _registry_filter(registry: str):
+        return qmodels.Filter(must=[
+            qmodels.FieldCondition(key="registry", match=qmodels.MatchValue(value=registry))
+        ])
+
+    def sync(self, registry: str, texts: Dict[str, str]) -> int:
+        """Make the collection match {skill_name: text} for a registry.
+
+        Only skills whose text hash changed (or that are new) are embedded and
+        upserted; skills no longer present are deleted.
+
+        Returns:
+            Number of skills (re-)embedded.
+        """
+        existing = self._existing_hashes(registry)
+
+        hashes = {name: content_hash(text) for name, text in texts.items()}
+        delta = [name for name, h in hashes.items() if existing.get(name) != h]
+        stale = [name for name in existing if name not in texts]
+
+        if stale:
+            self.client.delete(
+                collection_name=self.collection,
+                points_selector=qmodels.PointIdsList(
+                    points=[skill_point_id(registry, name) for name in stale]
+                ),
+            )
+
+        if delta:
+            vectors = self.embed([texts[name] for name in delta])
+            self._ensure_collection(len(vectors[0]))
+            self.client.upsert(
+                collection_name=self.collection,
+                points=[
+                    qmodels.PointStruct(
+                        id=skill_point_id(registry, name),
+                        vector=[float(x) for x in vector],
+                        payload={
+                            "skill_name": name,
+                            "registry": registry,
+                            "content_hash": hashes[name],
+                        },
+                    )
+                    for name, vector in zip(delta, vectors)
+                ],
+            )
+            logger.info(f"Skill vector store synced for {registry}: {len(delta)} upserted, {len(stale)} removed")
+
+        return len(delta)
+
+    def search(self, registry: str, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Return [(skill_name, cosine_similarity)] for the query, best first."""
+        return self.search_batch(registry, [query], top_k=top_k)[0]
+
+    def search_batch(
+        self, registry: str, queries: List[str], top_k: int = 5
+    ) -> List[List[Tuple[str, float]]]:
+        """Search several queries with one embedding request and one batched query.
+
+        Returns one [(skill_name, cosine_similarity)] list per query, best first.
+        """
+        if not queries:
+            return []
+        vectors = self.embed(list(queries))
+        responses = self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=[
+                qmodels.QueryRequest(
+                    query=[float(x) for x in vector],
+                    filter=self._registry_filter(registry),
+                    limit=top_k,
+                    with_payload=True,
+                )
+                for vector in vectors
+            ],
+        )
+        return [
+            [
+                (hit.payload["skill_name"], float(hit.score))
+                for hit in response.points
+                if hit.payload and hit.payload.get("skill_name")
+            ]
+            for response in responses
+        ]
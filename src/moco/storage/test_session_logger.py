@@ -0,0 +1,76 @@
+"""
+SessionLogger の接続使い回し（persistent_connection）のテスト
+
+moco/storage/session_logger.py の _get_connection / _ReusableConnection のテスト
+- 同じスレッドで入れ子に接続を使っても外側のトランザクションが巻き戻らないこと
+- close() されなかった接続は次の呼び出しで未確定の変更を破棄して使い回すこと
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from moco.storage.session_logger import SessionLogger
+
+
+class TestPersistentConnection:
+    """persistent_connection=True の SessionLogger"""
+
+    @pytest.fixture
+    def session_logger(self, tmp_path):
+        lg = SessionLogger(db_path=str(tmp_path / "sessions.db"), persistent_connection=True)
+        yield lg
+        conn = getattr(lg._local, "conn", None)
+        if conn is not None:
+            conn.really_close()
+
+    def test_connection_is_reused(self, session_logger):
+        """同じスレッドでは同じ接続を使い回す"""
+        first = session_logger._get_connection()
+        first.close()
+        second = session_logger._get_connection()
+        second.close()
+
+        assert first is second
+        assert not first.checked_out
+
+    def test_nested_use_keeps_outer_transaction(self, session_logger):
+        """入れ子の呼び出しは別接続を使い、外側の書き込みを巻き戻さない"""
+        session_id = session_logger.create_session(title="outer")
+
+        with session_logger._lock:
+            outer = session_logger._get_connection()
+            outer.execute("UPDATE sessions SET title = 'changed' WHERE session_id = ?", (session_id,))
+            # 入れ子で別メソッドを呼ぶ（読み取りのみ）
+            session_logger.get_todos(session_id)
+            assert outer.in_transaction
+            outer.commit()
+            outer.close()
+
+        assert session_logger.get_session(session_id)["title"] == "changed"
+
+    def test_unclosed_connection_is_reset(self, session_logger):
+        """close() されずに抜けた接続は、次の呼び出しで未確定の変更を破棄して使い回す"""
+        session_id = session_logger.create_session(title="before")
+
+        with session_logger._lock:
+            leaked = session_logger._get_connection()
+            leaked.execute("UPDATE sessions SET title = 'after' WHERE session_id = ?", (session_id,))
+
+        assert session_logger.get_session(session_id)["title"] == "before"
+        assert not leaked.checked_out
+        again = session_logger._get_connection()
+        assert again is leaked
+        again.close()
+
+    def test_todos_roundtrip(self, session_logger):
+        """save_todos / get_todos が使い回し接続で動作する"""
+        session_id = session_logger.create_session(title="todos")
+        todos = [{"id": "1", "content": "write tests", "status": "pending"}]
+
+        session_logger.save_todos(session_id, todos)
+
+        assert [t["content"] for t in session_logger.get_todos(session_id)] == ["write tests"]
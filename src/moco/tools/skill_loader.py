@@ -19,14 +19,22 @@ import tempfile
 import subprocess
 import logging
 import time
-from typing import Dict, List, Optional, Tuple, Any
+import urllib.error
+import urllib.request
+import concurrent.futures
+import zlib
+from typing import Dict, List, Optional, Tuple, Any, Union
 from dataclasses import dataclass, field
+from enum import Enum
 from .security_scanner import SecurityScanner
 
 try:
     import yaml
+    # libyaml があれば C 実装のローダーで frontmatter をパース（純 Python より大幅に速い）
+    _YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 except ImportError:
     yaml = None  # Will raise error when needed
+    _YAML_LOADER = None
 
 try:
     import numpy as np
@@ -35,8 +43,144 @@ except ImportError:
     np = None
     NUMPY_AVAILABLE = False
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    diskcache = None
+    DISKCACHE_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# リモート検索・オンデマンド取得に対応するレジストリ（名前 -> GitHub リポジトリ）
+_REGISTRIES: Dict[str, str] = {
+    "anthropics": "anthropics/skills",
+    "community": "alirezarezvani/claude-skills",
+    "claude-code": "daymade/claude-code-skills",
+}
+
+# sync_from_registry でまとめてインストールできるレジストリ
+_SYNC_REGISTRIES: Dict[str, str] = {
+    **_REGISTRIES,
+    "collection": "abubakarsiddik31/claude-skills-collection",
+    "remotion": "remotion-dev/skills",
+}
+
+# リモートレジストリ / セマンティック検索結果のキャッシュ有効期限（秒）
+_REGISTRY_CACHE_TTL = 86400
+# クエリ翻訳に使うモデル（キャッシュキーにも含める）
+_TRANSLATION_MODEL = "gemini-2.0-flash"
+
+
+# レジストリのメタデータ取得時に SKILL.md の先頭だけ取得するバイト数
+_FRONTMATTER_RANGE_BYTES = 2048
+
+# SKILL.md の YAML frontmatter（_FM_RE: メタデータのみ、_FM_BODY_RE: 本文付き）
+_FM_RE = re.compile(r'^---\n(.*?)\n---', re.DOTALL)
+_FM_BODY_RE = re.compile(r'^---\n(.*?)\n---\n(.*)$', re.DOTALL)
+
+def _json_loads(data: bytes) -> Any:
+    """Decode JSON from raw bytes (orjson if installed, otherwise stdlib json)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps_pretty(obj: Any) -> bytes:
+    """Encode obj as indented UTF-8 JSON bytes (orjson if installed)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            pass  # orjson 非対応の型（巨大な int など）は stdlib にフォールバック
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _load_frontmatter_yaml(text: str) -> Any:
+    """Parse a YAML frontmatter block with the fastest available safe loader."""
+    return yaml.load(text, Loader=_YAML_LOADER)
+
+
+# キーワード検索の trigram プレフィルタ（1024 ビットの bloom 風ビットセット）
+_TRIGRAM_BITS = 1024
+
+
+def _trigram_bitset(text: str) -> int:
+    """Return a bloom-style bitset of the lowercase trigrams in text.
+
+    If needle is a substring of haystack, every bit of _trigram_bitset(needle)
+    is also set in _trigram_bitset(haystack), so a missing bit rules out a match
+    without a substring scan. Texts shorter than 3 chars yield 0 (never rejected).
+    crc32 is used instead of hash() so the bitsets can be persisted in the cache.
+    """
+    text = text.lower()
+    bits = 0
+    for i in range(len(text) - 2):
+        bits |= 1 << (zlib.crc32(text[i:i + 3].encode("utf-8")) % _TRIGRAM_BITS)
+    return bits
+
+
+def _prepare_skill_meta(skill_meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Precompute the derived search keys of a registry skill entry in place.
+
+    - _name_lc / _desc_lc: lowercased name and description
+    - _combined_lc: "<name> <description>" lowercased (keyword search text)
+    - _trigrams: trigram bitset of _combined_lc
+    """
+    if "_combined_lc" not in skill_meta:
+        name_lc = str(skill_meta.get("name") or "").lower()
+        desc_lc = str(skill_meta.get("description") or "").lower()
+        skill_meta["_name_lc"] = name_lc
+        skill_meta["_desc_lc"] = desc_lc
+        skill_meta["_combined_lc"] = f"{name_lc} {desc_lc}"
+        skill_meta.pop("_trigrams", None)
+    if "_trigrams" not in skill_meta:
+        skill_meta["_trigrams"] = _trigram_bitset(skill_meta["_combined_lc"])
+    return skill_meta
+
+
+def _skill_meta_trigrams(skill_meta: Dict[str, Any]) -> int:
+    """Get the trigram bitset of a registry skill entry (computed on first use)."""
+    bits = skill_meta.get("_trigrams")
+    if bits is None:
+        bits = _prepare_skill_meta(skill_meta)["_trigrams"]
+    return bits
+
+
+# 埋め込みテキストの形式バージョン（変更時はローカル索引と検索結果キャッシュを作り直す）
+_REMOTE_TEXT_VERSION = 2
+
+
+def _remote_skill_text(skill_meta: Dict[str, Any]) -> str:
+    """Text embedded for a remote registry skill in the vector index.
+
+    This is the full frontmatter description as written by the skill author
+    (it carries the trigger keywords agents select on). The name is used only
+    when a skill has no description.
+    """
+    description = str(skill_meta.get("description") or "").strip()
+    return description or str(skill_meta.get("name", ""))
+
+
+class SkillMatcherBackend(str, Enum):
+    """Vector backend for remote skill search, selected by MOCO_SKILL_BACKEND."""
+    IN_MEMORY = "inmemory"
+    QDRANT = "qdrant"
+
+    @classmethod
+    def from_env(cls) -> "SkillMatcherBackend":
+        value = os.environ.get("MOCO_SKILL_BACKEND", cls.IN_MEMORY.value).strip().lower()
+        try:
+            return cls(value)
+        except ValueError:
+            logger.warning(f"Unknown MOCO_SKILL_BACKEND '{value}', using '{cls.IN_MEMORY.value}'")
+            return cls.IN_MEMORY
+
 
 # プロジェクトルートを取得
 _MOCO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -70,6 +214,18 @@ def _find_profiles_dir() -> str:
     raise RuntimeError("profiles directory not found")
 
 
+# matches_input() の description キーワードから除外する一般的すぎる単語
+_MATCH_STOP_WORDS = frozenset({
+    'this', 'that', 'with', 'from', 'when', 'user', 'asks', 'create',
+    'build', 'make', 'code', 'using', 'includes', 'examples', 'skill',
+    'guide', 'helps', 'uses', 'like', 'such', 'also', 'some', 'more',
+    'than', 'into', 'your', 'they', 'will', 'have', 'been', 'about',
+})
+
+# SkillKeywordIndex のキー長（ニードル先頭の文字数）
+_KEYWORD_KEY_LEN = 3
+
+
 @dataclass
 class SkillConfig:
     """Skill configuration loaded from SKILL.md
@@ -123,28 +279,99 @@ class SkillConfig:
         
         # description からキーワードを抽出してマッチング（フォールバック）
         if self.description:
-            # 重要なキーワードを抽出
-            important_keywords = set()
-            for word in self.description.split():
-                word_clean = word.lower().strip('.,()[]/:')
-                # 4文字以上で、技術的なキーワードを優先
-                if len(word_clean) >= 4:
-                    important_keywords.add(word_clean)
-            
-            # 一般的すぎる単語を除外
-            stop_words = {'this', 'that', 'with', 'from', 'when', 'user', 'asks', 'create', 
-                         'build', 'make', 'code', 'using', 'includes', 'examples', 'skill',
-                         'guide', 'helps', 'uses', 'like', 'such', 'also', 'some', 'more',
-                         'than', 'into', 'your', 'they', 'will', 'have', 'been', 'about'}
-            important_keywords -= stop_words
-            
             # 入力に含まれるキーワードをカウント
+            important_keywords = self._description_keywords()
             matched_keywords = [kw for kw in important_keywords if kw in input_lower]
             if len(matched_keywords) >= 2:
                 return True
         
         return False
 
+    def _description_keywords(self) -> set:
+        """Important (>= 4 chars, non stop-word) lowercase words of the description."""
+        # 重要なキーワードを抽出
+        important_keywords = set()
+        for word in self.description.split():
+            word_clean = word.lower().strip('.,()[]/:')
+            # 4文字以上で、技術的なキーワードを優先
+            if len(word_clean) >= 4:
+                important_keywords.add(word_clean)
+
+        # 一般的すぎる単語を除外
+        return important_keywords - _MATCH_STOP_WORDS
+
+    def match_needles(self) -> Optional[set]:
+        """Strings of which at least one must occur in an input for matches_input to be True.
+
+        Returns None when the skill can match any input (e.g. an empty trigger,
+        or a multi-part name whose parts are all shorter than 3 characters).
+        """
+        needles = set()
+        for trigger in self.triggers or []:
+            needles.add(trigger.lower())
+
+        name_lower = self.name.lower()
+        needles.update((name_lower, self.name.replace('-', ' ').lower(), self.name.replace('-', '').lower()))
+
+        name_parts = name_lower.split('-')
+        if len(name_parts) >= 2:
+            long_parts = [part for part in name_parts if len(part) >= 3]
+            if not long_parts:
+                return None
+            needles.update(long_parts)
+
+        if self.description:
+            needles.update(self._description_keywords())
+
+        if "" in needles:
+            return None
+        return needles
+
+
+class SkillKeywordIndex:
+    """Inverted index that narrows keyword (matches_input) search to candidate skills.
+
+    Every needle of a skill (see SkillConfig.match_needles) is indexed by its
+    first _KEYWORD_KEY_LEN characters. Any needle contained in the input has
+    its key among the input's substrings of up to that length, so a lookup
+    costs O(len(input)) dict probes and never misses a matching skill.
+    Candidates are then confirmed with matches_input().
+    """
+
+    def __init__(self, skills: Dict[str, "SkillConfig"]):
+        self._skills = skills
+        self._postings: Dict[str, set] = {}
+        self._always: set = set()  # 任意の入力にマッチしうるスキル
+        for name, skill in skills.items():
+            needles = skill.match_needles()
+            if needles is None:
+                self._always.add(name)
+                continue
+            for needle in needles:
+                self._postings.setdefault(needle[:_KEYWORD_KEY_LEN], set()).add(name)
+
+    def candidates(self, user_input: str) -> set:
+        """Names of skills that may match user_input (superset of the actual matches)."""
+        text = user_input.lower()
+        postings = self._postings
+        found = set(self._always)
+        for i in range(len(text)):
+            for j in range(i + 1, min(i + _KEYWORD_KEY_LEN, len(text)) + 1):
+                names = postings.get(text[i:j])
+                if names:
+                    found |= names
+        return found
+
+    def match(self, user_input: str) -> List[str]:
+        """Names of skills whose matches_input() is True, in skills dict order."""
+        found = self.candidates(user_input)
+        if not found:
+            return []
+        return [
+            name for name, skill in self._skills.items()
+            if name in found and skill.matches_input(user_input)
+        ]
+
 
 class SkillLoader:
     """Loader for Skills from a profile directory.
@@ -168,9 +395,15 @@ class SkillLoader:
     - Semantic (vector) matching using embeddings
     """
 
-    def __init__(self, profile: str = "default", use_semantic: bool = True):
+    def __init__(
+        self,
+        profile: str = "default",
+        use_semantic: bool = True,
+        backend: Optional[SkillMatcherBackend] = None
+    ):
         self.profile = profile
         self.use_semantic = use_semantic
+        self.backend = backend or SkillMatcherBackend.from_env()
         profiles_dir = _find_profiles_dir()
         self.skills_dir = os.path.join(profiles_dir, self.profile, "skills")
         
@@ -180,6 +413,65 @@ class SkillLoader:
         self._skill_mtimes: Dict[str, float] = {}  # スキルごとの更新日時
         self._indexed_skills: set = set()  # インデックス済みスキル名
 
+        # 翻訳・レジストリ・セマンティック検索結果の永続キャッシュ（diskcache）
+        self._result_cache = None
+
+        # Qdrant バックエンド（MOCO_SKILL_BACKEND=qdrant の場合のみ使用）
+        self._skill_store = None
+        self._skill_store_failed = False  # 接続失敗後はインメモリ検索に固定
+        self._skill_store_synced: set = set()  # 同期済みレジストリ
+
+        # load_skills() の結果キャッシュ: ((skills_dir, signature), skills)
+        self._skills_cache: Optional[Tuple[Tuple[str, tuple], Dict[str, "SkillConfig"]]] = None
+        # _skills_cache のエントリごとに作るキーワード索引: (_skills_cache のエントリ, index)
+        self._keyword_index: Optional[Tuple[tuple, "SkillKeywordIndex"]] = None
+
+    def _get_result_cache(self):
+        """Get or open the persistent result cache (skills_dir/.cache).
+
+        Returns None when diskcache is not installed or the cache cannot be opened.
+        """
+        if not DISKCACHE_AVAILABLE:
+            return None
+
+        cache_dir = os.path.join(self.skills_dir, ".cache")
+        # load_skills() で skills_dir が変わった場合は開き直す
+        if self._result_cache is not None and self._result_cache.directory != cache_dir:
+            self._result_cache.close()
+            self._result_cache = None
+
+        if self._result_cache is None:
+            try:
+                self._result_cache = diskcache.Cache(cache_dir)
+            except Exception as e:
+                logger.debug(f"Failed to open result cache {cache_dir}: {e}")
+                return None
+        return self._result_cache
+
+    def _cache_get(self, kind: str, registry: Optional[str], query: Optional[str],
+                   model_version: Optional[str] = None) -> Any:
+        """Look up a cached result keyed by (kind, registry, query, model_version)."""
+        cache = self._get_result_cache()
+        if cache is None:
+            return None
+        try:
+            return cache.get((kind, registry, query, model_version))
+        except Exception as e:
+            logger.debug(f"Result cache read failed: {e}")
+            return None
+
+    def _cache_set(self, kind: str, registry: Optional[str], query: Optional[str],
+                   model_version: Optional[str], value: Any,
+                   expire: Optional[float] = None) -> None:
+        """Store a result keyed by (kind, registry, query, model_version)."""
+        cache = self._get_result_cache()
+        if cache is None:
+            return
+        try:
+            cache.set((kind, registry, query, model_version), value, expire=expire)
+        except Exception as e:
+            logger.debug(f"Result cache write failed: {e}")
+
     def _get_skill_mtimes(self) -> Dict[str, float]:
         """各スキルファイルの更新日時を取得"""
         mtimes = {}
@@ -236,8 +528,55 @@ class SkillLoader:
         
         return False
 
+    def _skills_signature(self) -> Optional[tuple]:
+        """Cheap change signature of the skills directory.
+
+        One entry per skill directory: (name, dir mtime, SKILL.md mtime).
+        Adding/removing a skill, editing its SKILL.md, or adding logic files
+        (index.js, scripts/, *.py) all change the signature. Returns None if
+        the directory cannot be scanned.
+        """
+        entries = []
+        try:
+            with os.scandir(self.skills_dir) as it:
+                for entry in it:
+                    if entry.name.startswith('.') or not entry.is_dir():
+                        continue
+                    try:
+                        skill_md_mtime = os.stat(os.path.join(entry.path, "SKILL.md")).st_mtime_ns
+                    except OSError:
+                        skill_md_mtime = 0
+                    entries.append((entry.name, entry.stat().st_mtime_ns, skill_md_mtime))
+        except OSError:
+            return None
+        entries.sort()
+        return tuple(entries)
+
     def load_skills(self) -> Dict[str, SkillConfig]:
-        """Load all skills from the profile's skills directory"""
+        """Load all skills from the profile's skills directory.
+
+        Parsed skills are memoized and reused until the skills directory
+        signature (see _skills_signature) changes.
+        """
+        return dict(self._load_skills_shared())
+
+    def load_skills_with_index(self) -> Tuple[Dict[str, SkillConfig], "SkillKeywordIndex"]:
+        """Like load_skills, plus a keyword index built over the skills.
+
+        Both are memoized together with the load_skills() cache and shared
+        between calls, so the returned dict must not be mutated.
+        """
+        skills = self._load_skills_shared()
+        cache = self._skills_cache
+        if cache is None or cache[1] is not skills:
+            # シグネチャが取れずキャッシュされなかった場合は毎回作る
+            return skills, SkillKeywordIndex(skills)
+        if self._keyword_index is None or self._keyword_index[0] is not cache:
+            self._keyword_index = (cache, SkillKeywordIndex(skills))
+        return skills, self._keyword_index[1]
+
+    def _load_skills_shared(self) -> Dict[str, SkillConfig]:
+        """load_skills() without the defensive copy (the cached dict itself)."""
         # プロファイル変更に対応するため、毎回再計算
         profiles_dir = _find_profiles_dir()
         self.skills_dir = os.path.join(profiles_dir, self.profile, "skills")
@@ -247,6 +586,13 @@ class SkillLoader:
         if not os.path.exists(self.skills_dir) or not os.path.isdir(self.skills_dir):
             return skills
 
+        # ディレクトリに変更がなければ前回のパース結果を返す
+        signature = self._skills_signature()
+        cache_key = (self.skills_dir, signature)
+        if signature is not None and self._skills_cache is not None \
+                and self._skills_cache[0] == cache_key:
+            return self._skills_cache[1]
+
         # skills/<skill-name>/SKILL.md を探索
         search_path = os.path.join(self.skills_dir, "*", "SKILL.md")
         files = glob.glob(search_path)
@@ -259,6 +605,8 @@ class SkillLoader:
             except Exception as e:
                 logger.warning(f"Failed to load skill from {file_path}: {e}")
 
+        if signature is not None:
+            self._skills_cache = (cache_key, skills)
         return skills
 
     def _parse_skill_file(self, file_path: str) -> Optional[SkillConfig]:
@@ -267,8 +615,7 @@ class SkillLoader:
             content = f.read()
 
         # 正規表現で先頭の YAML frontmatter を抽出
-        pattern = r'^---\n(.*?)\n---\n(.*)$'
-        match = re.match(pattern, content, re.DOTALL)
+        match = _FM_BODY_RE.match(content)
         if not match:
             return None
 
@@ -276,7 +623,7 @@ class SkillLoader:
         body = match.group(2).strip()
 
         try:
-            metadata = yaml.safe_load(frontmatter_yaml)
+            metadata = _load_frontmatter_yaml(frontmatter_yaml)
         except yaml.YAMLError:
             return None
 
@@ -666,6 +1013,7 @@ class SkillLoader:
 
             # インデックスを再構築
             self._skills_indexed = False
+            self._skills_cache = None
             logger.info(f"Rebuilding skill index after installing '{skill_name}'")
 
             return True, f"Installed '{skill_name}' from {repo}"
@@ -745,6 +1093,7 @@ class SkillLoader:
         # インストール後にインデックスを再構築
         if installed:
             self._skills_indexed = False
+            self._skills_cache = None
             logger.info(f"Rebuilding skill index after installing {len(installed)} skills")
 
         return len(installed), installed
@@ -766,6 +1115,7 @@ class SkillLoader:
         
         # インデックスを再構築
         self._skills_indexed = False
+        self._skills_cache = None
         logger.info(f"Rebuilding skill index after uninstalling '{skill_name}'")
         
         return True, f"Uninstalled '{skill_name}'"
@@ -782,19 +1132,11 @@ class SkillLoader:
         Returns:
             Tuple of (count: int, skill_names: List[str])
         """
-        registries = {
-            "anthropics": "anthropics/skills",
-            "community": "alirezarezvani/claude-skills",
-            "claude-code": "daymade/claude-code-skills",
-            "collection": "abubakarsiddik31/claude-skills-collection",
-            "remotion": "remotion-dev/skills",
-        }
-
-        if registry not in registries:
-            logger.error(f"Unknown registry: {registry}. Available: {list(registries.keys())}")
+        if registry not in _SYNC_REGISTRIES:
+            logger.error(f"Unknown registry: {registry}. Available: {list(_SYNC_REGISTRIES.keys())}")
             return 0, []
 
-        repo = registries[registry]
+        repo = _SYNC_REGISTRIES[registry]
         logger.info(f"Syncing skills from {repo}...")
         return self.install_skills_from_repo(repo)
 
@@ -835,14 +1177,18 @@ class SkillLoader:
 
         # レジストリのメタデータキャッシュを取得/更新
         all_results = []
+        query_lower = query.lower()
+        query_bits = _trigram_bitset(query_lower)
         for registry in registries:
             cache = self._get_registry_cache(registry)
             if cache:
-                query_lower = query.lower()
                 for skill_meta in cache:
-                    name = skill_meta.get("name", "").lower()
-                    desc = skill_meta.get("description", "").lower()
-                    if query_lower in name or query_lower in desc:
+                    # trigram が揃っていないスキルは部分一致しえないので即スキップ
+                    if query_bits & _skill_meta_trigrams(skill_meta) != query_bits:
+                        continue
+                    _prepare_skill_meta(skill_meta)
+                    # 名前と説明は別々に照合する（連結部をまたぐ一致を拾わない）
+                    if query_lower in skill_meta["_name_lc"] or query_lower in skill_meta["_desc_lc"]:
                         skill_meta["registry"] = registry
                         all_results.append(skill_meta)
 
@@ -850,48 +1196,52 @@ class SkillLoader:
 
     def _get_registry_cache(self, registry: str) -> List[Dict[str, Any]]:
         """Get or update registry metadata cache."""
-        registries = {
-            "anthropics": "anthropics/skills",
-            "community": "alirezarezvani/claude-skills",
-            "claude-code": "daymade/claude-code-skills",
-        }
-
-        if registry not in registries:
+        if registry not in _REGISTRIES:
             return []
 
-        repo = registries[registry]
+        repo = _REGISTRIES[registry]
+
+        # diskcache が使える場合はそちらを優先（期限切れは自動で破棄される）
+        cached = self._cache_get("registry", registry, None)
+        if cached is not None:
+            return cached
+
         cache_file = os.path.join(self.skills_dir, f".cache_{registry}.json")
 
-        # キャッシュが24時間以内なら再利用
-        if os.path.exists(cache_file):
-            mtime = os.path.getmtime(cache_file)
-            import time
-            if time.time() - mtime < 86400:  # 24 hours
+        # キャッシュが24時間以内なら再利用（存在確認と mtime 取得を stat 1回で済ませる）
+        if self._get_result_cache() is None:
+            try:
+                st = os.stat(cache_file)
+            except OSError:
+                st = None
+            if st is not None and time.time() - st.st_mtime < _REGISTRY_CACHE_TTL:
                 try:
-                    with open(cache_file, 'r') as f:
-                        return json.load(f)
+                    with open(cache_file, 'rb') as f:
+                        return _json_loads(f.read())
                 except Exception:
                     pass
 
         # GitHub API でメタデータを取得
         try:
-            return self._fetch_registry_metadata(repo, cache_file)
+            skills_meta = self._fetch_registry_metadata(repo, cache_file)
         except Exception as e:
             logger.warning(f"Failed to fetch registry {registry}: {e}")
             return []
 
+        if skills_meta:
+            self._cache_set("registry", registry, None, None, skills_meta,
+                            expire=_REGISTRY_CACHE_TTL)
+        return skills_meta
+
     def _fetch_registry_metadata(self, repo: str, cache_file: str) -> List[Dict[str, Any]]:
         """Fetch skill metadata from GitHub repository."""
-        import urllib.request
-        import urllib.error
-
         # GitHub API で skills ディレクトリの内容を取得
         api_url = f"https://api.github.com/repos/{repo}/contents/skills"
         
         try:
             req = urllib.request.Request(api_url, headers={"User-Agent": "moco-skill-loader"})
             with urllib.request.urlopen(req, timeout=10) as response:
-                dirs = json.loads(response.read().decode())
+                dirs = _json_loads(response.read())
         except Exception as e:
             logger.debug(f"GitHub API failed: {e}")
             return []
@@ -906,40 +1256,66 @@ class SkillLoader:
             skill_md_url = f"https://raw.githubusercontent.com/{repo}/main/skills/{skill_name}/SKILL.md"
             
             try:
-                req = urllib.request.Request(skill_md_url, headers={"User-Agent": "moco-skill-loader"})
-                with urllib.request.urlopen(req, timeout=5) as response:
-                    content = response.read().decode()
-                
-                # frontmatter をパース
-                meta = self._parse_frontmatter(content)
+                meta = self._fetch_skill_frontmatter(skill_md_url)
                 if meta:
                     meta["name"] = meta.get("name", skill_name)
                     meta["repo"] = repo
                     meta["url"] = skill_md_url
+                    _prepare_skill_meta(meta)
                     skills_meta.append(meta)
             except Exception:
                 # 個別のスキル取得失敗は無視
                 pass
 
-        # キャッシュを保存
-        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
-        try:
-            with open(cache_file, 'w') as f:
-                json.dump(skills_meta, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+        # diskcache がない環境では JSON ファイルにキャッシュを保存
+        if self._get_result_cache() is None:
+            os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+            try:
+                # "_" 始まりの派生キー（trigram 等）は読み込み時に再計算するので保存しない
+                public_meta = [
+                    {k: v for k, v in meta.items() if not k.startswith("_")}
+                    for meta in skills_meta
+                ]
+                with open(cache_file, 'wb') as f:
+                    f.write(_json_dumps_pretty(public_meta))
+            except Exception:
+                pass
 
         return skills_meta
 
+    def _fetch_skill_frontmatter(self, skill_md_url: str) -> Optional[Dict[str, Any]]:
+        """Fetch only the frontmatter of a remote SKILL.md.
+
+        Requests the first _FRONTMATTER_RANGE_BYTES bytes with an HTTP Range
+        header; if the closing '---' is not within that head (or the server
+        ignores Range), falls back to parsing the full file.
+        """
+        headers = {
+            "User-Agent": "moco-skill-loader",
+            "Range": f"bytes=0-{_FRONTMATTER_RANGE_BYTES - 1}",
+        }
+        req = urllib.request.Request(skill_md_url, headers=headers)
+        with urllib.request.urlopen(req, timeout=5) as response:
+            # Range で途中切れになったマルチバイト文字は無視
+            head = response.read().decode(errors="ignore")
+
+        if _FM_RE.match(head):
+            return self._parse_frontmatter(head)
+
+        # frontmatter が先頭に収まらない場合は全体を取得
+        req = urllib.request.Request(skill_md_url, headers={"User-Agent": "moco-skill-loader"})
+        with urllib.request.urlopen(req, timeout=5) as response:
+            content = response.read().decode()
+        return self._parse_frontmatter(content)
+
     def _parse_frontmatter(self, content: str) -> Optional[Dict[str, Any]]:
         """Parse YAML frontmatter from content."""
-        pattern = r'^---\n(.*?)\n---'
-        match = re.match(pattern, content, re.DOTALL)
+        match = _FM_RE.match(content)
         if not match:
             return None
         
         try:
-            return yaml.safe_load(match.group(1))
+            return _load_frontmatter_yaml(match.group(1))
         except Exception:
             return None
 
@@ -957,31 +1333,23 @@ class SkillLoader:
         Returns:
             SkillConfig if found, None otherwise
         """
-        registries = {
-            "anthropics": "anthropics/skills",
-            "community": "alirezarezvani/claude-skills",
-            "claude-code": "daymade/claude-code-skills",
-        }
-
-        if registry not in registries:
+        if registry not in _REGISTRIES:
             return None
 
-        repo = registries[registry]
+        repo = _REGISTRIES[registry]
         skill_md_url = f"https://raw.githubusercontent.com/{repo}/main/skills/{skill_name}/SKILL.md"
 
         try:
-            import urllib.request
             req = urllib.request.Request(skill_md_url, headers={"User-Agent": "moco-skill-loader"})
             with urllib.request.urlopen(req, timeout=10) as response:
                 content = response.read().decode()
 
             # frontmatter + body をパース
-            pattern = r'^---\n(.*?)\n---\n(.*)$'
-            match = re.match(pattern, content, re.DOTALL)
+            match = _FM_BODY_RE.match(content)
             if not match:
                 return None
 
-            metadata = yaml.safe_load(match.group(1)) or {}
+            metadata = _load_frontmatter_yaml(match.group(1)) or {}
             body = match.group(2).strip()
 
             triggers = metadata.get("triggers") or []
@@ -1034,9 +1402,25 @@ class SkillLoader:
         matched_names: set = set()
 
         # 1. リモートレジストリからセマンティック検索
+        # レジストリ同士は独立しているので並列に検索し、マージはレジストリ順に行う
+        search_results: Dict[str, Any] = {}
+        if registries:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(registries)) as pool:
+                futures = {
+                    registry: pool.submit(self._search_remote_semantic, user_input, registry, max_skills)
+                    for registry in registries
+                }
+                for registry, future in futures.items():
+                    try:
+                        search_results[registry] = future.result()
+                    except Exception as e:
+                        search_results[registry] = e
+
         for registry in registries:
             try:
-                remote_results = self._search_remote_semantic(user_input, registry, top_k=max_skills)
+                remote_results = search_results.get(registry, [])
+                if isinstance(remote_results, Exception):
+                    raise remote_results
                 
                 for remote_meta in remote_results:
                     if len(matched_skills) >= max_skills:
@@ -1080,6 +1464,11 @@ class SkillLoader:
         # 英語のみの場合はそのまま返す
         if query.isascii():
             return query
+
+        # 翻訳結果は決定的なので期限なしで永続キャッシュ
+        cached = self._cache_get("translation", None, query, _TRANSLATION_MODEL)
+        if cached is not None:
+            return cached
         
         try:
             from google import genai
@@ -1095,7 +1484,7 @@ class SkillLoader:
             
             client = genai.Client(api_key=api_key)
             response = client.models.generate_content(
-                model="gemini-2.0-flash",
+                model=_TRANSLATION_MODEL,
                 contents=f"Translate to English (only output the translation, no explanation): {query}",
                 config=types.GenerateContentConfig(
                     max_output_tokens=100,
@@ -1106,6 +1495,8 @@ class SkillLoader:
             logger.info(f"Translated query: '{query}' -> '{translated}'")
             # verbose 用に print も出力
             logger.debug(f"[Skills] Translated: '{query}' -> '{translated}'")
+            if translated:
+                self._cache_set("translation", None, query, _TRANSLATION_MODEL, translated)
             return translated
         except Exception as e:
             logger.debug(f"Translation failed: {e}")
@@ -1113,63 +1504,184 @@ class SkillLoader:
 
     def _search_remote_semantic(
         self,
-        query: str,
+        query: Union[str, List[str]],
         registry: str,
         top_k: int = 5
     ) -> List[Dict[str, Any]]:
-        """Search remote registry using embedding-based someantic matching."""
+        """Search remote registry using embedding-based someantic matching.
+
+        query may be a list of queries: they are embedded and searched in one
+        batch, and the hits are merged by best score (deduplicated by name).
+        Non-English queries are translated first.
+        """
+        queries = [query] if isinstance(query, str) else list(query)
+        if not queries:
+            return []
+        if not self._get_registry_cache(registry):
+            return []
+
+        # 日本語クエリを英語に翻訳
+        english_queries = [self._translate_query_to_english(q) for q in queries]
+        return self._search_remote_semantic_batch(
+            english_queries, registry, top_k=top_k, keyword_query=" ".join(queries)
+        )
+
+    def _search_remote_semantic_batch(
+        self,
+        queries: List[str],
+        registry: str,
+        top_k: int = 5,
+        keyword_query: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search remote registry for several queries (as given, no translation).
+
+        All queries are embedded in one request and searched together; each
+        skill keeps its best score across queries and results are ordered by
+        that score. Falls back to keyword search on keyword_query (default:
+        the queries joined) when embeddings are unavailable.
+        """
         cache = self._get_registry_cache(registry)
         if not cache:
             return []
 
-        # 日本語クエリを英語に翻訳
-        english_query = self._translate_query_to_english(query)
+        # 重複クエリは1回だけ埋め込む（順序は維持）
+        english_queries = list(dict.fromkeys(q for q in queries if q))
+        if not english_queries:
+            return []
+        if keyword_query is None:
+            keyword_query = " ".join(english_queries)
 
         try:
             # Gemini 埋め込みを使ってセマンティック検索
-            from ..storage.semantic_memory import SemanticMemory, GENAI_AVAILABLE
+            from ..storage.semantic_memory import GENAI_AVAILABLE, DEFAULT_EMBEDDING_MODEL
+            model_version = f"{DEFAULT_EMBEDDING_MODEL}:v{_REMOTE_TEXT_VERSION}"
             
             if not GENAI_AVAILABLE:
-                return self._search_remote_keyword(query, cache, top_k)
-            
-            # リモートスキル用のセマンティックメモリ
-            db_path = os.path.join(self.skills_dir, f".remote_{registry}_semantic.db")
-            memory = SemanticMemory(db_path=db_path)
-            
-            # キャッシュをインデックス（まだなければ）
-            if memory.index.ntotal == 0:
-                for skill_meta in cache:
-                    name = skill_meta.get("name", "")
-                    desc = skill_meta.get("description", "")
-                    text = f"{name}: {desc}"
-                    try:
-                        memory.add_document(
-                            doc_id=f"remote:{registry}:{name}",
-                            content=text,
-                            metadata={"skill_name": name, "registry": registry}
-                        )
-                    except Exception:
-                        pass
-            
-            # セマンティック検索（翻訳されたクエリを使用）
-            results = memory.search(english_query, top_k=top_k)
+                return self._search_remote_keyword(keyword_query, cache, top_k)
+
+            # 同じクエリの検索結果（スキル名のリスト）は永続キャッシュから返す
+            cache_query = "\x00".join(english_queries + [str(top_k)])
+            cached_names = self._cache_get("semantic", registry, cache_query, model_version)
+            if cached_names is not None:
+                by_name = {m.get("name"): m for m in cache}
+                return [by_name[n] for n in cached_names if n in by_name]
             
-            # 結果をスキルメタデータに変換
-            matched = []
-            for result in results:
-                skill_name = result.get('metadata', {}).get('skill_name')
-                if skill_name:
-                    # キャッシュから完全なメタデータを取得
-                    for skill_meta in cache:
-                        if skill_meta.get("name") == skill_name:
-                            matched.append(skill_meta)
-                            break
+            # Qdrant バックエンド（設定時）→ 失敗・未設定ならローカルの FAISS インデックス
+            names = self._search_remote_qdrant(english_queries, registry, cache, top_k)
+            if names is None:
+                names = self._search_remote_faiss(english_queries, registry, cache, top_k)
             
+            # 結果をスキルメタデータに変換（キャッシュから完全なメタデータを取得）
+            by_name = {m.get("name"): m for m in cache}
+            matched = [by_name[name] for name in names if name in by_name]
+
+            if matched:
+                self._cache_set(
+                    "semantic", registry, cache_query, model_version,
+                    [m.get("name") for m in matched], expire=_REGISTRY_CACHE_TTL
+                )
             return matched
             
         except Exception as e:
             logger.warning(f"Semantic search failed, falling back to keyword: {e}")
-            return self._search_remote_keyword(query, cache, top_k)
+            return self._search_remote_keyword(keyword_query, cache, top_k)
+
+    def _get_skill_store(self):
+        """Get the Qdrant skill store when MOCO_SKILL_BACKEND=qdrant (None otherwise)."""
+        if self.backend != SkillMatcherBackend.QDRANT or self._skill_store_failed:
+            return None
+        if self._skill_store is None:
+            try:
+                from ..storage.skill_vector_store import QdrantSkillStore
+                from ..storage.semantic_memory import embed_texts
+                self._skill_store = QdrantSkillStore(embed=embed_texts)
+            except Exception as e:
+                logger.warning(f"Qdrant skill backend unavailable, using in-memory search: {e}")
+                self._skill_store_failed = True
+                return None
+        return self._skill_store
+
+    def _search_remote_qdrant(
+        self,
+        english_queries: List[str],
+        registry: str,
+        cache: List[Dict[str, Any]],
+        top_k: int
+    ) -> Optional[List[str]]:
+        """Search remote skills in Qdrant. Returns None if the backend is not usable."""
+        store = self._get_skill_store()
+        if store is None:
+            return None
+
+        try:
+            # 初回のみ差分同期（内容ハッシュが変わったスキルだけ再埋め込み）
+            if registry not in self._skill_store_synced:
+                store.sync(registry, {
+                    skill_meta["name"]: _remote_skill_text(skill_meta)
+                    for skill_meta in cache if skill_meta.get("name")
+                })
+                self._skill_store_synced.add(registry)
+
+            best: Dict[str, float] = {}
+            for hits in store.search_batch(registry, english_queries, top_k=top_k):
+                for name, similarity in hits:
+                    best[name] = max(best.get(name, -1.0), similarity)
+            return sorted(best, key=best.get, reverse=True)[:top_k]
+        except Exception as e:
+            logger.warning(f"Qdrant skill search failed, falling back to in-memory: {e}")
+            return None
+
+    def _search_remote_faiss(
+        self,
+        english_queries: List[str],
+        registry: str,
+        cache: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[str]:
+        """Search remote skills with the local FAISS-backed SemanticMemory."""
+        from ..storage.semantic_memory import SemanticMemory
+
+        # リモートスキル用のセマンティックメモリ
+        db_path = os.path.join(
+            self.skills_dir, f".remote_{registry}_semantic_v{_REMOTE_TEXT_VERSION}.db"
+        )
+        memory = SemanticMemory(db_path=db_path)
+        
+        # キャッシュをインデックス（まだなければ）
+        if memory.index.ntotal == 0:
+            docs = []
+            for skill_meta in cache:
+                name = skill_meta.get("name", "")
+                docs.append((
+                    f"remote:{registry}:{name}",
+                    _remote_skill_text(skill_meta),
+                    {"skill_name": name, "registry": registry},
+                ))
+            # 埋め込みはまとめて1リクエスト（最大 EMBED_BATCH_SIZE 件ずつ）で取得
+            try:
+                memory.add_documents_batch(docs)
+            except Exception:
+                pass
+        
+        # セマンティック検索（翻訳されたクエリを使用、複数クエリは1回のバッチで検索）
+        if len(english_queries) == 1:
+            results = memory.search(english_queries[0], top_k=top_k)
+        else:
+            # クエリ横断でスキルごとの最良スコアを採用し、スコア順に並べる
+            best: Dict[str, Dict[str, Any]] = {}
+            for query_results in memory.search_batch(english_queries, top_k=top_k):
+                for result in query_results:
+                    skill_name = result.get('metadata', {}).get('skill_name')
+                    if skill_name and (skill_name not in best
+                                       or result['score'] < best[skill_name]['score']):
+                        best[skill_name] = result
+            results = sorted(best.values(), key=lambda r: r['score'])[:top_k]
+
+        return [
+            result['metadata']['skill_name']
+            for result in results
+            if result.get('metadata', {}).get('skill_name')
+        ]
 
     def _search_remote_keyword(
         self,
@@ -1178,15 +1690,23 @@ class SkillLoader:
         top_k: int = 5
     ) -> List[Dict[str, Any]]:
         """Fallback keyword-based search for remote skills."""
-        query_words = set(query.lower().split())
+        # 3文字未満の単語はスコアに寄与しないので最初に除外し、trigram も一度だけ計算
+        query_words = [
+            (word, _trigram_bitset(word))
+            for word in set(query.lower().split()) if len(word) >= 3
+        ]
         scored_results = []
+        if not query_words:
+            return []
 
         for skill_meta in cache:
-            name = skill_meta.get("name", "").lower()
-            desc = skill_meta.get("description", "").lower()
-            
-            text = f"{name} {desc}"
-            score = sum(1 for word in query_words if word in text and len(word) >= 3)
+            skill_bits = _skill_meta_trigrams(skill_meta)
+            candidates = [word for word, bits in query_words if skill_bits & bits == bits]
+            if not candidates:
+                continue
+
+            text = _prepare_skill_meta(skill_meta)["_combined_lc"]
+            score = sum(1 for word in candidates if word in text)
             
             if score > 0:
                 scored_results.append((score, skill_meta))
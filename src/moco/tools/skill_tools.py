@@ -4,13 +4,69 @@ These tools allow the Orchestrator to dynamically search and load skills
 from local and remote registries.
 """
 
+import ast
+import atexit
 import json
-from typing import Optional
-from .skill_loader import SkillLoader
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .skill_loader import SkillConfig, SkillKeywordIndex, SkillLoader, SkillMatcherBackend
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# search_skills のセマンティック検索で返す上位件数
+_SEARCH_TOP_K = 5
+
+# ロード済みスキルとして保持する最大数（超えたら最も長く使われていないものから破棄）
+MAX_LOADED_SKILLS = 64
+
+
+class _LRUSkillCache(OrderedDict):
+    """Size-bounded {skill_name: SkillConfig} dict with LRU eviction.
+
+    Reads via [] mark an entry as recently used; `in`, get() and iteration
+    do not change the order.
+    """
+
+    def __init__(self, maxsize: int = MAX_LOADED_SKILLS):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
 
 # グローバルなスキルローダーとロード済みスキルのキャッシュ
 _skill_loader: Optional[SkillLoader] = None
-_loaded_skills: dict = {}  # {skill_name: SkillConfig}
+_loaded_skills: _LRUSkillCache = _LRUSkillCache()  # {skill_name: SkillConfig}
+
+
+def _tool_json(obj) -> str:
+    """Serialize a tool result as compact JSON (indented if MOCO_PRETTY_JSON=1)."""
+    pretty = os.environ.get("MOCO_PRETTY_JSON") == "1"
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode("utf-8")
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
 
 
 def get_loaded_skills() -> dict:
@@ -20,23 +76,82 @@ def get_loaded_skills() -> dict:
 
 def clear_session_skills():
     """Clear loaded skills at session start."""
-    global _loaded_skills
-    _loaded_skills = {}
+    _loaded_skills.clear()
 
 
 def _get_loader() -> SkillLoader:
     """Get or create the global skill loader."""
     global _skill_loader
-    import os
     profile = os.environ.get("MOCO_PROFILE", "development")
+    backend = SkillMatcherBackend.from_env()
 
-    # Recreate loader if profile changed.
+    # Recreate loader if profile (or vector backend) changed.
     # NOTE: Web UI / Orchestrator can switch profiles per request/session.
-    if _skill_loader is None or getattr(_skill_loader, "profile", None) != profile:
-        _skill_loader = SkillLoader(profile=profile, use_semantic=True)
+    if (
+        _skill_loader is None
+        or getattr(_skill_loader, "profile", None) != profile
+        or getattr(_skill_loader, "backend", None) != backend
+    ):
+        _skill_loader = SkillLoader(profile=profile, use_semantic=True, backend=backend)
     return _skill_loader
 
 
+# ロジックスキルの実行エントリポイント: {(skill_dir, tool_name): (kind, path)}
+# kind は "js"（index.js / index.ts）、"py_root"（<tool>.py）、"py_scripts"（scripts/<tool>.py）
+_skill_entrypoint_cache: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+
+def _find_skill_entrypoint(skill_dir: str, tool_name: str) -> Optional[Tuple[str, str]]:
+    """Locate the entry point for a skill tool, memoized until the skills are reloaded.
+
+    Returns (kind, path) or None if the skill has no entry point for the tool.
+    """
+    key = (skill_dir, tool_name)
+    cached = _skill_entrypoint_cache.get(key)
+    if cached is not None:
+        return cached
+
+    candidates = (
+        ("js", os.path.join(skill_dir, "index.js")),
+        ("js", os.path.join(skill_dir, "index.ts")),
+        # 1. 直接的なツール名.py を探す（宣言された tool_name のみ）
+        ("py_root", os.path.join(skill_dir, f"{tool_name}.py")),
+        # 2. scripts/ツール名.py を探す
+        ("py_scripts", os.path.join(skill_dir, "scripts", f"{tool_name}.py")),
+    )
+    for kind, path in candidates:
+        if os.path.exists(path):
+            # 見つからなかった場合はキャッシュしない（後から追加されたファイルを拾うため）
+            _skill_entrypoint_cache[key] = (kind, path)
+            return kind, path
+    return None
+
+
+# _skill_entrypoint_cache を作ったときのキーワード索引（スキルの再読込を検出するため）
+_skill_entrypoint_owner: Optional[SkillKeywordIndex] = None
+
+
+def _get_local_skills(loader: SkillLoader) -> Dict[str, SkillConfig]:
+    """Get the installed skills for the loader's profile.
+
+    SKILL.md files are only re-parsed when the skills directory signature
+    (skill dirs and SKILL.md mtimes) changes. The returned dict is shared
+    between calls and must not be mutated.
+    """
+    return _get_local_skills_and_index(loader)[0]
+
+
+def _get_local_skills_and_index(loader: SkillLoader) -> Tuple[Dict[str, SkillConfig], SkillKeywordIndex]:
+    """Like _get_local_skills, plus the keyword index built over those skills."""
+    global _skill_entrypoint_owner
+    skills, index = loader.load_skills_with_index()
+    # スキルが再読込されたらエントリポイントも探し直す
+    if index is not _skill_entrypoint_owner:
+        _skill_entrypoint_cache.clear()
+        _skill_entrypoint_owner = index
+    return skills, index
+
+
 def search_skills(query: str, include_remote: bool = True) -> str:
     """Search for skills matching the query.
     
@@ -60,7 +175,21 @@ def search_skills(query: str, include_remote: bool = True) -> str:
     matched_names = set()
     
     # ローカルスキルをロード
-    local_skills = loader.load_skills()
+    local_skills, keyword_index = _get_local_skills_and_index(loader)
+
+    # スキル名と完全一致する場合は翻訳・埋め込み・リモート検索を行わずに即返す
+    q = query.strip().lower()
+    for name, skill in local_skills.items():
+        if name.lower() == q:
+            return _tool_json({
+                "message": "Found 1 skills",
+                "skills": [{
+                    "name": name,
+                    "description": skill.description[:200],
+                    "source": "local",
+                    "loaded": name in _loaded_skills
+                }]
+            })
     
     # スキルファイルが更新されていたらインデックス再構築
     if loader._needs_reindex():
@@ -70,7 +199,12 @@ def search_skills(query: str, include_remote: bool = True) -> str:
     if include_remote:
         try:
             # セマンティック検索（自動翻訳付き）
-            remote_results = loader._search_remote_semantic(query, "anthropics", top_k=5)
+            # 原文と英訳の両方を1回のバッチで埋め込み・検索し、スキルごとに最良スコアで統合
+            english_query = loader._translate_query_to_english(query)
+            queries = [query] if english_query == query else [query, english_query]
+            remote_results = loader._search_remote_semantic_batch(
+                queries, "anthropics", top_k=_SEARCH_TOP_K, keyword_query=query
+            )
             for r in remote_results:
                 name = r.get("name", "")
                 if name and name not in matched_names:
@@ -95,23 +229,28 @@ def search_skills(query: str, include_remote: bool = True) -> str:
             pass
     
     # ローカルスキルをキーワード検索（セマンティック検索でヒットしなかったもの）
-    for name, skill in local_skills.items():
-        if name not in matched_names and skill.matches_input(query):
-            matched_names.add(name)
-            results.append({
-                "name": name,
-                "description": skill.description[:200],
-                "source": "local",
-                "loaded": name in _loaded_skills
-            })
+    # セマンティック検索で上位件数が埋まっていれば省略する
+    if len(results) < _SEARCH_TOP_K:
+        # ここから先は読み取りのみ（match() は重複を返さない）
+        matched = frozenset(matched_names)
+        # 転置インデックスで候補を絞ってから matches_input() で確定する
+        for name in keyword_index.match(query):
+            if name not in matched:
+                skill = local_skills[name]
+                results.append({
+                    "name": name,
+                    "description": skill.description[:200],
+                    "source": "local",
+                    "loaded": name in _loaded_skills
+                })
     
     if not results:
-        return json.dumps({"message": f"No skills found for query: {query}", "skills": []})
+        return _tool_json({"message": f"No skills found for query: {query}", "skills": []})
     
-    return json.dumps({
+    return _tool_json({
         "message": f"Found {len(results)} skills",
         "skills": results
-    }, ensure_ascii=False, indent=2)
+    })
 
 
 def load_skill(skill_name: str, source: str = "auto") -> str:
@@ -134,7 +273,6 @@ def load_skill(skill_name: str, source: str = "auto") -> str:
         load_skill("pdf")
         load_skill("frontend-design", source="remote")
     """
-    global _loaded_skills
     loader = _get_loader()
     
     # 既にロード済みならキャッシュから返す
@@ -146,7 +284,7 @@ def load_skill(skill_name: str, source: str = "auto") -> str:
     
     # ローカルから探す
     if source in ("auto", "local"):
-        local_skills = loader.load_skills()
+        local_skills = _get_local_skills(loader)
         if skill_name in local_skills:
             skill = local_skills[skill_name]
     
@@ -182,17 +320,17 @@ def list_loaded_skills() -> str:
         JSON string with list of loaded skill names and descriptions
     """
     if not _loaded_skills:
-        return json.dumps({"message": "No skills currently loaded", "skills": []})
+        return _tool_json({"message": "No skills currently loaded", "skills": []})
     
     skills = [
         {"name": name, "description": skill.description[:100]}
         for name, skill in _loaded_skills.items()
     ]
     
-    return json.dumps({
+    return _tool_json({
         "message": f"{len(skills)} skills loaded",
         "skills": skills
-    }, ensure_ascii=False, indent=2)
+    })
 
 
 def clear_loaded_skills() -> str:
@@ -201,12 +339,410 @@ def clear_loaded_skills() -> str:
     Returns:
         Confirmation message
     """
-    global _loaded_skills
     count = len(_loaded_skills)
-    _loaded_skills = {}
+    _loaded_skills.clear()
     return f"Cleared {count} loaded skills from cache."
 
 
+# Python スキル常駐ワーカーのシム。
+# 1行1JSONのリクエスト {"script", "argv"} を受け取り、スクリプトを __main__ として実行して
+# {"returncode", "stdout", "stderr"} を1行で返す。インタプリタ起動と import は初回のみ。
+# fd 1/2 を一時ファイルへ差し替えるので、C拡張や子プロセスの出力もプロトコルを汚さない。
+_PY_WORKER_SHIM = r"""
+import json, os, runpy, sys, tempfile, traceback
+requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+saved_out, saved_err = os.dup(1), os.dup(2)
+base_path = list(sys.path)
+base_cwd = os.getcwd()
+for line in requests:
+    req = json.loads(line)
+    script = req["script"]
+    skill_dir = os.path.join(os.path.realpath(req["skill_dir"]), "")
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        code = 0
+        sys.argv = [script] + req["argv"]
+        sys.path[:] = [os.path.dirname(script)] + base_path[1:]
+        # 呼び出し側の cwd と環境変数で実行する（単発の python3 と同じ条件）
+        os.environ.clear()
+        os.environ.update(req["env"])
+        loaded = set(sys.modules)
+        try:
+            os.chdir(req["cwd"])
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_out, 1)
+            os.dup2(saved_err, 2)
+            os.chdir(base_cwd)
+            # スキル自身のモジュールは毎回読み直す（ヘルパーの編集を次の呼び出しに反映する）
+            for name in set(sys.modules) - loaded:
+                path = getattr(sys.modules.get(name), "__file__", None)
+                if path and os.path.realpath(path).startswith(skill_dir):
+                    sys.modules.pop(name, None)
+        out.seek(0)
+        err.seek(0)
+        responses.write(json.dumps({
+            "returncode": code,
+            "stdout": out.read().decode("utf-8", "replace"),
+            "stderr": err.read().decode("utf-8", "replace"),
+        }) + "\n")
+        responses.flush()
+"""
+
+def _skill_timeout() -> Optional[float]:
+    """Python スキル 1 回の実行時間の上限（秒）。MOCO_SKILL_TIMEOUT 未設定・0 以下・不正値なら無制限"""
+    value = os.environ.get("MOCO_SKILL_TIMEOUT", "").strip()
+    if not value:
+        return None
+    try:
+        timeout = float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid MOCO_SKILL_TIMEOUT={value!r}")
+        return None
+    return timeout if timeout > 0 else None
+
+
+class _PythonSkillWorker:
+    """Long-lived python3 process that runs one skill script per request.
+
+    The script is re-executed on every request, but interpreter startup and
+    third-party imports are paid only once. Between requests the worker
+    restores argv, sys.path and the cwd, takes the caller's current
+    environment, and drops every module loaded from the skill directory, so
+    edited helper modules are picked up. Modules imported from elsewhere
+    (stdlib, site-packages) stay loaded, including any monkeypatches the
+    script applied to them. Skills that rely on a pristine interpreter can
+    be run as one-off processes with MOCO_PYTHON_SKILL_WORKER=0.
+    """
+
+    def __init__(self, py_script: str, skill_dir: str):
+        self.py_script = py_script
+        self.skill_dir = skill_dir
+        self.mtime = os.stat(py_script).st_mtime_ns
+        self.lock = threading.Lock()
+        self.broken = False
+        self.retired = False  # 一覧から外された。実行中の呼び出しが終わったら閉じる
+        self.last_used = time.monotonic()
+        self.proc = subprocess.Popen(
+            ["python3", "-u", "-c", _PY_WORKER_SHIM],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+        )
+        # 応答はスレッドで読み、呼び出し側はタイムアウト付きで待つ
+        self._responses: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._read_responses, daemon=True).start()
+
+    def _read_responses(self) -> None:
+        try:
+            for line in self.proc.stdout:
+                self._responses.put(line)
+        except (OSError, ValueError):
+            pass
+        self._responses.put(None)  # EOF
+
+    def is_stale(self) -> bool:
+        try:
+            mtime = os.stat(self.py_script).st_mtime_ns
+        except OSError:
+            return True
+        return self.broken or self.proc.poll() is not None or mtime != self.mtime
+
+    def run(self, argv: List[str], timeout: Optional[float] = None) -> Optional[subprocess.CompletedProcess]:
+        """Run the script with argv.
+
+        Returns None if the worker could not accept the request, including
+        when it is busy with another call (the script did not run, so the
+        caller may run it elsewhere). Once the request is accepted, a dead
+        worker yields a failed result and a missed deadline raises
+        subprocess.TimeoutExpired; the worker is then marked broken.
+        """
+        if timeout is None:
+            timeout = _skill_timeout()
+        args = ["python3", self.py_script, *argv]
+        request = json.dumps({
+            "script": self.py_script,
+            "skill_dir": self.skill_dir,
+            "argv": argv,
+            "cwd": os.getcwd(),
+            "env": dict(os.environ),
+        })
+        # 実行中の呼び出しがあれば待たずに断る（呼び出し側が単発実行で並行に処理する）
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            if self.broken:
+                return None
+            try:
+                self.proc.stdin.write(request + "\n")
+                self.proc.stdin.flush()
+            except (OSError, ValueError):
+                self.broken = True
+                return None
+
+            try:
+                line = self._responses.get(timeout=timeout)
+            except queue.Empty:
+                self.broken = True
+                self.proc.kill()
+                raise subprocess.TimeoutExpired(args, timeout)
+
+            if line is not None:
+                try:
+                    res = json.loads(line)
+                    return subprocess.CompletedProcess(
+                        args, res["returncode"], res["stdout"], res["stderr"]
+                    )
+                except (ValueError, KeyError, TypeError):
+                    pass
+
+            # 実行途中でワーカーが終了した（os._exit やクラッシュ）。再実行はしない
+            self.broken = True
+            self.proc.kill()
+            try:
+                returncode = self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                returncode = None
+            return subprocess.CompletedProcess(
+                args,
+                returncode or 1,
+                "",
+                f"Python skill worker exited (code {returncode}) before returning a result",
+            )
+        finally:
+            self.last_used = time.monotonic()
+            self.lock.release()
+
+    def retire(self) -> bool:
+        """Stop accepting requests. Returns True if the worker is idle and
+        can be closed now; otherwise the in-flight caller closes it."""
+        # 先に印を付けてからロックを試す（実行中の呼び出しは終了時に retired を見て閉じる）
+        self.retired = True
+        if not self.lock.acquire(blocking=False):
+            return False
+        self.broken = True
+        self.lock.release()
+        return True
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+
+
+# 常駐ワーカー: {(skill_name, tool_name): _PythonSkillWorker}（最近使った順）
+_skill_workers: "OrderedDict[Tuple[str, str], _PythonSkillWorker]" = OrderedDict()
+_skill_workers_lock = threading.Lock()
+# 常駐させるワーカーの最大数（超えたら最も長く使われていないものから終了する）
+_MAX_SKILL_WORKERS = 8
+# この秒数使われなかったワーカーは終了する
+_SKILL_WORKER_IDLE_TIMEOUT = 300.0
+_skill_worker_reaper: Optional[threading.Thread] = None
+
+
+def _close_skill_workers() -> None:
+    with _skill_workers_lock:
+        for worker in _skill_workers.values():
+            worker.close()
+        _skill_workers.clear()
+
+
+atexit.register(_close_skill_workers)
+
+
+def _evict_skill_workers_locked(now: float) -> List[_PythonSkillWorker]:
+    """Drop idle and over-limit workers; return those to close.
+
+    Must be called with _skill_workers_lock held. Busy workers are taken
+    out of the table too and closed by their caller when the run ends.
+    """
+    to_close = []
+    for key, worker in list(_skill_workers.items()):
+        over_limit = len(_skill_workers) > _MAX_SKILL_WORKERS
+        idle = now - worker.last_used >= _SKILL_WORKER_IDLE_TIMEOUT and not worker.lock.locked()
+        if not (over_limit or idle):
+            continue
+        del _skill_workers[key]
+        if worker.retire():
+            to_close.append(worker)
+    return to_close
+
+
+def _reap_idle_skill_workers() -> None:
+    with _skill_workers_lock:
+        to_close = _evict_skill_workers_locked(time.monotonic())
+    for worker in to_close:
+        worker.close()
+
+
+def _reap_skill_workers_forever() -> None:
+    while True:
+        time.sleep(_SKILL_WORKER_IDLE_TIMEOUT / 4)
+        _reap_idle_skill_workers()
+
+
+def _start_skill_worker_reaper_locked() -> None:
+    global _skill_worker_reaper
+    if _skill_worker_reaper is None:
+        _skill_worker_reaper = threading.Thread(
+            target=_reap_skill_workers_forever, name="skill-worker-reaper", daemon=True
+        )
+        _skill_worker_reaper.start()
+
+
+def _discard_skill_worker(key: Tuple[str, str], worker: _PythonSkillWorker) -> None:
+    with _skill_workers_lock:
+        if _skill_workers.get(key) is worker:
+            del _skill_workers[key]
+    worker.close()
+
+
+def _run_python_skill(
+    skill_name: str, tool_name: str, skill_dir: str, py_script: str, argv: List[str]
+) -> subprocess.CompletedProcess:
+    """Run a Python skill script, via its persistent worker when possible.
+
+    Falls back to a one-off `python3 script ...` subprocess only if the
+    worker cannot be started or cannot accept the request (for example
+    because it is busy with a concurrent call), so the script never runs
+    twice for one call. Raises subprocess.TimeoutExpired if
+    MOCO_SKILL_TIMEOUT is set and the run takes longer.
+    """
+    key = (skill_name, tool_name)
+    worker = None
+    to_close: List[_PythonSkillWorker] = []
+    if os.environ.get("MOCO_PYTHON_SKILL_WORKER", "1") != "0":
+        try:
+            with _skill_workers_lock:
+                worker = _skill_workers.get(key)
+                if worker is not None and (worker.py_script != py_script or worker.is_stale()):
+                    del _skill_workers[key]
+                    if worker.retire():
+                        to_close.append(worker)
+                    worker = None
+                if worker is None:
+                    worker = _skill_workers[key] = _PythonSkillWorker(py_script, skill_dir)
+                    _start_skill_worker_reaper_locked()
+                else:
+                    worker.last_used = time.monotonic()
+                    _skill_workers.move_to_end(key)
+                to_close.extend(_evict_skill_workers_locked(time.monotonic()))
+        except OSError as e:
+            logger.debug(f"Python skill worker unavailable for {skill_name}.{tool_name}: {e}")
+        finally:
+            for old in to_close:
+                old.close()
+
+    if worker is not None:
+        result = None
+        try:
+            result = worker.run(argv)
+        finally:
+            # retired のワーカーは実行を受け付けた呼び出し（ロックを持っていた側）が閉じる
+            if worker.broken or (worker.retired and result is not None):
+                _discard_skill_worker(key, worker)
+        if result is not None:
+            return result
+        # ワーカーが要求を受け付けられなかった（実行中・書き込み失敗。スクリプトは未実行）ので単発実行する
+
+    return subprocess.run(
+        ["python3", py_script, *argv],
+        capture_output=True,
+        text=True,
+        check=False,
+        timeout=_skill_timeout(),
+    )
+
+
+# Python スキルの引数形式: {py_script: (mtime_ns, "kwargs" | "json")}
+_skill_arg_style: Dict[str, Tuple[int, str]] = {}
+
+# これらを import するスクリプトは --key value 形式の引数を受け取る
+_CLI_PARSER_MODULES = {"argparse", "optparse", "click", "typer", "fire"}
+
+
+def _detect_arg_style(py_script: str) -> Optional[str]:
+    """Guess how a skill script reads its arguments from its source.
+
+    Returns "kwargs" for scripts using a CLI parser (argparse, click, ...),
+    "json" for scripts that json.loads(sys.argv[1]), or None when unclear.
+    """
+    try:
+        with open(py_script, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=py_script)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    uses_argv1 = False
+    uses_json_loads = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] in _CLI_PARSER_MODULES for alias in node.names):
+                return "kwargs"
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and node.module.split(".")[0] in _CLI_PARSER_MODULES:
+                return "kwargs"
+        elif isinstance(node, ast.Subscript):
+            # sys.argv[1]
+            value = node.value
+            if (
+                isinstance(value, ast.Attribute) and value.attr == "argv"
+                and isinstance(node.slice, ast.Constant) and node.slice.value == 1
+            ):
+                uses_argv1 = True
+        elif isinstance(node, ast.Attribute) and node.attr == "loads":
+            if isinstance(node.value, ast.Name) and node.value.id == "json":
+                uses_json_loads = True
+
+    if uses_argv1 and uses_json_loads:
+        return "json"
+    return None
+
+
+def _get_arg_style(py_script: str) -> Optional[str]:
+    """Cached argument style of a skill script (re-detected when the script changes)."""
+    try:
+        mtime = os.stat(py_script).st_mtime_ns
+    except OSError:
+        return None
+    cached = _skill_arg_style.get(py_script)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    style = _detect_arg_style(py_script)
+    if style is not None:
+        _skill_arg_style[py_script] = (mtime, style)
+    else:
+        _skill_arg_style.pop(py_script, None)
+    return style
+
+
+def _set_arg_style(py_script: str, style: str) -> None:
+    """Remember the argument style that worked for a skill script."""
+    try:
+        _skill_arg_style[py_script] = (os.stat(py_script).st_mtime_ns, style)
+    except OSError:
+        pass
+
+
 def execute_skill(skill_name: str, tool_name: str, arguments: dict) -> str:
     """Execute a declared logic-based skill tool (JS/TS/Python).
 
@@ -222,12 +758,8 @@ def execute_skill(skill_name: str, tool_name: str, arguments: dict) -> str:
     Returns:
         JSON result string
     """
-    import subprocess
-    import os
-    import json
-    
     loader = _get_loader()
-    local_skills = loader.load_skills()
+    local_skills = _get_local_skills(loader)
     
     if skill_name not in local_skills:
         return f"Error: Skill '{skill_name}' not found locally."
@@ -245,11 +777,10 @@ def execute_skill(skill_name: str, tool_name: str, arguments: dict) -> str:
     
     skill_dir = skill.path
     
-    # JavaScript/TypeScript (index.js / index.ts)
-    js_path = os.path.join(skill_dir, "index.js")
-    ts_path = os.path.join(skill_dir, "index.ts")
+    entrypoint = _find_skill_entrypoint(skill_dir, tool_name)
     
-    if os.path.exists(js_path) or os.path.exists(ts_path):
+    # JavaScript/TypeScript (index.js / index.ts)
+    if entrypoint is not None and entrypoint[0] == "js":
         # Execute only the declared tool via JS bridge.
         # Node will resolve the skill directory to index.js/index.ts.
         from .js_bridge import execute_js_skill
@@ -259,58 +790,50 @@ def execute_skill(skill_name: str, tool_name: str, arguments: dict) -> str:
         except Exception as e:
             return f"Error executing JS skill tool '{skill_name}.{tool_name}': {e}"
 
-    # Python スクリプトとしての実行
-    # 1. 直接的なツール名.py を探す（宣言された tool_name のみ）
-    py_script = os.path.join(skill_dir, f"{tool_name}.py")
-    # 2. scripts/ツール名.py を探す
-    if not os.path.exists(py_script):
-        py_script = os.path.join(skill_dir, "scripts", f"{tool_name}.py")
-        
-    if os.path.exists(py_script):
+    # Python スクリプトとしての実行（<tool>.py または scripts/<tool>.py）
+    if entrypoint is not None:
+        py_script = entrypoint[1]
         try:
-            # 1. まず通常のコマンドライン引数として展開して渡す
-            args_list = ["python3", py_script]
-            
-            # target などの位置引数を特別扱いするか、一律に展開
-            for k, v in arguments.items():
-                if k in ("target", "input_file", "source", "path"): # positional arguments candidate
-                    args_list.append(str(v))
-                elif isinstance(v, bool):
-                    if v:
-                        args_list.append(f"--{k}")
-                else:
-                    args_list.extend([f"--{k}", str(v)])
-            
-            result = subprocess.run(
-                args_list,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            if result.returncode == 0:
-                out = (result.stdout or "").strip()
-                # If the output is JSON, return as-is to preserve structure.
-                try:
-                    json.loads(out)
-                    return out
-                except Exception:
-                    return out
+            # 引数の渡し方: kwargs（--key value で展開）または json（JSON文字列を単一引数、旧方式）
+            # 判明している形式があればそれだけを試し、失敗時の二重実行を避ける
+            style = _get_arg_style(py_script)
+
+            result = None
+            if style != "json":
+                # 1. まず通常のコマンドライン引数として展開して渡す
+                args_list = []
+                
+                # target などの位置引数を特別扱いするか、一律に展開
+                for k, v in arguments.items():
+                    if k in ("target", "input_file", "source", "path"): # positional arguments candidate
+                        args_list.append(str(v))
+                    elif isinstance(v, bool):
+                        if v:
+                            args_list.append(f"--{k}")
+                    else:
+                        args_list.extend([f"--{k}", str(v)])
+                
+                result = _run_python_skill(skill_name, tool_name, skill_dir, py_script, args_list)
+                
+                if result.returncode == 0:
+                    _set_arg_style(py_script, "kwargs")
+                    # JSON でもテキストでもそのまま返す（構造を保つため再パースはしない）
+                    return (result.stdout or "").strip()
             
-            # 2. 失敗した場合は、JSON文字列を単一引数として渡す（旧方式）
-            result_legacy = subprocess.run(
-                ["python3", py_script, json.dumps(arguments)],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            if result_legacy.returncode == 0:
-                out = (result_legacy.stdout or "").strip()
-                try:
-                    json.loads(out)
-                    return out
-                except Exception:
-                    return out
+            if style != "kwargs":
+                # 2. JSON文字列を単一引数として渡す（旧方式）
+                result_legacy = _run_python_skill(
+                    skill_name, tool_name, skill_dir, py_script, [json.dumps(arguments)]
+                )
+                if result_legacy.returncode == 0:
+                    _set_arg_style(py_script, "json")
+                    return (result_legacy.stdout or "").strip()
+                if result is None:
+                    result = result_legacy
+
+            # import エラーは引数形式と無関係なので、判定結果を捨てて次回は両方式を試す
+            if "ImportError" in result.stderr or "ModuleNotFoundError" in result.stderr:
+                _skill_arg_style.pop(py_script, None)
                 
             return f"Error executing Python skill:\nSTDERR: {result.stderr}\nSTDOUT: {result.stdout}"
         except Exception as e:
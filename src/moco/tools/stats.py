@@ -3,12 +3,35 @@
 """
 
 import os
+import sqlite3
+import threading
 from pathlib import Path
 from typing import Optional
 
 # 現在のセッションID（todo.py と同様のパターン）
 _current_session_id: Optional[str] = None
 
+# 統計テーブルのヘッダと行テンプレート（書式指定の解析は1回だけ）
+_AGENT_STATS_HEADER = (
+    "| エージェント | タスク数 | 成功率 | 平均トークン | 平均時間 | エラー率 |",
+    "|-------------|---------|--------|-------------|---------|---------|",
+)
+_AGENT_STATS_ROW = "| {} | {} | {}% | {:,} | {:.1f}s | {}% |".format
+_SESSION_STATS_HEADER = (
+    "| エージェント | メッセージ数 | 応答数 |",
+    "|-------------|-------------|--------|",
+)
+_SESSION_STATS_ROW = "| {} | {} | {} |".format
+
+# QualityTracker クラス（遅延 import）とインスタンス
+_QualityTracker = None
+_tracker = None
+
+# sessions.db への使い回し接続（DBパスが変わった場合のみ開き直す）
+_sessions_conn: Optional[sqlite3.Connection] = None
+_sessions_conn_path: Optional[str] = None
+_sessions_conn_lock = threading.Lock()
+
 
 def set_current_session(session_id: str) -> None:
     """現在のセッションIDを設定（Orchestrator から呼ばれる）"""
@@ -17,8 +40,12 @@ def set_current_session(session_id: str) -> None:
 
 
 def _get_tracker():
-    """QualityTracker インスタンスを取得"""
-    from ..core.optimizer.quality_tracker import QualityTracker
+    """QualityTracker インスタンスを取得（DBパスが同じ間は使い回す）"""
+    global _QualityTracker, _tracker
+    # 初回のみ import（optimizer パッケージの読み込みはツール呼び出しまで遅延）
+    if _QualityTracker is None:
+        from ..core.optimizer.quality_tracker import QualityTracker
+        _QualityTracker = QualityTracker
     
     # data ディレクトリのパスを解決
     data_dir = os.environ.get("MOCO_DATA_DIR")
@@ -28,7 +55,26 @@ def _get_tracker():
         data_dir = Path(data_dir)
     
     db_path = data_dir / "optimizer" / "metrics.db"
-    return QualityTracker(db_path=str(db_path))
+    if _tracker is None or _tracker.db_path != db_path:
+        _tracker = _QualityTracker(db_path=db_path)
+    return _tracker
+
+
+def _get_sessions_connection(db_path: str) -> sqlite3.Connection:
+    """sessions.db への共有接続を取得（呼び出し側で _sessions_conn_lock を保持すること）"""
+    global _sessions_conn, _sessions_conn_path
+    if _sessions_conn is None or _sessions_conn_path != db_path:
+        if _sessions_conn is not None:
+            _sessions_conn.close()
+            _sessions_conn = None
+        conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        # WAL: 読み取りが書き込み（SessionLogger）をブロックしない
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        _sessions_conn = conn
+        _sessions_conn_path = db_path
+    return _sessions_conn
 
 
 def get_agent_stats(days: int = 7) -> str:
@@ -60,15 +106,14 @@ def get_agent_stats(days: int = 7) -> str:
         if not stats:
             return "統計データがありません。"
         
-        lines = ["## エージェント統計（直近{}日）\n".format(days)]
-        lines.append("| エージェント | タスク数 | 成功率 | 平均トークン | 平均時間 | エラー率 |")
-        lines.append("|-------------|---------|--------|-------------|---------|---------|")
-        
-        for agent_name, data in stats.items():
-            lines.append(
-                f"| {agent_name} | {data['total']} | {data['success_rate']}% | "
-                f"{data['avg_tokens']:,} | {data['avg_time_ms']/1000:.1f}s | {data['error_rate']}% |"
+        lines = ["## エージェント統計（直近{}日）\n".format(days), *_AGENT_STATS_HEADER]
+        lines.extend(
+            _AGENT_STATS_ROW(
+                agent_name, data['total'], data['success_rate'],
+                data['avg_tokens'], data['avg_time_ms'] / 1000, data['error_rate'],
             )
+            for agent_name, data in stats.items()
+        )
         
         # 推奨コメント
         lines.append("\n### 💡 委譲の推奨")
@@ -121,10 +166,6 @@ def get_session_stats() -> str:
             data_dir = Path(data_dir)
         
         # セッション内のメッセージからエージェント活動を集計
-        import sqlite3
-        conn = sqlite3.connect(str(data_dir / "sessions.db"))
-        conn.row_factory = sqlite3.Row
-        
         # 現在のセッションとサブセッションの agent_id を集計
         query = """
             SELECT 
@@ -137,22 +178,21 @@ def get_session_stats() -> str:
             ORDER BY message_count DESC
         """
         
-        cursor = conn.execute(query, (_current_session_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with _sessions_conn_lock:
+            conn = _get_sessions_connection(str(data_dir / "sessions.db"))
+            rows = conn.execute(query, (_current_session_id,)).fetchall()
         
         if not rows:
             return "このセッションではまだエージェント活動がありません。"
         
-        lines = ["## 現在のセッション内活動状況\n"]
-        lines.append("| エージェント | メッセージ数 | 応答数 |")
-        lines.append("|-------------|-------------|--------|")
-        
-        for row in rows:
-            agent = row["agent_id"] or "orchestrator"
-            lines.append(f"| {agent} | {row['message_count']} | {row['responses']} |")
-        
-        return "\n".join(lines)
+        return "\n".join([
+            "## 現在のセッション内活動状況\n",
+            *_SESSION_STATS_HEADER,
+            *(
+                _SESSION_STATS_ROW(row["agent_id"] or "orchestrator", row["message_count"], row["responses"])
+                for row in rows
+            ),
+        ])
         
     except Exception as e:
         return f"セッション統計取得エラー: {e}"
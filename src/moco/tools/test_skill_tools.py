@@ -0,0 +1,254 @@
+"""
+Python スキル常駐ワーカーのテスト
+
+moco/tools/skill_tools.py の _run_python_skill / _PythonSkillWorker のテスト
+- スクリプトの状態（ヘルパーモジュール・cwd・環境変数）が呼び出し間で持ち越されないこと
+- ワーカーが要求を受け付けた後に落ちた場合は再実行しないこと
+- 要求を受け付けられなかった場合のみ単発実行にフォールバックすること
+- ワーカーが実行中なら待たずに単発実行で並行に処理すること
+- ワーカー数の上限を超えたら最も長く使われていないものを、一定時間使われなければそれを終了すること
+- タイムアウトは MOCO_SKILL_TIMEOUT を設定したときだけ有効で、超えたらワーカーを破棄すること
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from moco.tools import skill_tools
+
+
+def _write(path, source):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(textwrap.dedent(source))
+
+
+class TestPythonSkillWorker:
+    """常駐ワーカー経由の Python スキル実行"""
+
+    @pytest.fixture(autouse=True)
+    def clean_workers(self):
+        skill_tools._close_skill_workers()
+        yield
+        skill_tools._close_skill_workers()
+
+    @pytest.fixture
+    def skill_dir(self, tmp_path):
+        return str(tmp_path)
+
+    def _run(self, skill_dir, script, argv=()):
+        return skill_tools._run_python_skill("test_skill", "tool", skill_dir, script, list(argv))
+
+    def test_reuses_worker(self, skill_dir):
+        """2回目以降も同じワーカーで実行される"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, """
+            import os, sys
+            print(os.getpid(), sys.argv[1])
+        """)
+
+        first = self._run(skill_dir, script, ["a"])
+        second = self._run(skill_dir, script, ["b"])
+
+        assert first.returncode == 0 and second.returncode == 0
+        assert first.stdout.split()[1] == "a"
+        assert second.stdout.split()[1] == "b"
+        assert first.stdout.split()[0] == second.stdout.split()[0]
+
+    def test_helper_module_edit_is_picked_up(self, skill_dir):
+        """スキル内のヘルパーモジュールを編集したら次の呼び出しに反映される"""
+        script = os.path.join(skill_dir, "tool.py")
+        helper = os.path.join(skill_dir, "helper.py")
+        _write(script, """
+            import helper
+            print(helper.VALUE)
+        """)
+        _write(helper, "VALUE = 1\n")
+        assert self._run(skill_dir, script).stdout.strip() == "1"
+
+        _write(helper, "VALUE = 2\n")
+        assert self._run(skill_dir, script).stdout.strip() == "2"
+
+    def test_cwd_and_env_follow_caller(self, skill_dir, tmp_path, monkeypatch):
+        """スクリプト内の chdir / 環境変数の変更は次の呼び出しに持ち越されない"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, """
+            import os
+            print(os.getcwd())
+            print(os.environ.get("MOCO_TEST_VALUE", ""))
+            os.chdir("/")
+            os.environ["MOCO_TEST_VALUE"] = "leaked"
+        """)
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        monkeypatch.chdir(workdir)
+        monkeypatch.setenv("MOCO_TEST_VALUE", "caller")
+
+        for _ in range(2):
+            cwd, value = self._run(skill_dir, script).stdout.splitlines()
+            assert os.path.realpath(cwd) == os.path.realpath(str(workdir))
+            assert value == "caller"
+
+    def test_worker_death_after_accept_does_not_rerun(self, skill_dir, tmp_path):
+        """実行途中でワーカーが落ちた場合はエラーを返し、スクリプトを再実行しない"""
+        marker = tmp_path / "runs.txt"
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, f"""
+            import os
+            with open({str(marker)!r}, "a") as f:
+                f.write("x")
+            os._exit(3)
+        """)
+
+        result = self._run(skill_dir, script)
+
+        assert marker.read_text() == "x"
+        assert result.returncode == 3
+        assert "before returning a result" in result.stderr
+        assert ("test_skill", "tool") not in skill_tools._skill_workers
+
+    def test_falls_back_when_worker_cannot_accept(self, skill_dir, tmp_path):
+        """ワーカーが要求を受け付けられない場合は単発実行に切り替える（1回だけ実行）"""
+        marker = tmp_path / "runs.txt"
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, f"""
+            with open({str(marker)!r}, "a") as f:
+                f.write("x")
+            print("ok")
+        """)
+
+        self._run(skill_dir, script)
+        worker = skill_tools._skill_workers[("test_skill", "tool")]
+        worker.proc.stdin.close()  # 書き込めない状態にする
+
+        result = worker.run([])
+        assert result is None
+        assert worker.broken
+        assert marker.read_text() == "x"
+
+        result = self._run(skill_dir, script)
+        assert result.returncode == 0
+        assert result.stdout.strip() == "ok"
+        assert marker.read_text() == "xx"
+
+    def test_busy_worker_does_not_block(self, skill_dir):
+        """同じスキルの同時呼び出しは実行中のワーカーを待たずに並行で処理する"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, """
+            import os, time
+            time.sleep(0.5)
+            print(os.getpid())
+        """)
+        self._run(skill_dir, script)  # ワーカーを起動しておく
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self._run(skill_dir, script)))
+            for _ in range(2)
+        ]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        assert [r.returncode for r in results] == [0, 0]
+        assert len({r.stdout.strip() for r in results}) == 2
+        assert elapsed < 0.9
+        assert ("test_skill", "tool") in skill_tools._skill_workers
+
+    def test_worker_count_is_bounded(self, skill_dir, monkeypatch):
+        """上限を超えたら最も長く使われていないワーカーから終了する"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, "print('ok')\n")
+        monkeypatch.setattr(skill_tools, "_MAX_SKILL_WORKERS", 2)
+
+        workers = []
+        for name in ("a", "b", "c"):
+            skill_tools._run_python_skill(name, "tool", skill_dir, script, [])
+            workers.append(skill_tools._skill_workers[(name, "tool")])
+
+        assert list(skill_tools._skill_workers) == [("b", "tool"), ("c", "tool")]
+        assert workers[0].proc.poll() is not None
+
+    def test_idle_workers_are_reaped(self, skill_dir, monkeypatch):
+        """一定時間使われていないワーカーは終了する"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, "print('ok')\n")
+        self._run(skill_dir, script)
+        worker = skill_tools._skill_workers[("test_skill", "tool")]
+
+        skill_tools._reap_idle_skill_workers()
+        assert ("test_skill", "tool") in skill_tools._skill_workers
+
+        monkeypatch.setattr(skill_tools, "_SKILL_WORKER_IDLE_TIMEOUT", 0.0)
+        skill_tools._reap_idle_skill_workers()
+
+        assert skill_tools._skill_workers == {}
+        assert worker.proc.poll() is not None
+
+    def test_busy_worker_is_closed_after_its_run(self, skill_dir):
+        """実行中に一覧から外されたワーカーは、その実行が終わってから終了する"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, """
+            import time
+            time.sleep(0.3)
+            print("done")
+        """)
+        self._run(skill_dir, script)
+        worker = skill_tools._skill_workers[("test_skill", "tool")]
+
+        results = []
+        t = threading.Thread(target=lambda: results.append(self._run(skill_dir, script)))
+        t.start()
+        time.sleep(0.1)
+        with skill_tools._skill_workers_lock:
+            del skill_tools._skill_workers[("test_skill", "tool")]
+        assert not worker.retire()
+        assert worker.proc.poll() is None
+        t.join()
+
+        assert results[0].stdout.strip() == "done"
+        assert worker.proc.wait(timeout=2) is not None
+
+    def test_timeout_kills_worker(self, skill_dir, monkeypatch):
+        """タイムアウトしたら TimeoutExpired を送出し、ワーカーを破棄する"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, """
+            import time
+            time.sleep(30)
+        """)
+        monkeypatch.setenv("MOCO_SKILL_TIMEOUT", "0.5")
+
+        with pytest.raises(subprocess.TimeoutExpired):
+            self._run(skill_dir, script)
+
+        assert ("test_skill", "tool") not in skill_tools._skill_workers
+
+    @pytest.mark.parametrize("value", [None, "", "0", "-1", "abc"])
+    def test_no_timeout_by_default(self, value, monkeypatch):
+        """MOCO_SKILL_TIMEOUT が未設定・0 以下・不正値なら無制限"""
+        if value is None:
+            monkeypatch.delenv("MOCO_SKILL_TIMEOUT", raising=False)
+        else:
+            monkeypatch.setenv("MOCO_SKILL_TIMEOUT", value)
+
+        assert skill_tools._skill_timeout() is None
+
+    def test_worker_can_be_disabled(self, skill_dir, monkeypatch):
+        """MOCO_PYTHON_SKILL_WORKER=0 なら常に単発実行する"""
+        script = os.path.join(skill_dir, "tool.py")
+        _write(script, "print('ok')\n")
+        monkeypatch.setenv("MOCO_PYTHON_SKILL_WORKER", "0")
+
+        result = self._run(skill_dir, script)
+
+        assert result.stdout.strip() == "ok"
+        assert skill_tools._skill_workers == {}
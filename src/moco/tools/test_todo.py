@@ -0,0 +1,136 @@
+"""
+todo ツールの書き込み集約（遅延保存）のテスト
+
+moco/tools/todo.py の todowrite / todoread のテスト
+- 初回は同期保存、以降は集約して最新の1件だけを保存すること
+- 遅延保存が失敗した場合は次の呼び出しで警告を返し、同期保存に戻ること
+- 遅延保存は1本の常駐スレッドで行うこと
+- 保存済みセッションの記録が上限を超えないこと
+"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from moco.tools import todo
+
+
+class FakeSessionLogger:
+    """save_todos / get_todos だけを持つ SessionLogger の代用"""
+
+    def __init__(self):
+        self.saved = {}
+        self.calls = []
+        self.fail = False
+
+    def save_todos(self, session_id, todos):
+        self.calls.append((session_id, threading.current_thread().name, todos))
+        if self.fail:
+            raise RuntimeError("database is locked")
+        self.saved[session_id] = todos
+
+    def get_todos(self, session_id):
+        return self.saved.get(session_id, [])
+
+    def get_parent_session_id(self, session_id):
+        return "parent"
+
+
+def _todos(n):
+    return [{"id": str(i), "content": f"task {i}", "status": "pending"} for i in range(n)]
+
+
+def _wait_for_flush():
+    deadline = time.monotonic() + 2.0
+    while time.monotonic() < deadline:
+        with todo._pending_lock:
+            if not todo._pending_todos:
+                break
+        time.sleep(0.01)
+    # 保存処理中なら終わるのを待つ
+    with todo._flush_lock:
+        pass
+
+
+class TestTodoWriteDebounce:
+    """todowrite の遅延保存"""
+
+    @pytest.fixture
+    def fake_logger(self):
+        fake = FakeSessionLogger()
+        todo._flush_pending_todos()
+        todo._written_sessions.clear()
+        todo._flush_errors.clear()
+        with patch.object(todo, "_get_logger", return_value=fake):
+            todo._current_session_id_var.set("SES-TEST")
+            yield fake
+            todo._flush_pending_todos()
+        todo._written_sessions.clear()
+        todo._flush_errors.clear()
+
+    def test_first_write_is_synchronous(self, fake_logger):
+        """初回は同期保存し、保存済みと返す"""
+        result = todo.todowrite(_todos(2))
+
+        assert "saved to session" in result
+        assert fake_logger.saved["SES-TEST"] == _todos(2)
+
+    def test_later_writes_are_coalesced(self, fake_logger):
+        """2回目以降は保存待ちと返し、最新の1件だけを保存する"""
+        todo.todowrite(_todos(1))
+        results = [todo.todowrite(_todos(n)) for n in (2, 3, 4)]
+
+        assert all("queued for saving" in r for r in results)
+        _wait_for_flush()
+        assert fake_logger.saved["SES-TEST"] == _todos(4)
+        assert [len(t) for sid, _, t in fake_logger.calls] == [1, 4]
+
+    def test_todoread_flushes_pending(self, fake_logger):
+        """todoread は保留中の書き込みを反映してから読む"""
+        todo.todowrite(_todos(1))
+        todo.todowrite(_todos(3))
+
+        result = todo.todoread()
+
+        assert "task 2" in result
+
+    def test_flush_error_is_reported_on_next_call(self, fake_logger):
+        """遅延保存の失敗は次の呼び出しで警告し、同期保存に戻る"""
+        todo.todowrite(_todos(1))
+        fake_logger.fail = True
+        todo.todowrite(_todos(2))
+        _wait_for_flush()
+        assert "SES-TEST" not in todo._written_sessions
+
+        fake_logger.fail = False
+        result = todo.todowrite(_todos(3))
+
+        assert result.startswith("Warning: a previous todo update was not saved (database is locked)")
+        assert "saved to session" in result
+        assert fake_logger.saved["SES-TEST"] == _todos(3)
+
+    def test_flushes_run_on_one_thread(self, fake_logger):
+        """遅延保存は毎回同じ常駐スレッドで行う"""
+        todo.todowrite(_todos(1))
+        for n in (2, 3):
+            todo.todowrite(_todos(n))
+            _wait_for_flush()
+
+        flush_threads = {name for _, name, _ in fake_logger.calls[1:]}
+        assert flush_threads == {"todo-flush"}
+        assert len(fake_logger.calls) == 3
+
+    def test_written_sessions_are_bounded(self, fake_logger):
+        """保存済みセッションの記録は上限を超えない"""
+        with patch.object(todo, "_WRITTEN_SESSIONS_MAX", 3):
+            for i in range(5):
+                todo._current_session_id_var.set(f"SES-{i}")
+                todo.todowrite(_todos(1))
+
+        assert list(todo._written_sessions) == ["SES-2", "SES-3", "SES-4"]
@@ -1,32 +1,74 @@
-from typing import List, Dict, Any, Union, Optional
+from typing import List, Dict, Any, Iterator, Union, Optional
 import ast
+import atexit
 import json
+import logging
 import re
 import sys
 import os
+import threading
+import time
+from collections import OrderedDict
 from contextvars import ContextVar
 
 # 動的インポート対応: 相対インポートが使えない場合は絶対パスでインポート
 try:
-    from ..storage.session_logger import SessionLogger
+    from ..storage.session_logger import SessionLogger, _get_default_db_path
 except ImportError:
     # moco のルートをパスに追加
     _moco_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     if _moco_root not in sys.path:
         sys.path.insert(0, _moco_root)
-    from storage.session_logger import SessionLogger
+    from storage.session_logger import SessionLogger, _get_default_db_path
+
+try:
+    import orjson
+    # orjson.loads は str もそのまま受け付け、失敗時は json.JSONDecodeError のサブクラスを送出する
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
 
 # グローバルセッションID（Orchestratorが設定する）
 _current_session_id_var: ContextVar[Optional[str]] = ContextVar("_current_session_id", default=None)
 
-_CODE_FENCE_RE = re.compile(
-    r"^\s*```(?:json|python|txt)?\s*\n(?P<body>[\s\S]*?)\n```\s*$",
-    re.IGNORECASE,
-)
-_TODOWRITE_WRAPPER_RE = re.compile(
-    r"^\s*todowrite\s*\(\s*(?P<body>[\s\S]*?)\s*\)\s*;?\s*$",
-    re.IGNORECASE,
-)
+# todo ステータスの表示アイコン
+_STATUS_ICONS = {
+    "pending": "⬜",
+    "in_progress": "🔄",
+    "completed": "✅",
+    "cancelled": "❌",
+}
+_DEFAULT_ICON = "?"
+
+# todo ツール用の SessionLogger（遅延初期化、DBパスが変わった場合のみ作り直す）
+_session_logger: Optional[SessionLogger] = None
+
+# todowrite の書き込み集約: 連続した更新はセッションごとに最新の1件だけを保存する
+_TODO_FLUSH_DELAY = 0.1  # 秒
+_TODO_FLUSH_MAX_PENDING = 8  # 保留セッション数がこれを超えたら即時保存
+_pending_todos: Dict[str, List[Dict[str, Any]]] = {}
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()  # 保存順序を保つため、保存処理は直列化する
+_flush_wakeup = threading.Event()  # 保存スレッドを起こす
+_flush_thread: Optional[threading.Thread] = None  # 遅延保存を行う常駐スレッド（接続を使い回すため1本だけ）
+# 初回保存が成功したセッション（以降は遅延保存）。古いものから忘れる（忘れたら次回は同期保存になるだけ）
+_WRITTEN_SESSIONS_MAX = 1024
+_written_sessions: "OrderedDict[str, None]" = OrderedDict()
+# 遅延保存に失敗したセッションとそのエラー（次の todowrite / todoread で返す）
+_flush_errors: Dict[str, str] = {}
+
+# コードフェンスで許容する言語指定（大文字小文字は区別しない）
+_FENCE_LANGS = ("", "json", "python", "txt")
+
+# JSON リテラル → Python リテラル（ast.literal_eval 用、1パスで置換）
+_BOOL_NULL_RE = re.compile(r"\b(true|false|null)\b", re.IGNORECASE)
+_BOOL_NULL_MAP = {"true": "True", "false": "False", "null": "None"}
+# クォートなしのキー / 値
+_UNQUOTED_KEY_RE = re.compile(r'(\{|,)\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:')
+_UNQUOTED_VALUE_RE = re.compile(r':\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(,|})')
 
 _SMART_QUOTES = str.maketrans(
     {
@@ -40,56 +82,59 @@ _SMART_QUOTES = str.maketrans(
         "‛": "'",
     }
 )
+# 上記8文字（U+2018〜U+201F）の有無をC実装で判定するためのパターン
+_SMART_QUOTE_RE = re.compile("[\u2018-\u201f]")
 
 
-def _parse_todos_loose(value: str) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+def _parse_todos_loose(value: Union[str, List[Dict[str, Any]], Dict[str, Any]]) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """LLMが生成した「JSONっぽい文字列」をできるだけ受け付ける。"""
+    # パース済み（プログラムからの呼び出し）ならクリーンアップ不要
+    if isinstance(value, (list, dict)):
+        return _unwrap_todos(value)
+
     s = (value or "").strip()
 
     # 空文字列や null/None は空リストとして扱う
     if not s or s.lower() in ("null", "none", "undefined"):
         return []
 
+    # 正しいJSONならクリーンアップ処理を一切通さずに返す（LLM出力の大半はこれ）
+    # 前後の括弧が対応していない（説明文が混ざる等）場合は失敗が明らかなので試さない
+    if (s[0], s[-1]) in (("[", "]"), ("{", "}")):
+        try:
+            return _unwrap_todos(_json_loads(s))
+        except json.JSONDecodeError:
+            pass
+
     # コードフェンスを除去
-    m = _CODE_FENCE_RE.match(s)
-    if m:
-        s = (m.group("body") or "").strip()
+    s = _strip_code_fence(s)
 
     # "todowrite(...)" のラッパを除去
-    m = _TODOWRITE_WRAPPER_RE.match(s)
-    if m:
-        s = (m.group("body") or "").strip()
+    s = _strip_todowrite_wrapper(s)
 
-    # スマートクォートを通常のクォートへ
-    s = s.translate(_SMART_QUOTES)
+    # スマートクォートを通常のクォートへ（含まれない場合はコピーを作らない）
+    # 日本語の todo は非ASCIIなので isascii() だけでは判定できない
+    if not s.isascii() and _SMART_QUOTE_RE.search(s):
+        s = s.translate(_SMART_QUOTES)
 
     # 末尾に説明文が混ざるケースがあるので、最初の配列/オブジェクトっぽい部分だけ抜き出す
-    first_bracket = min([i for i in [s.find("["), s.find("{")] if i != -1], default=-1)
-    if first_bracket >= 0:
-        if first_bracket > 0:
-            s = s[first_bracket:].strip()
-        if "[" in s and "]" in s:
-            s = s[: s.rfind("]") + 1].strip()
-        elif "{" in s and "}" in s:
-            s = s[: s.rfind("}") + 1].strip()
+    s = _slice_outer_json(s)
 
     # まずは厳密JSON
     try:
-        obj = json.loads(s)
+        obj = _json_loads(s)
     except json.JSONDecodeError:
         # フォールバック: Pythonリテラル
-        s2 = re.sub(r"\btrue\b", "True", s, flags=re.IGNORECASE)
-        s2 = re.sub(r"\bfalse\b", "False", s2, flags=re.IGNORECASE)
-        s2 = re.sub(r"\bnull\b", "None", s2, flags=re.IGNORECASE)
+        s2 = _BOOL_NULL_RE.sub(lambda m: _BOOL_NULL_MAP[m.group(1).lower()], s)
 
         try:
             obj = ast.literal_eval(s2)
         except (ValueError, SyntaxError):
             # さらにフォールバック: クォートなしのキー/値を補正
-            s3 = re.sub(r'(\{|,)\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', s2)
-            s3 = re.sub(r':\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(,|})', r':"\1"\2', s3)
+            s3 = _UNQUOTED_KEY_RE.sub(r'\1"\2":', s2)
+            s3 = _UNQUOTED_VALUE_RE.sub(r':"\1"\2', s3)
             try:
-                obj = json.loads(s3)
+                obj = _json_loads(s3)
             except json.JSONDecodeError:
                 try:
                     obj = ast.literal_eval(s3)
@@ -101,15 +146,144 @@ def _parse_todos_loose(value: str) -> Union[List[Dict[str, Any]], Dict[str, Any]
                         return [{"id": "1", "content": clean_text, "status": "pending"}]
                     raise Exception(f"Failed to parse todos: {s}")
 
-    # {"todos": [...]} のラップを許容
-    if isinstance(obj, dict) and "todos" in obj:
-        obj = obj["todos"]
+    return _unwrap_todos(obj)
+
 
+def _strip_code_fence(s: str) -> str:
+    """```json ... ``` のコードフェンスを除去（s は strip 済み）"""
+    if not (s.startswith("```") and s.endswith("\n```")):
+        return s
+    nl = s.find("\n")
+    if nl >= len(s) - 4 or s[3:nl].strip().lower() not in _FENCE_LANGS:
+        return s
+    return s[nl + 1:-4].strip()
+
+
+def _strip_todowrite_wrapper(s: str) -> str:
+    """todowrite(...) / todowrite(...); のラッパを除去（s は strip 済み）"""
+    if s[:9].lower() != "todowrite":
+        return s
+    body = s[9:].lstrip()
+    if not body.startswith("("):
+        return s
+    body = body[1:]
+    if body.endswith(";"):
+        body = body[:-1].rstrip()
+    if not body.endswith(")"):
+        return s
+    return body[:-1].strip()
+
+
+def _slice_outer_json(s: str) -> str:
+    """最初の [ / { から、それに対応する種類の最後の閉じ括弧までを切り出す。
+
+    先頭側は find、末尾側は rfind の1回ずつ（いずれもC実装の走査）で済ませる。
+    閉じ括弧が見つからなければ開き括弧以降をそのまま返す。
+    """
+    open_square = s.find("[")
+    # [ より前にある { だけを探せば十分
+    open_curly = s.find("{", 0, open_square if open_square != -1 else len(s))
+    first_open = open_curly if open_curly != -1 else open_square
+    if first_open == -1:
+        return s
+
+    close = "]" if s[first_open] == "[" else "}"
+    last_close = s.rfind(close, first_open)
+    end = last_close + 1 if last_close != -1 else len(s)
+    return s[first_open:end].strip()
+
+
+def _unwrap_todos(obj: Any) -> Any:
+    """{"todos": [...]} のラップを許容"""
+    if isinstance(obj, dict) and "todos" in obj:
+        return obj["todos"]
     return obj
 
 
+def _get_logger() -> SessionLogger:
+    """Get the shared SessionLogger, recreating it only when the DB path changes."""
+    global _session_logger
+    db_path = _get_default_db_path()
+    if _session_logger is None or _session_logger.db_path != db_path:
+        # todo ツールのメソッドは接続を入れ子で使わないので、接続を使い回す
+        _session_logger = SessionLogger(db_path=db_path, persistent_connection=True)
+    return _session_logger
+
+
+def _flush_pending_todos(session_id: Optional[str] = None) -> None:
+    """保留中の todo を保存する（session_id 指定時はそのセッションのみ）"""
+    with _flush_lock:
+        with _pending_lock:
+            if session_id is None:
+                items = list(_pending_todos.items())
+                _pending_todos.clear()
+            elif session_id in _pending_todos:
+                items = [(session_id, _pending_todos.pop(session_id))]
+            else:
+                items = []
+        if not items:
+            return
+        session_logger = _get_logger()
+        for sid, todos in items:
+            try:
+                session_logger.save_todos(sid, todos)
+            except Exception as e:
+                logger.error(f"Failed to save pending todos for {sid}: {e}")
+                with _pending_lock:
+                    _flush_errors[sid] = str(e)
+                    # 次回は同期保存に戻してエラーをそのまま返す
+                    _written_sessions.pop(sid, None)
+
+
+def _flush_worker() -> None:
+    """保留中の todo を _TODO_FLUSH_DELAY 秒ごとにまとめて保存する常駐スレッド"""
+    while True:
+        _flush_wakeup.wait()
+        # 連続した更新を集約するため少し待つ
+        time.sleep(_TODO_FLUSH_DELAY)
+        _flush_wakeup.clear()
+        _flush_pending_todos()
+
+
+def _queue_todos(session_id: str, todos: List[Dict[str, Any]]) -> None:
+    """todo の保存を _TODO_FLUSH_DELAY 秒後にまとめて行う（同一セッションは最新のみ）"""
+    global _flush_thread
+    with _pending_lock:
+        _pending_todos[session_id] = todos
+        flush_now = len(_pending_todos) > _TODO_FLUSH_MAX_PENDING
+        if not flush_now and _flush_thread is None:
+            _flush_thread = threading.Thread(target=_flush_worker, name="todo-flush", daemon=True)
+            _flush_thread.start()
+    if flush_now:
+        _flush_pending_todos()
+    else:
+        _flush_wakeup.set()
+
+
+def _mark_written(session_id: str) -> None:
+    with _pending_lock:
+        _written_sessions[session_id] = None
+        _written_sessions.move_to_end(session_id)
+        while len(_written_sessions) > _WRITTEN_SESSIONS_MAX:
+            _written_sessions.popitem(last=False)
+
+
+def _pop_flush_error(session_id: str) -> str:
+    """前回の遅延保存が失敗していれば、その旨の警告文を返す（なければ空文字列）"""
+    with _pending_lock:
+        error = _flush_errors.pop(session_id, None)
+    if error is None:
+        return ""
+    return f"Warning: a previous todo update was not saved ({error}).\n"
+
+
+atexit.register(_flush_pending_todos)
+
+
 def set_current_session(session_id: str) -> None:
     """現在のセッションIDを設定（Orchestratorから呼ばれる）"""
+    # セッション切替前に保留中の書き込みを確定させる
+    _flush_pending_todos()
     _current_session_id_var.set(session_id)
 
 def get_current_session() -> Optional[str]:
@@ -133,9 +307,10 @@ def todowrite(todos: Union[str, List[Dict[str, Any]]]) -> str:
     if not session_id:
         return "Error: No active session. This tool must be called during an orchestration session."
 
-    logger = SessionLogger()
+    logger = _get_logger()
+    warning = _pop_flush_error(session_id)
     try:
-        if isinstance(todos, str):
+        if isinstance(todos, (str, dict)):
             todos = _parse_todos_loose(todos)
 
         if isinstance(todos, dict):
@@ -146,10 +321,24 @@ def todowrite(todos: Union[str, List[Dict[str, Any]]]) -> str:
         if any(not isinstance(t, dict) for t in todos):
             return "Error: Invalid JSON format for todos"
 
+        if session_id in _written_sessions:
+            _queue_todos(session_id, todos)
+            return f"{warning}Todo list updated. {len(todos)} items queued for saving to session."
+
+        # 初回（または前回の遅延保存の失敗後）は同期保存し、セッション不在などのエラーをそのまま返す
+        _flush_pending_todos(session_id)
         logger.save_todos(session_id, todos)
-        return f"Todo list updated successfully. {len(todos)} items saved to session."
+        _mark_written(session_id)
+        return f"{warning}Todo list updated successfully. {len(todos)} items saved to session."
     except Exception as e:
-        return f"Error updating todo list: {e}"
+        return f"{warning}Error updating todo list: {e}"
+
+def _format_todo_lines(todos: List[Dict[str, Any]]) -> Iterator[str]:
+    """todo を1件1行の表示文字列として順に返す"""
+    icons = _STATUS_ICONS
+    for t in todos:
+        yield f"{icons.get(t.get('status', 'pending'), _DEFAULT_ICON)} [{t.get('id', '?')}] {t.get('content', 'No content')}"
+
 
 def todoread() -> str:
     """
@@ -161,46 +350,31 @@ def todoread() -> str:
     if not session_id:
         return "Error: No active session. This tool must be called during an orchestration session."
 
-    logger = SessionLogger()
+    logger = _get_logger()
+    # 遅延中の書き込みを反映してから読む
+    _flush_pending_todos(session_id)
+    warning = _pop_flush_error(session_id)
 
     # Check if this is a sub-agent session
     is_sub_agent = False
     try:
-        conn = logger._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT metadata FROM sessions WHERE session_id = ?", (session_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row and row[0]:
-            metadata = json.loads(row[0])
-            if metadata.get("parent_session_id"):
-                is_sub_agent = True
+        is_sub_agent = bool(logger.get_parent_session_id(session_id))
     except Exception:
         pass
 
     # If it's the orchestrator (no parent session), show all todos hierarchically
     if not is_sub_agent:
-        return todoread_all()
+        return warning + todoread_all()
 
     # Otherwise, show only the current agent's todos
     todos = logger.get_todos(session_id)
 
     if not todos:
-        return "No todos found for current session."
-
-    status_icons = {
-        "pending": "⬜",
-        "in_progress": "🔄",
-        "completed": "✅",
-        "cancelled": "❌"
-    }
+        return f"{warning}No todos found for current session."
 
     lines = ["=== Current Todo List ==="]
-    for t in todos:
-        icon = status_icons.get(t.get("status", "pending"), "?")
-        lines.append(f"{icon} [{t.get('id', '?')}] {t.get('content', 'No content')}")
-
-    return "\n".join(lines)
+    lines.extend(_format_todo_lines(todos))
+    return warning + "\n".join(lines)
 
 def todoread_all() -> str:
     """
@@ -211,43 +385,27 @@ def todoread_all() -> str:
     if not session_id:
         return "Error: No active session."
 
-    logger = SessionLogger()
-    status_icons = {
-        "pending": "⬜",
-        "in_progress": "🔄",
-        "completed": "✅",
-        "cancelled": "❌"
-    }
+    logger = _get_logger()
+    # サブエージェント分も含め、遅延中の書き込みを反映してから読む
+    _flush_pending_todos()
 
     all_lines = []
     main_todos = logger.get_todos(session_id)
     all_lines.append("=== orchestrator ===")
     if main_todos:
-        for t in main_todos:
-            icon = status_icons.get(t.get("status", "pending"), "?")
-            all_lines.append(f"{icon} [{t.get('id', '?')}] {t.get('content', 'No content')}")
+        all_lines.extend(_format_todo_lines(main_todos))
     else:
         all_lines.append("(no todos)")
 
     try:
-        conn = logger._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT session_id, title FROM sessions
-            WHERE metadata LIKE ?
-            ORDER BY created_at
-        """, (f'%"parent_session_id": "{session_id}"%',))
-        sub_sessions = cursor.fetchall()
-        conn.close()
-
-        for sub_session_id, title in sub_sessions:
+        # サブセッションと各 todo を1クエリで取得
+        for sub_session in logger.get_sub_session_todos(session_id):
+            title = sub_session["title"]
             agent_name = title.replace("Sub: @", "") if title.startswith("Sub: @") else title
-            sub_todos = logger.get_todos(sub_session_id)
+            sub_todos = sub_session["todos"]
             all_lines.append(f"\n=== {agent_name} ===")
             if sub_todos:
-                for t in sub_todos:
-                    icon = status_icons.get(t.get("status", "pending"), "?")
-                    all_lines.append(f"{icon} [{t.get('id', '?')}] {t.get('content', 'No content')}")
+                all_lines.extend(_format_todo_lines(sub_todos))
             else:
                 all_lines.append("(no todos)")
 
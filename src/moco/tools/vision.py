@@ -8,6 +8,8 @@ import socket
 from typing import Optional
 from urllib.parse import urlparse
 
+from ..config import get_settings
+
 # オプショナル依存の遅延インポート
 _GENAI_AVAILABLE = None
 _OPENAI_AVAILABLE = None
@@ -50,6 +52,12 @@ EXTENSION_TO_MIME = {
     ".bmp": "image/bmp",
 }
 
+# Base64で使われる文字
+_B64_CHARS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
+# ファイルをBase64化するときの読み込み単位（3の倍数）
+_B64_CHUNK_SIZE = 3 * 64 * 1024
+
 
 def _is_url(source: str) -> bool:
     """URLかどうか判定"""
@@ -73,7 +81,7 @@ def _is_private_ip(url: str) -> bool:
             ip = ipaddress.ip_address(hostname)
             return ip.is_private or ip.is_loopback or ip.is_reserved
         except ValueError:
-            # ホスト名の場合は DNS 解決
+            # ホスト名の場合は DNS 解決（DNS リバインディング対策のため毎回解決し、キャッシュしない）
             try:
                 ip_str = socket.gethostbyname(hostname)
                 ip = ipaddress.ip_address(ip_str)
@@ -91,9 +99,12 @@ def _is_base64(source: str) -> bool:
         return True
     # 純粋なBase64（長い文字列で、Base64文字のみ）
     if len(source) > 100:
-        base64_pattern = re.compile(r"^[A-Za-z0-9+/=]+$")
         # 最初の1000文字で判定（パフォーマンス考慮）
-        return bool(base64_pattern.match(source[:1000]))
+        head = source[:1000]
+        if not head.isascii():
+            return False
+        # Base64文字を削除して何も残らなければ全てBase64文字（C実装の1パス）
+        return not head.encode("ascii").translate(None, _B64_CHARS)
     return False
 
 
@@ -104,8 +115,18 @@ def _is_file_path(source: str) -> bool:
 
 def _get_mime_type_from_path(file_path: str) -> str:
     """ファイルパスからMIMEタイプを取得"""
-    ext = os.path.splitext(file_path)[1].lower()
-    return EXTENSION_TO_MIME.get(ext, "image/png")
+    # splitext より軽い rpartition で拡張子を取り出す（"/" を含む末尾はどのキーにも一致しない）
+    ext = file_path.rpartition(".")[2].lower()
+    return EXTENSION_TO_MIME.get("." + ext, "image/png")
+
+
+def _load_image_bytes(file_path: str) -> tuple[bytes, str]:
+    """ファイルを読み込んで生バイト列とMIMEタイプを返す（Gemini用、Base64化しない）"""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Image file not found: {file_path}")
+
+    with open(file_path, "rb") as f:
+        return f.read(), _get_mime_type_from_path(file_path)
 
 
 def _load_image_as_base64(file_path: str) -> tuple[str, str]:
@@ -115,10 +136,14 @@ def _load_image_as_base64(file_path: str) -> tuple[str, str]:
 
     mime_type = _get_mime_type_from_path(file_path)
 
+    # 3の倍数のチャンクごとにエンコード（パディングが途中に入らない）
+    # 画像全体の生バイト列とBase64の両方を同時に保持しない
+    encoded = bytearray()
     with open(file_path, "rb") as f:
-        image_data = f.read()
+        while chunk := f.read(_B64_CHUNK_SIZE):
+            encoded += base64.b64encode(chunk)
 
-    return base64.b64encode(image_data).decode("utf-8"), mime_type
+    return encoded.decode("ascii"), mime_type
 
 
 def _parse_base64_source(source: str) -> tuple[str, str]:
@@ -132,13 +157,33 @@ def _parse_base64_source(source: str) -> tuple[str, str]:
     return source, "image/png"  # デフォルトはPNG
 
 
+def _get_gemini_api_key() -> Optional[str]:
+    """Gemini の APIキーを取得（GENAI_API_KEY > GEMINI_API_KEY > GOOGLE_API_KEY）"""
+    return get_settings().genai_api_key
+
+
+# URL画像ダウンロード用の共有HTTPクライアント（接続を再利用してTLSハンドシェイクを省く）
+_HTTP_CLIENT = None
+
+
+def _get_http_client():
+    """URL画像ダウンロード用の httpx.Client を取得（初回のみ生成）"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        import httpx
+        # urllib.request.urlopen と同様にリダイレクトを追従する
+        _HTTP_CLIENT = httpx.Client(timeout=30, follow_redirects=True)
+    return _HTTP_CLIENT
+
+
 def _detect_provider() -> Optional[str]:
     """環境変数からプロバイダを自動検出"""
-    if os.environ.get("GENAI_API_KEY") or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY"):
+    settings = get_settings()
+    if settings.genai_api_key:
         return "gemini"
-    if os.environ.get("OPENAI_API_KEY"):
+    if settings.openai_api_key:
         return "openai"
-    if os.environ.get("OPENROUTER_API_KEY"):
+    if settings.openrouter_api_key:
         return "openrouter"
     return None
 
@@ -148,15 +193,16 @@ def _analyze_with_gemini(
     question: str,
     base64_data: Optional[str] = None,
     mime_type: str = "image/png",
+    image_bytes: Optional[bytes] = None,
 ) -> str:
-    """Gemini Vision APIで画像を解析"""
+    """Gemini Vision APIで画像を解析（image_bytes があれば Base64 を経由せずそのまま送る）"""
     if not _check_genai():
         return "Error: google-generativeai is not installed. Install with: pip install google-generativeai"
 
     from google import genai
     from google.genai import types
 
-    api_key = os.environ.get("GENAI_API_KEY") or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    api_key = _get_gemini_api_key()
     if not api_key:
         return "Error: GENAI_API_KEY, GEMINI_API_KEY, GOOGLE_API_KEY, or GENAI_API_KEY environment variable not set"
 
@@ -166,35 +212,36 @@ def _analyze_with_gemini(
     # コンテンツを構築
     parts = []
 
-    if _is_url(image_source) and not base64_data:
+    if _is_url(image_source) and not base64_data and image_bytes is None:
         # URLの場合: Gemini はURLを直接処理できないため、ダウンロードが必要
         # SSRF対策
         if _is_private_ip(image_source):
             return "Error: Access to private/internal URLs is not allowed"
         try:
-            import urllib.request
-            with urllib.request.urlopen(image_source, timeout=30) as response:
-                image_data = response.read()
-                base64_data = base64.b64encode(image_data).decode("utf-8")
-                # URLから拡張子を推測
-                parsed = urlparse(image_source)
-                ext = os.path.splitext(parsed.path)[1].lower()
-                mime_type = EXTENSION_TO_MIME.get(ext, "image/png")
+            response = _get_http_client().get(image_source)
+            response.raise_for_status()
+            image_bytes = response.content
+            # URLから拡張子を推測
+            mime_type = _get_mime_type_from_path(urlparse(image_source).path)
         except Exception as e:
             return f"Error downloading image from URL: {e}"
 
-    if base64_data:
+    if image_bytes is None and base64_data:
+        # Base64文字列で渡された画像のみデコードが必要
+        image_bytes = base64.b64decode(base64_data)
+
+    if image_bytes is not None:
         parts = [
             types.Part(
                 inline_data=types.Blob(
                     mime_type=mime_type,
-                    data=base64.b64decode(base64_data),
+                    data=image_bytes,
                 )
             ),
             types.Part(text=question),
         ]
     else:
-        # base64_dataがない場合（通常は発生しない）
+        # 画像データがない場合（通常は発生しない）
         parts = [types.Part(text=question)]
 
     try:
@@ -230,13 +277,13 @@ def _analyze_with_openai(
     from openai import OpenAI
 
     if is_openrouter:
-        api_key = os.environ.get("OPENROUTER_API_KEY")
+        api_key = get_settings().openrouter_api_key
         base_url = "https://openrouter.ai/api/v1"
         model = os.environ.get("OPENROUTER_VISION_MODEL", "openai/gpt-4o")
         if not api_key:
             return "Error: OPENROUTER_API_KEY environment variable not set"
     else:
-        api_key = os.environ.get("OPENAI_API_KEY")
+        api_key = get_settings().openai_api_key
         base_url = None
         model = os.environ.get("OPENAI_VISION_MODEL", "gpt-4o")
         if not api_key:
@@ -347,6 +394,7 @@ def analyze_image(
 
     # 画像ソースの処理
     base64_data: Optional[str] = None
+    image_bytes: Optional[bytes] = None  # Gemini 用の生データ（Base64化を省く）
     mime_type = "image/png"
 
     if _is_url(image_source):
@@ -358,7 +406,11 @@ def analyze_image(
     elif _is_file_path(image_source):
         # ファイルパス
         try:
-            base64_data, mime_type = _load_image_as_base64(image_source)
+            if provider == "gemini":
+                image_bytes, mime_type = _load_image_bytes(image_source)
+            else:
+                # OpenAI 系は data URL が必要
+                base64_data, mime_type = _load_image_as_base64(image_source)
         except FileNotFoundError as e:
             return f"Error: {e}"
         except Exception as e:
@@ -368,7 +420,7 @@ def analyze_image(
 
     # プロバイダ別の処理
     if provider == "gemini":
-        return _analyze_with_gemini(image_source, question, base64_data, mime_type)
+        return _analyze_with_gemini(image_source, question, base64_data, mime_type, image_bytes)
     elif provider == "openai":
         return _analyze_with_openai(image_source, question, base64_data, mime_type, is_openrouter=False)
     elif provider == "openrouter":
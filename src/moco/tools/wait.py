@@ -27,7 +27,10 @@ def wait(seconds: float) -> str:
             return f"Error: Maximum wait time is 300 seconds (5 minutes). Requested: {seconds}"
         if seconds < 0:
             return "Error: Wait time cannot be negative."
-        
+        # 0秒待機は sleep のシステムコールを省略
+        if seconds == 0:
+            return f"Waited {seconds} seconds."
+
         time.sleep(seconds)
         return f"Waited {seconds} seconds."
     except (ValueError, TypeError) as e:
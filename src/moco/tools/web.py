@@ -5,8 +5,13 @@ Web関連ツール - Gemini Grounding ベース
 BeautifulSoup や Google Custom Search API を使わず、
 Gemini の Google Search Grounding 機能で Web 検索を実行
 """
-import os
-from typing import List, Optional
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from ..config import get_settings
 
 try:
     from google import genai
@@ -18,6 +23,47 @@ except ImportError:
     HAS_GENAI = False
 
 
+def _resolve_api_key() -> Optional[str]:
+    """Gemini の API キーを取得（GENAI_API_KEY > GEMINI_API_KEY > GOOGLE_API_KEY）"""
+    return get_settings().genai_api_key
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key: str):
+    """API キーごとに genai.Client を使い回す（HTTP コネクションプールを共有）"""
+    return genai.Client(api_key=api_key)
+
+
+# 同一クエリの再実行（リトライや複数エージェントからの重複呼び出し）を抑える結果キャッシュ
+_RESULT_CACHE_TTL = 600.0  # 秒
+_RESULT_CACHE_MAX = 256
+_result_cache: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _cache_get(key: Tuple) -> Optional[str]:
+    """有効期限内のキャッシュ結果を取得"""
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at >= _RESULT_CACHE_TTL:
+            del _result_cache[key]
+            return None
+        _result_cache.move_to_end(key)
+        return result
+
+
+def _cache_put(key: Tuple, result: str) -> None:
+    """結果をキャッシュ（上限を超えたら最も古いものから破棄）"""
+    with _result_cache_lock:
+        _result_cache[key] = (time.monotonic(), result)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > _RESULT_CACHE_MAX:
+            _result_cache.popitem(last=False)
+
+
 def websearch(query: str, site_filter: Optional[str] = None) -> str:
     """
     Gemini の Google Search Grounding を使用して Web 検索を実行します。
@@ -32,18 +78,23 @@ def websearch(query: str, site_filter: Optional[str] = None) -> str:
     if not HAS_GENAI:
         return "Error: google-genai がインストールされていません。pip install google-genai を実行してください。"
 
-    api_key = os.getenv("GENAI_API_KEY") or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    api_key = _resolve_api_key()
 
     if not api_key:
         return "Error: API キーが設定されていません (GENAI_API_KEY / GEMINI_API_KEY / GOOGLE_API_KEY)"
 
+    cache_key = ("websearch", query, site_filter)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     # サイト制限がある場合、クエリを修正
     search_query = query
     if site_filter:
         search_query = f"site:{site_filter} {query}"
 
     try:
-        client = genai.Client(api_key=api_key)
+        client = _get_client(api_key)
 
         # Google Search Grounding を有効にして生成
         response = client.models.generate_content(
@@ -66,7 +117,9 @@ def websearch(query: str, site_filter: Optional[str] = None) -> str:
             for source in sources[:5]:  # 最大5件
                 result_parts.append(f"  - {source['title']}: {source['url']}")
 
-        return "\n".join(result_parts)
+        result = "\n".join(result_parts)
+        _cache_put(cache_key, result)
+        return result
 
     except Exception as e:
         return f"Error: Web検索に失敗しました: {e}"
@@ -74,26 +127,24 @@ def websearch(query: str, site_filter: Optional[str] = None) -> str:
 
 def _extract_grounding_sources(response) -> List[dict]:
     """Grounding のソース情報を抽出"""
-    sources = []
-
     try:
-        if hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
-            if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
-                metadata = candidate.grounding_metadata
-                if hasattr(metadata, 'grounding_chunks') and metadata.grounding_chunks:
-                    for chunk in metadata.grounding_chunks:
-                        if hasattr(chunk, 'web') and chunk.web:
-                            # Vertex AI のリダイレクト URL から実際の URL を取得するのは難しいので、
-                            # タイトルとリダイレクト URL をそのまま使用
-                            sources.append({
-                                'title': chunk.web.title if hasattr(chunk.web, 'title') else 'Unknown',
-                                'url': chunk.web.uri if hasattr(chunk.web, 'uri') else ''
-                            })
+        candidates = getattr(response, 'candidates', None)
+        if not candidates:
+            return []
+        metadata = getattr(candidates[0], 'grounding_metadata', None)
+        chunks = getattr(metadata, 'grounding_chunks', None) or ()
+        # Vertex AI のリダイレクト URL から実際の URL を取得するのは難しいので、
+        # タイトルとリダイレクト URL をそのまま使用
+        return [
+            {
+                'title': getattr(web, 'title', 'Unknown'),
+                'url': getattr(web, 'uri', ''),
+            }
+            for web in (getattr(chunk, 'web', None) for chunk in chunks)
+            if web
+        ]
     except Exception:
-        pass  # メタデータ取得に失敗しても回答は返す
-
-    return sources
+        return []  # メタデータ取得に失敗しても回答は返す
 
 
 def webfetch(url: str, question: Optional[str] = None) -> str:
@@ -110,16 +161,21 @@ def webfetch(url: str, question: Optional[str] = None) -> str:
     if not HAS_GENAI:
         return "Error: google-genai がインストールされていません。"
 
-    api_key = os.getenv("GENAI_API_KEY") or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    api_key = _resolve_api_key()
 
     if not api_key:
         return "Error: API キーが設定されていません (GENAI_API_KEY / GEMINI_API_KEY / GOOGLE_API_KEY)"
 
+    cache_key = ("webfetch", url, question)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     prompt = question or "この URL の内容を日本語で簡潔に要約してください。"
     full_prompt = f"以下の URL の内容について回答してください。\n\nURL: {url}\n\n質問: {prompt}"
 
     try:
-        client = genai.Client(api_key=api_key)
+        client = _get_client(api_key)
 
         # Grounding で URL の内容を取得
         response = client.models.generate_content(
@@ -130,7 +186,9 @@ def webfetch(url: str, question: Optional[str] = None) -> str:
             )
         )
 
-        return f"URL: {url}\n\n{response.text}"
+        result = f"URL: {url}\n\n{response.text}"
+        _cache_put(cache_key, result)
+        return result
 
     except Exception as e:
         return f"Error: URL の取得に失敗しました: {e}"
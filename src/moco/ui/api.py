@@ -5,15 +5,17 @@ ChatGPT-like interface
 # ruff: noqa: E402
 import os
 import secrets
+import stat
 import re
 import asyncio
 import base64
-import queue
 import tempfile
 import threading
 import time
 import uuid
-from typing import Optional, Any, Dict, List, Tuple
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Optional, Any, Deque, Dict, List, Tuple
 from fastapi import FastAPI, HTTPException, WebSocket, Query, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, StreamingResponse
@@ -23,13 +25,16 @@ import sqlite3
 import logging
 from dotenv import load_dotenv, find_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # .env を読み込む（親方向に自動探索）
 load_dotenv(find_dotenv())
 
 # moco imports
-import sys
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
+from moco.config import get_settings
 from moco.core.orchestrator import Orchestrator
 from moco.storage.session_logger import SessionLogger
 from moco.tools.discovery import _find_profiles_dir
@@ -47,6 +52,10 @@ from moco.adapters.telegram_adapter import TelegramAdapter
 from moco.adapters.base import OutgoingMessage, ChannelAdapter
 
 
+# "@agent: 応答" の区切りパターン（マッチは "@" を1つしか含まないため、後方から探せば最後の区切りが得られる）
+_AGENT_MARKER_RE = re.compile(r'(@[\w-]+):\s*')
+
+
 def filter_response_for_display(response: str, verbose: bool = False) -> str:
     """レスポンスをフィルタリング（verboseでない場合は最後のエージェントだけ）"""
     if not response:
@@ -54,13 +63,19 @@ def filter_response_for_display(response: str, verbose: bool = False) -> str:
     if verbose:
         return response
 
-    # @agent: 応答 のパターンで分割
-    sections = re.split(r'(@[\w-]+):\s*', response)
+    # 最後の "@agent:" を後ろから探す（全体を分割せずに済む）
+    match = None
+    pos = response.rfind("@")
+    while pos != -1:
+        match = _AGENT_MARKER_RE.match(response, pos)
+        if match:
+            break
+        pos = response.rfind("@", 0, pos)
 
-    if len(sections) > 1:
+    if match:
         # 最後のエージェントの結果だけを取得
-        last_agent = sections[-2] if len(sections) >= 2 else ""
-        last_content = sections[-1].strip() if sections[-1] else ""
+        last_agent = match.group(1)
+        last_content = response[match.end():].strip()
 
         # orchestrator の最終回答は省略しない
         if last_agent == "@orchestrator":
@@ -85,11 +100,12 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """終了時にトンネルを停止"""
+    """終了時にトンネルを停止し、統計DBの接続を閉じる"""
     try:
         stop_tunnel()
     except Exception as e:
         logger.error(f"Error during tunnel shutdown: {e}")
+    _close_stats_connections()
 
 # 静的ファイルのマウント
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -101,33 +117,83 @@ logger = logging.getLogger(__name__)
 
 # ===== Approval (tool execution gating) =====
 # Used by UI and by `src/moco/ui/test_approval.py`.
+# 変更はすべてイベントループ上のコルーチンから行うため、ロックは使わない
 pending_approvals: Dict[str, Dict[str, Any]] = {}
-pending_approvals_lock = threading.Lock()
+# セッションごとの承認待ち ID（古い順）。最新の承認待ちを全件走査せずに引くための索引
+session_pending_approvals: Dict[str, Deque[str]] = defaultdict(deque)
+
+
+def _dumps_json(obj: Any, indent: bool = False) -> str:
+    """JSON 文字列化（orjson があれば使用、非ASCIIはエスケープしない）"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+
+# WebSocket 1件あたりの送信タイムアウト（秒）。詰まったクライアントが他の送信を止めないようにする
+_WS_SEND_TIMEOUT = 2.0
+# UI WebSocket ごとの未送信メッセージの上限（超えたら古いものから破棄）
+_WS_QUEUE_SIZE = 128
+# SSE でイベントが途絶えたときにハートビートを送る間隔（秒）
+_SSE_HEARTBEAT_INTERVAL = 30.0
+
+
+async def _send_ws_json(ws: Any, payload: Dict[str, Any], text: Optional[str] = None) -> bool:
+    """WebSocket へ JSON を送信（失敗・タイムアウト時は例外を送出）
+
+    text に文字列化済みの payload を渡すと、send_text を持つ WebSocket には再シリアライズせずに送る。
+    """
+    if hasattr(ws, "send_text"):
+        send = ws.send_text(text if text is not None else _dumps_json(payload))
+    elif hasattr(ws, "send_json"):
+        send = ws.send_json(payload)
+    else:
+        return False
+    await asyncio.wait_for(send, _WS_SEND_TIMEOUT)
+    return True
+
+
+async def _broadcast_json(websockets: List[Any], payload: Dict[str, Any]) -> List[Any]:
+    """複数の WebSocket へ並列送信し、各送信の結果（True/False または例外）を返す"""
+    if not websockets:
+        return []
+    # 全クライアント共通の文字列を1回だけ生成する
+    text = _dumps_json(payload)
+    return await asyncio.gather(
+        *(_send_ws_json(ws, payload, text) for ws in websockets), return_exceptions=True
+    )
 
 
 class ApprovalManager:
     def __init__(self):
         self.pending_approvals = pending_approvals
-        self.pending_approvals_lock = pending_approvals_lock
+        self.session_pending = session_pending_approvals
         self.session_websockets: Dict[str, list[Any]] = {}
+        # UI WebSocket ごとの送信キューと送信タスク（遅いクライアントが送信側を止めないようにする）
+        self._ws_senders: Dict[int, Tuple[asyncio.Queue, asyncio.Task]] = {}  # id(websocket) をキーにする
         self.gateway_clients: Dict[str, Any] = {}
         
         # 外部通知用アダプターの管理
         self.adapters: List[ChannelAdapter] = []
         
-        line_token = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
-        line_secret = os.getenv("LINE_CHANNEL_SECRET")
-        if line_token:
-            self.adapters.append(LINEAdapter(line_token, line_secret))
-            
-        tg_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        if tg_token:
-            self.adapters.append(TelegramAdapter(tg_token))
+        settings = get_settings()
+        if settings.line_channel_access_token:
+            self.adapters.append(LINEAdapter(settings.line_channel_access_token, settings.line_channel_secret))
+
+        if settings.telegram_bot_token:
+            self.adapters.append(TelegramAdapter(settings.telegram_bot_token))
 
     async def register_websocket(self, session_id: str, websocket: Any) -> None:
         self.session_websockets.setdefault(session_id, []).append(websocket)
+        queue_: asyncio.Queue = asyncio.Queue(maxsize=_WS_QUEUE_SIZE)
+        task = asyncio.create_task(self._pump_websocket(session_id, websocket, queue_))
+        self._ws_senders[id(websocket)] = (queue_, task)
 
     async def unregister_websocket(self, session_id: str, websocket: Any) -> None:
+        sender = self._ws_senders.pop(id(websocket), None)
+        if sender and sender[1] is not asyncio.current_task():
+            sender[1].cancel()
         ws_list = self.session_websockets.get(session_id) or []
         try:
             ws_list.remove(websocket)
@@ -136,6 +202,20 @@ class ApprovalManager:
         if not ws_list:
             self.session_websockets.pop(session_id, None)
 
+    async def _pump_websocket(self, session_id: str, websocket: Any, queue_: asyncio.Queue) -> None:
+        """キューに積まれたメッセージを順に送信（失敗・タイムアウトしたら登録解除）"""
+        while True:
+            payload, text = await queue_.get()
+            try:
+                sent = await _send_ws_json(websocket, payload, text)
+                error = None if sent else "unsupported websocket"
+            except Exception as e:
+                error = repr(e)
+            if error is not None:
+                logger.warning(f"Dropping websocket for session {session_id} after send failure: {error}")
+                await self.unregister_websocket(session_id, websocket)
+                return
+
     async def register_gateway_client(self, client_id: str, websocket: Any) -> None:
         self.gateway_clients[client_id] = websocket
 
@@ -143,21 +223,22 @@ class ApprovalManager:
         self.gateway_clients.pop(client_id, None)
 
     async def _send_to_session(self, session_id: str, payload: Dict[str, Any]) -> bool:
+        """
+        セッションの UI WebSocket の送信キューへ payload を積む。
+        True は「キューに積んだ」ことを表し、送信の成否ではない（失敗したクライアントは送信タスク側で登録解除される）。
+        """
         ws_list = self.session_websockets.get(session_id) or []
-        # UI WebSockets
-        sent = False
-        for ws in list(ws_list):
-            try:
-                if hasattr(ws, "send_json"):
-                    await ws.send_json(payload)
-                    sent = True
-                elif hasattr(ws, "send_text"):
-                    import json
-                    await ws.send_text(json.dumps(payload, ensure_ascii=False))
-                    sent = True
-            except Exception:
-                continue
-        return sent
+        queues = [self._ws_senders[id(ws)][0] for ws in ws_list if id(ws) in self._ws_senders]
+        if not queues:
+            return False
+        # UI WebSockets: 各クライアントの送信キューに積むだけで待たない
+        # キューが一杯（クライアントが詰まっている）なら最も古いメッセージを捨てる
+        item = (payload, _dumps_json(payload))
+        for queue_ in queues:
+            if queue_.full():
+                queue_.get_nowait()
+            queue_.put_nowait(item)
+        return True
 
     async def _notify_gateway_clients(self, approval_id: str, tool: str, args: dict, session_id: str):
         """Gateway経由でモバイルに通知"""
@@ -172,12 +253,11 @@ class ApprovalManager:
             }
         }
         
-        # WebSocket クライアントへ送信
+        # WebSocket クライアントへ並列送信し、失敗したクライアントを除外
         clients = list(self.gateway_clients.items())
-        for client_id, ws in clients:
-            try:
-                await ws.send_json(message)
-            except Exception:
+        results = await _broadcast_json([ws for _, ws in clients], message)
+        for (client_id, _), result in zip(clients, results):
+            if isinstance(result, Exception):
                 self.gateway_clients.pop(client_id, None)
 
         # 外部チャネル（LINE/Telegram）へプッシュ送信
@@ -195,53 +275,68 @@ class ApprovalManager:
         """
         sent_count = 0
         clients = list(self.gateway_clients.items())
-        for client_id, ws in clients:
-            try:
-                await ws.send_json(message)
-                sent_count += 1
-            except Exception as e:
-                logger.warning(f"Failed to send to gateway client {client_id}: {e}")
+        results = await _broadcast_json([ws for _, ws in clients], message)
+        for (client_id, _), result in zip(clients, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to send to gateway client {client_id}: {result!r}")
                 self.gateway_clients.pop(client_id, None)
+            elif result:
+                sent_count += 1
         return sent_count
 
 
     async def _push_external_notifications(self, approval_id: str, tool: str, args: dict):
         """LINE/Telegramにプッシュ通知を送信"""
-        text = f"承認リクエスト: {tool}\n引数: {json.dumps(args, ensure_ascii=False, indent=2)}"
-        raw_payload = {
-            "approval_id": approval_id,
-            "tool": tool,
-            "args": args
-        }
-        msg = OutgoingMessage(text=text, raw_payload=raw_payload)
+        if not self.adapters:
+            return
 
         # 全てのアダプターに対して送信を試みる
         # LINE_USER_ID や TELEGRAM_CHAT_ID は環境変数から取得（将来的にDB管理が望ましい）
+        settings = get_settings()
         targets = {
-            "line": os.getenv("LINE_USER_ID"),
-            "telegram": os.getenv("TELEGRAM_CHAT_ID")
+            "line": settings.line_user_id,
+            "telegram": settings.telegram_chat_id
         }
-
+        recipients = []
         for adapter in self.adapters:
-            channel = "line" if isinstance(adapter, LINEAdapter) else "telegram"
+            channel = adapter.channel_name()
             target_id = targets.get(channel)
             if target_id:
-                try:
-                    await adapter.send_message(target_id, msg)
-                    logger.info(f"Sent approval request to {channel}: {approval_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send {channel} notification: {e}")
+                recipients.append((channel, adapter, target_id))
+        if not recipients:
+            return
+
+        # 送信先がある場合のみメッセージを組み立てる
+        text = f"承認リクエスト: {tool}\n引数: {_dumps_json(args, indent=True)}"
+        raw_payload = {
+            "approval_id": approval_id,
+            "tool": tool,
+            "args": args
+        }
+        msg = OutgoingMessage(text=text, raw_payload=raw_payload)
+
+        channels = [channel for channel, _, _ in recipients]
+        sends = [adapter.send_message(target_id, msg) for _, adapter, target_id in recipients]
+
+        # チャネル同士は独立しているので並列に送信する
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for channel, result in zip(channels, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to send {channel} notification: {result}")
+            else:
+                logger.info(f"Sent approval request to {channel}: {approval_id}")
 
     async def create_approval_request(self, approval_id: str, tool: str, args: Dict[str, Any], session_id: str) -> bool:
-        with self.pending_approvals_lock:
-            event = threading.Event()
-            self.pending_approvals[approval_id] = {
-                "event": event,
-                "decision": False,
-                "tool": tool,
-                "args": args or {},
-                "session_id": session_id,
-            }
+        # 待機はイベントループ上で行う（承認待ちごとにスレッドを占有しない）
+        self.pending_approvals[approval_id] = {
+            "event": asyncio.Event(),
+            "loop": asyncio.get_running_loop(),
+            "decision": False,
+            "tool": tool,
+            "args": args or {},
+            "session_id": session_id,
+        }
+        self.session_pending[session_id].append(approval_id)
 
         # Web UIへ通知
         await self._send_to_session(
@@ -260,33 +355,78 @@ class ApprovalManager:
         
         return True
 
+    @staticmethod
+    def _set_decision(item: Dict[str, Any], approved: bool) -> None:
+        item["decision"] = bool(approved)
+        event = item.get("event")
+        if isinstance(event, (asyncio.Event, threading.Event)):
+            event.set()
+
     async def respond_to_approval(self, approval_id: str, approved: bool) -> bool:
-        with self.pending_approvals_lock:
-            item = self.pending_approvals.get(approval_id)
-            if not item:
-                return False
-            item["decision"] = bool(approved)
-            event = item.get("event")
-            if isinstance(event, threading.Event):
-                event.set()
+        item = self.pending_approvals.get(approval_id)
+        if not item:
+            return False
+        loop = item.get("loop")
+        if loop is None or loop is asyncio.get_running_loop():
+            self._set_decision(item, approved)
+        else:
+            # 別のイベントループ（Gateway のスレッド等）から呼ばれた場合は待機側のループで反映する
+            loop.call_soon_threadsafe(self._set_decision, item, approved)
         return True
 
     async def wait_for_decision(self, approval_id: str, timeout: float = 30.0) -> bool:
-        with self.pending_approvals_lock:
-            item = self.pending_approvals.get(approval_id)
-            if not item:
-                return False
-            event = item.get("event")
-            if not isinstance(event, threading.Event):
-                return False
-
-        decided = await asyncio.to_thread(event.wait, timeout)
-        with self.pending_approvals_lock:
-            item = self.pending_approvals.pop(approval_id, None)
+        item = self.pending_approvals.get(approval_id)
+        if not item:
+            return False
+        event = item.get("event")
+
+        if isinstance(event, asyncio.Event):
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+                decided = True
+            except asyncio.TimeoutError:
+                decided = False
+        elif isinstance(event, threading.Event):
+            # 外部から threading.Event で登録された承認要求（互換）
+            decided = await asyncio.to_thread(event.wait, timeout)
+        else:
+            return False
+
+        item = self.pending_approvals.pop(approval_id, None)
+        if item:
+            self._discard_from_session(item.get("session_id"), approval_id)
         if not decided or not item:
             return False
         return bool(item.get("decision"))
 
+    def _discard_from_session(self, session_id: Optional[str], approval_id: str) -> None:
+        ids = self.session_pending.get(session_id)
+        if ids is None:
+            return
+        try:
+            ids.remove(approval_id)
+        except ValueError:
+            pass
+        if not ids:
+            self.session_pending.pop(session_id, None)
+
+    def latest_pending_approval(self, session_id: str) -> Optional[str]:
+        """セッションの最新の承認待ち ID（なければ None）"""
+        ids = self.session_pending.get(session_id)
+        if ids is not None:
+            # 索引を経由せずに取り除かれたものは末尾から遅延的に掃除する
+            while ids and ids[-1] not in self.pending_approvals:
+                ids.pop()
+            if ids:
+                return ids[-1]
+            self.session_pending.pop(session_id, None)
+        # 索引を経由せずに pending_approvals へ直接登録されたもの（外部連携・テスト）は全件走査で探す
+        latest = None
+        for approval_id, item in self.pending_approvals.items():
+            if item.get("session_id") == session_id:
+                latest = approval_id
+        return latest
+
 
 approval_manager = ApprovalManager()
 
@@ -305,16 +445,99 @@ def get_orchestrator(profile: str, provider: str = "openrouter", verbose: bool =
 
 
 # 一時ファイルを管理するためのディレクトリ
-_TEMP_ATTACHMENTS_DIR = os.path.join(tempfile.gettempdir(), "moco_attachments")
-os.makedirs(_TEMP_ATTACHMENTS_DIR, exist_ok=True)
+# 添付ファイル名の重複回避用ID（暗号用途ではないため、まとめて取得した乱数を切り出して使う）
+_RAND_BUF_SIZE = 1024
+_rand_buf = threading.local()
+
+
+def _short_id() -> str:
+    """8桁の16進IDを返す（スレッドごとの乱数バッファから4バイトずつ消費）"""
+    buf = getattr(_rand_buf, "data", b"")
+    pos = getattr(_rand_buf, "pos", 0)
+    if pos + 4 > len(buf):
+        buf = _rand_buf.data = os.urandom(_RAND_BUF_SIZE)
+        pos = 0
+    _rand_buf.pos = pos + 4
+    return buf[pos:pos + 4].hex()
+
+
+@lru_cache(maxsize=None)
+def _temp_attachments_dir() -> str:
+    """添付ファイル用の一時ディレクトリ（初回使用時に作成）"""
+    path = os.path.join(tempfile.gettempdir(), "moco_attachments")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# Base64 添付のデコード単位（4の倍数）。デコード後のデータ全体をメモリに載せない
+_B64_DECODE_CHUNK = 64 * 1024
+# Base64 アルファベット以外の文字（改行・data URL 接頭辞など）
+_NON_B64_RE = re.compile(r"[^A-Za-z0-9+/=]")
 
 
-def process_attachments(attachments: Optional[List["Attachment"]], message: str) -> Tuple[str, List[str]]:
+def _write_base64_file(file_path: str, data: str) -> None:
+    """Base64 文字列をチャンク単位でデコードしながらファイルへ書き込む"""
+    try:
+        with open(file_path, "wb") as f:
+            if _NON_B64_RE.search(data):
+                # 区切りがずれるため、余分な文字を含む場合は従来どおり一括デコード
+                f.write(base64.b64decode(data))
+            else:
+                for start in range(0, len(data), _B64_DECODE_CHUNK):
+                    f.write(base64.b64decode(data[start:start + _B64_DECODE_CHUNK]))
+    except Exception:
+        # 書きかけのファイルを残さない
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
+
+
+async def _process_attachment(att: "Attachment") -> Tuple[str, Optional[str]]:
+    """添付ファイル1件を処理し、(メッセージに追加する情報, 作成した一時ファイル) を返す"""
+    try:
+        temp_file = None
+        # pathがあればそのまま使用（WhatsApp経由など）
+        if att.path:
+            file_path = att.path
+        # dataがあればデコードして保存（Web UI経由）
+        elif att.data:
+            ext = att.mime_type.split("/")[-1] if att.mime_type else "bin"
+            if ext == "jpeg":
+                ext = "jpg"
+            file_path = os.path.join(
+                _temp_attachments_dir(),
+                f"{_short_id()}_{att.name}"
+            )
+            # デコードと書き込みはイベントループを止めないよう別スレッドで行う
+            await asyncio.to_thread(_write_base64_file, file_path, att.data)
+            temp_file = file_path
+        else:
+            return f"[Invalid attachment: {att.name}]", None
+
+        # LLMにパスと読み取りに使うツールを渡す
+        if att.type == "image":
+            return (
+                f"[Image: {att.name}] Path: {file_path}\n"
+                "Note: Use the `analyze_image` tool to see this image if needed."
+            ), temp_file
+        return (
+            f"[File: {att.name}] Path: {file_path}\n"
+            "Note: Use the `file_upload` tool to read this file."
+        ), temp_file
+
+    except Exception as e:
+        logger.warning(f"Failed to process attachment {att.name}: {e}")
+        return f"[Error processing {att.name}: {e}]", None
+
+
+async def process_attachments(attachments: Optional[List["Attachment"]], message: str) -> Tuple[str, List[str]]:
     """
     添付ファイルを処理し、メッセージを拡張する。
     
     画像ファイルは一時ファイルに保存し、パスをメッセージに追加。
     テキストファイルはインラインで展開。
+    複数の添付ファイルは並列に処理する。
     
     Returns:
         Tuple[str, List[str]]: (拡張されたメッセージ, 作成した一時ファイルのパスリスト)
@@ -322,40 +545,9 @@ def process_attachments(attachments: Optional[List["Attachment"]], message: str)
     if not attachments:
         return message, []
     
-    temp_files = []
-    attachment_info = []
-    
-    for att in attachments:
-        try:
-            # pathがあればそのまま使用（WhatsApp経由など）
-            if att.path:
-                file_path = att.path
-            # dataがあればデコードして保存（Web UI経由）
-            elif att.data:
-                data = base64.b64decode(att.data)
-                ext = att.mime_type.split("/")[-1] if att.mime_type else "bin"
-                if ext == "jpeg":
-                    ext = "jpg"
-                file_path = os.path.join(
-                    _TEMP_ATTACHMENTS_DIR,
-                    f"{uuid.uuid4().hex[:8]}_{att.name}"
-                )
-                with open(file_path, "wb") as f:
-                    f.write(data)
-                temp_files.append(file_path)
-            else:
-                attachment_info.append(f"[Invalid attachment: {att.name}]")
-                continue
-            
-            # LLMにパスを渡す
-            if att.type == "image":
-                attachment_info.append(f"[Image: {att.name}] Path: {file_path}")
-            else:
-                attachment_info.append(f"[File: {att.name}] Path: {file_path}")
-                
-        except Exception as e:
-            logger.warning(f"Failed to process attachment {att.name}: {e}")
-            attachment_info.append(f"[Error processing {att.name}: {e}]")
+    results = await asyncio.gather(*(_process_attachment(att) for att in attachments))
+    attachment_info = [info for info, _ in results]
+    temp_files = [temp_file for _, temp_file in results if temp_file]
     
     # メッセージに添付情報を追加
     if attachment_info:
@@ -363,7 +555,6 @@ def process_attachments(attachments: Optional[List["Attachment"]], message: str)
         if message:
             expanded_message += "\n\n"
         expanded_message += "## Attached Files\n" + "\n\n".join(attachment_info)
-        expanded_message += "\n\nNote: For images, use the `analyze_image` tool with the provided path to examine the content."
         return expanded_message, temp_files
     
     return message, temp_files
@@ -427,15 +618,103 @@ async def root():
         return f.read()
 
 
+def _working_directory() -> str:
+    """作業ディレクトリ（MOCO_WORKING_DIRECTORY > カレントディレクトリ）"""
+    return os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd()
+
+
+@lru_cache(maxsize=8)
+def _cached_realpath(path: str) -> str:
+    """realpath の結果をキャッシュ（作業ディレクトリはプロセス中ほぼ変わらないため）"""
+    return os.path.realpath(path)
+
+
+@lru_cache(maxsize=8)
+def _parse_allowed_roots(allowed_roots_env: str) -> Tuple[str, ...]:
+    """MOCO_ALLOWED_ROOTS（カンマ区切り）を正規化済みの絶対パスに変換"""
+    return tuple(os.path.abspath(r.strip()) for r in allowed_roots_env.split(",") if r.strip())
+
+
+def _is_subpath(base: str, target: str) -> bool:
+    """target が base 自身またはその配下か（どちらも正規化済みの絶対パスであること）"""
+    base = base.rstrip(os.sep)
+    return target == base or target.startswith(base + os.sep)
+
+
+def _resolve_request_path(raw_path: str, base_dir: str, follow_symlinks: bool) -> Tuple[Optional[str], Optional[str]]:
+    """
+    リクエストされたパスを base_dir 基準で解決し、(target_path, error) を返す。
+    error は "invalid"（正規化できない）/ "outside"（base_dir の範囲外）/ None。
+
+    follow_symlinks=True: realpath で解決し、絶対パスはそのまま扱う（フォルダ選択 UI 用）
+    follow_symlinks=False: abspath で解決し、絶対パスも base_dir からの相対パスとして扱う（ファイル閲覧用）
+
+    シンボリックリンクの差し替えを見逃さないよう、結果はキャッシュせず毎回解決する
+    （キャッシュするのは base_dir の realpath のみ）。
+    """
+
+    target_path: Optional[str] = None
+    error: Optional[str] = None
+    requested_path = os.path.normpath(raw_path)
+    if follow_symlinks:
+        if "\x00" in requested_path:
+            # NUL 文字を含むパスは realpath が ValueError を送出するため、例外に頼らず先に弾く
+            error = "invalid"
+        elif os.path.isabs(requested_path):
+            target_path = os.path.realpath(requested_path)
+        else:
+            target_path = os.path.realpath(os.path.join(base_dir, requested_path))
+    else:
+        if os.path.isabs(requested_path):
+            # 絶対パスが指定された場合は、ベースディレクトリからの相対パスとして扱う
+            requested_path = requested_path.lstrip(os.sep)
+        target_path = os.path.abspath(os.path.join(base_dir, requested_path))
+
+    # ディレクトリトラバーサル対策: target_path が base_dir の配下にあるか確認
+    if error is None and not _is_subpath(base_dir, target_path):
+        target_path, error = None, "outside"
+
+    return target_path, error
+
+
+# プロジェクトディレクトリの目印になるファイル/ディレクトリ
+_PROJECT_MARKERS = (".git", "package.json", "pyproject.toml", "requirements.txt")
+# プロジェクト判定結果のキャッシュ（同じ親ディレクトリを開き直したときの stat を省く）
+_PROJECT_DIR_CACHE_TTL = 30.0  # 秒
+_PROJECT_DIR_CACHE_MAX = 4096
+_project_dir_cache: Dict[str, Tuple[float, bool]] = {}
+
+
+def _is_project_dir(path: str) -> bool:
+    """ディレクトリがプロジェクト（目印のファイルを含む）かどうかを判定（TTL 付きキャッシュ）"""
+    now = time.monotonic()
+    cached = _project_dir_cache.get(path)
+    if cached is not None and now - cached[0] < _PROJECT_DIR_CACHE_TTL:
+        return cached[1]
+
+    is_project = any(os.path.exists(os.path.join(path, marker)) for marker in _PROJECT_MARKERS)
+
+    if len(_project_dir_cache) >= _PROJECT_DIR_CACHE_MAX:
+        # 期限切れを掃除し、それでも多ければ全消去
+        # browse_directories はスレッドプールで並行に呼ばれるためスナップショットを走査する
+        for key, (checked_at, _) in list(_project_dir_cache.items()):
+            if now - checked_at >= _PROJECT_DIR_CACHE_TTL:
+                _project_dir_cache.pop(key, None)
+        if len(_project_dir_cache) >= _PROJECT_DIR_CACHE_MAX:
+            _project_dir_cache.clear()
+    _project_dir_cache[path] = (now, is_project)
+    return is_project
+
+
 @app.get("/api/browse-directories")
-async def browse_directories(path: str = None):
+def browse_directories(path: str = None):
     """
     ディレクトリ一覧を取得（フォルダ選択UI用）
     path が None の場合は作業ディレクトリを起点とする
     """
     # ベースディレクトリの決定
     # realpath を使用してシンボリックリンクを解決
-    base_dir = os.path.realpath(os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd())
+    base_dir = _cached_realpath(_working_directory())
 
     if path is None:
         # デフォルト: 作業ディレクトリ
@@ -450,28 +729,20 @@ async def browse_directories(path: str = None):
         
         return {"directories": base_paths, "current": base_dir}
 
-    # パスの正規化と検証
-    try:
-        requested_path = os.path.normpath(path)
-        if os.path.isabs(requested_path):
-            target_path = os.path.realpath(requested_path)
-        else:
-            target_path = os.path.realpath(os.path.join(base_dir, requested_path))
-
-        # ディレクトリトラバーサル対策: target_path が base_dir の配下にあるか確認
-        if os.path.commonpath([base_dir, target_path]) != base_dir:
-            return {
-                "error": f"Access denied: {path} is outside the working directory",
-                "directories": [],
-                "current": path
-            }
-    except ValueError:
-        # Windowsのドライブ跨ぎなどの場合に発生する可能性がある
+    # パスの正規化と検証（ディレクトリトラバーサル対策を含む）
+    target_path, error = _resolve_request_path(path, base_dir, follow_symlinks=True)
+    if error == "invalid":
         return {
             "error": f"Invalid path access: {path}",
             "directories": [],
             "current": path
         }
+    if error == "outside":
+        return {
+            "error": f"Access denied: {path} is outside the working directory",
+            "directories": [],
+            "current": path
+        }
 
     if not os.path.exists(target_path):
         return {"error": f"Path not found: {path}", "directories": [], "current": path}
@@ -480,31 +751,28 @@ async def browse_directories(path: str = None):
         return {"error": f"Not a directory: {path}", "directories": [], "current": path}
 
     try:
-        items = os.listdir(target_path)
+        # scandir の DirEntry はディレクトリ読み取り時の種別情報を持つため、項目ごとの stat が不要
+        with os.scandir(target_path) as it:
+            # 隠しファイルをスキップ
+            entries = [entry for entry in it if entry.name[:1] != '.']
+        entries.sort(key=lambda entry: entry.name)
+
         directories = []
-        for item in sorted(items):
-            if item.startswith('.'):
-                continue  # 隠しファイルをスキップ
-            full_item_path = os.path.join(target_path, item)
-            if os.path.isdir(full_item_path):
+        for entry in entries:
+            if entry.is_dir():
+                full_item_path = entry.path
                 # プロジェクトかどうかを判定
-                is_project = any(
-                    os.path.exists(os.path.join(full_item_path, marker))
-                    for marker in [".git", "package.json", "pyproject.toml", "requirements.txt"]
-                )
+                is_project = _is_project_dir(full_item_path)
                 directories.append({
                     "path": full_item_path,
-                    "name": item,
+                    "name": entry.name,
                     "icon": "📦" if is_project else "📁",
                     "is_project": is_project
                 })
 
         parent = os.path.dirname(target_path)
         # 親ディレクトリも制限内である場合のみ返す
-        try:
-            if os.path.commonpath([base_dir, parent]) != base_dir:
-                parent = None
-        except ValueError:
+        if not _is_subpath(base_dir, parent):
             parent = None
 
         return {
@@ -517,18 +785,32 @@ async def browse_directories(path: str = None):
         return {"error": str(e), "directories": [], "current": target_path}
 
 
+# プロファイル一覧のキャッシュ（プロファイルはほとんど増減しないため短い TTL で使い回す）
+_PROFILES_CACHE_TTL = 30.0  # 秒
+_profiles_cache: Dict[str, Tuple[float, List[str]]] = {}
+
+
 @app.get("/api/profiles")
-async def list_profiles():
+def list_profiles():
     """利用可能なプロファイル一覧"""
     profiles_dir = _find_profiles_dir()
-    if not os.path.exists(profiles_dir):
+    now = time.monotonic()
+    cached = _profiles_cache.get(profiles_dir)
+    if cached is not None and now - cached[0] < _PROFILES_CACHE_TTL:
+        return {"profiles": list(cached[1])}
+
+    try:
+        with os.scandir(profiles_dir) as it:
+            # DirEntry の型情報を使い、エントリごとの stat を省く
+            profiles = sorted(
+                e.name for e in it
+                if e.name != "__pycache__" and e.is_dir()
+            )
+    except (FileNotFoundError, NotADirectoryError):
         return {"profiles": ["default"]}
 
-    profiles = [
-        d for d in os.listdir(profiles_dir)
-        if os.path.isdir(os.path.join(profiles_dir, d)) and d != "__pycache__"
-    ]
-    return {"profiles": sorted(profiles)}
+    _profiles_cache[profiles_dir] = (now, profiles)
+    return {"profiles": list(profiles)}
 
 
 @app.get("/api/sessions")
@@ -582,16 +864,10 @@ async def create_approval(session_id: str, req: Dict[str, Any]):
 
     if approved is not None:
         # respond to latest pending approval for the session
-        with pending_approvals_lock:
-            candidates = [
-                (aid, item)
-                for aid, item in pending_approvals.items()
-                if item.get("session_id") == session_id
-            ]
-        if not candidates:
+        approval_id = approval_manager.latest_pending_approval(session_id)
+        if approval_id is None:
             return {"status": "not_found", "session_id": session_id}
 
-        approval_id = candidates[-1][0]
         ok = await approval_manager.respond_to_approval(approval_id, bool(approved))
         return {"status": "ok" if ok else "not_found", "approval_id": approval_id, "decision": bool(approved)}
 
@@ -608,7 +884,7 @@ async def respond_approval(approval_id: str, body: ApprovalRespond):
 
 
 @app.post("/api/sessions/{session_id}/workdir")
-async def update_session_workdir(session_id: str, req: WorkdirRequest):
+def update_session_workdir(session_id: str, req: WorkdirRequest):
     """セッションの作業ディレクトリを更新"""
     try:
         # パスの存在確認と正規化
@@ -618,20 +894,17 @@ async def update_session_workdir(session_id: str, req: WorkdirRequest):
         # MOCO_ALLOWED_ROOTS が設定されていればそれを使用、なければ現在の作業ディレクトリ配下のみ許可
         allowed_roots_env = os.getenv("MOCO_ALLOWED_ROOTS", "")
         if allowed_roots_env:
-            allowed_roots = [os.path.abspath(r.strip()) for r in allowed_roots_env.split(",") if r.strip()]
+            allowed_roots = list(_parse_allowed_roots(allowed_roots_env))
         else:
             # デフォルトは現在の OS 作業ディレクトリ（起動時）をルートとする
-            allowed_roots = [os.path.abspath(os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd())]
+            allowed_roots = [os.path.abspath(_working_directory())]
             # /private/tmp なども開発用に許可リストに入れる必要がある場合があるが、
             # 明示的に指定されない限りは制限的に振る舞う
             if "/private/tmp" not in allowed_roots_env and req.working_directory.startswith("/private/tmp"):
                  allowed_roots.append("/private/tmp")
 
-        is_allowed = False
-        for root in allowed_roots:
-            if os.path.commonpath([os.path.abspath(root), path]) == os.path.abspath(root):
-                is_allowed = True
-                break
+        # allowed_roots は abspath で正規化済み
+        is_allowed = any(_is_subpath(root, path) for root in allowed_roots)
         
         if not is_allowed:
             raise HTTPException(status_code=403, detail=f"Access denied: {req.working_directory} is outside allowed roots.")
@@ -671,51 +944,63 @@ async def get_session(session_id: str):
     }
 
 
+# str.splitlines が改行とみなす文字のうち、テキストモードで \n に変換されないもの
+_EXTRA_LINE_BREAKS_RE = re.compile("[\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def _count_lines(content: str) -> int:
+    """len(content.splitlines()) と同じ値を、行リストを作らずに数える"""
+    if not content:
+        return 0
+    if _EXTRA_LINE_BREAKS_RE.search(content):
+        return len(content.splitlines())
+    return content.count("\n") + (0 if content.endswith("\n") else 1)
+
+
 @app.get("/api/file", response_model=FileResponse)
-async def get_file_content(path: str):
+def get_file_content(path: str):
     """
     指定されたファイルの情報を取得する。
     ディレクトリトラバーサル対策を施し、MOCO_WORKING_DIRECTORY配下のファイルのみアクセス可能。
     """
     # ベースディレクトリの決定
-    base_dir = os.path.abspath(os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd())
+    base_dir = os.path.abspath(_working_directory())
 
-    # パスの正規化と検証
-    requested_path = os.path.normpath(path)
-    if os.path.isabs(requested_path):
-        # 絶対パスが指定された場合は、ベースディレクトリからの相対パスとして扱う
-        requested_path = requested_path.lstrip(os.sep)
-
-    target_path = os.path.abspath(os.path.join(base_dir, requested_path))
-
-    # ディレクトリトラバーサル対策: target_path が base_dir の配下にあるか確認
-    if os.path.commonpath([base_dir, target_path]) != base_dir:
+    # パスの正規化と検証（ディレクトリトラバーサル対策を含む）
+    target_path, error = _resolve_request_path(path, base_dir, follow_symlinks=False)
+    if error is not None:
         raise HTTPException(
             status_code=403,
             detail=f"Access denied: {path} is outside the working directory"
         )
 
-    # ファイルの存在確認
-    if not os.path.exists(target_path):
+    # ファイルの存在確認（stat 1回で存在・種別・サイズをまとめて取得）
+    try:
+        st = os.stat(target_path)
+    except (FileNotFoundError, NotADirectoryError):
         raise HTTPException(status_code=404, detail=f"File not found: {path}")
 
     # ディレクトリでないことを確認
-    if not os.path.isfile(target_path):
+    if not stat.S_ISREG(st.st_mode):
         raise HTTPException(status_code=400, detail=f"Path is not a file: {path}")
 
-    try:
-        # ファイル情報の取得
-        size = os.path.getsize(target_path)
+    # 上限サイズ（MOCO_MAX_FILE_CONTENT_SIZE）を超えると 413。0 以下で無制限
+    size = st.st_size
+    max_size = get_settings().max_file_content_size
+    if 0 < max_size < size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File is too large to display: {path} ({size} bytes)"
+        )
 
+    try:
         # テキストファイルとして読み込み
         with open(target_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        line_count = len(content.splitlines())
-
         return FileResponse(
             content=content,
-            line_count=line_count,
+            line_count=_count_lines(content),
             size=size,
             path=path
         )
@@ -741,13 +1026,77 @@ async def delete_session(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# 統計DB（metrics.db）への接続。get_stats はスレッドプールで実行されるため、スレッドごとに接続を使い回す
+_STATS_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "data", "optimizer", "metrics.db",
+)
+_stats_local = threading.local()
+_stats_lock = threading.Lock()  # 接続一覧と初期化済みフラグを保護する
+_stats_connections: List[sqlite3.Connection] = []  # 終了時にまとめて閉じるための全スレッドの接続
+_stats_generation = 0  # 接続を一括で閉じるたびに進め、スレッドに残った古い接続を使わせない
+_stats_db_ready = False  # DBファイルとテーブルの存在を確認済みか
+
+
+def _get_stats_connection() -> sqlite3.Connection:
+    """現在のスレッド用の metrics.db 接続を取得（初回のみ接続とPRAGMA設定を行う）"""
+    conn = getattr(_stats_local, "conn", None)
+    if conn is None or _stats_local.generation != _stats_generation:
+        conn = sqlite3.connect(_STATS_DB_PATH, check_same_thread=False, isolation_level=None)
+        # WAL: 読み取りが QualityTracker の書き込みをブロックしない
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-20000")
+        with _stats_lock:
+            _stats_connections.append(conn)
+            _stats_local.generation = _stats_generation
+        _stats_local.conn = conn
+    return conn
+
+
+def _close_stats_connections() -> None:
+    """全スレッドの metrics.db 接続を閉じる（サーバー終了時）"""
+    global _stats_generation, _stats_db_ready
+    with _stats_lock:
+        conns = list(_stats_connections)
+        _stats_connections.clear()
+        _stats_generation += 1
+        _stats_db_ready = False
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to close metrics.db connection: {e}")
+
+
+def _ensure_stats_db() -> bool:
+    """metrics.db を用意する。新規作成した場合（データがない）は False を返す"""
+    global _stats_db_ready
+    if _stats_db_ready:
+        return True
+    # 複数スレッドが同時に初期化しないようにロックの中で確認し直す
+    with _stats_lock:
+        if _stats_db_ready:
+            return True
+        # ディレクトリ作成と初期化
+        os.makedirs(os.path.dirname(_STATS_DB_PATH), exist_ok=True)
+        existed = os.path.exists(_STATS_DB_PATH)
+        if not existed:
+            # 新規作成時はテーブルだけ作成する（接続取得はロックを取るため専用の接続で行う）
+            conn = sqlite3.connect(_STATS_DB_PATH, isolation_level=None)
+            try:
+                conn.execute("CREATE TABLE IF NOT EXISTS metrics (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, ai_score REAL, task_summary TEXT, task_complexity REAL, delegation_count INTEGER, todo_used INTEGER, history_turns INTEGER, summary_depth INTEGER, prompt_specificity REAL, profile TEXT)")
+                conn.execute("CREATE TABLE IF NOT EXISTS agent_executions (id INTEGER PRIMARY KEY AUTOINCREMENT, request_id INTEGER, agent_name TEXT, inline_score REAL, tokens_input INTEGER, tokens_output INTEGER, execution_time_ms INTEGER, error_message TEXT, summary_depth INTEGER, history_turns INTEGER, FOREIGN KEY (request_id) REFERENCES metrics (id))")
+            finally:
+                conn.close()
+        _stats_db_ready = True
+    return existed
+
+
 @app.get("/api/stats")
-async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
+def get_stats(session_id: Optional[str] = None, scope: str = "all"):
     """統計データを取得"""
     try:
-        from pathlib import Path
-        db_path = Path(__file__).parent.parent.parent.parent / "data" / "optimizer" / "metrics.db"
-        
         # デフォルトのレスポンス構造
         stats = {
             "today_avg_score": 0,
@@ -773,20 +1122,11 @@ async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
         if scope == "session" and not session_id:
             return stats
 
-        # ディレクトリ作成と初期化
-        db_path.parent.mkdir(parents=True, exist_ok=True)
-        if not db_path.exists():
+        if not _ensure_stats_db():
             # 新規作成時は空の統計を返す（テーブル作成後にデータがない状態と同じ）
-            conn = sqlite3.connect(str(db_path))
-            # ここでテーブル作成
-            cursor = conn.cursor()
-            cursor.execute("CREATE TABLE IF NOT EXISTS metrics (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, ai_score REAL, task_summary TEXT, task_complexity REAL, delegation_count INTEGER, todo_used INTEGER, history_turns INTEGER, summary_depth INTEGER, prompt_specificity REAL, profile TEXT)")
-            cursor.execute("CREATE TABLE IF NOT EXISTS agent_executions (id INTEGER PRIMARY KEY AUTOINCREMENT, request_id INTEGER, agent_name TEXT, inline_score REAL, tokens_input INTEGER, tokens_output INTEGER, execution_time_ms INTEGER, error_message TEXT, summary_depth INTEGER, history_turns INTEGER, FOREIGN KEY (request_id) REFERENCES metrics (id))")
-            conn.commit()
             return stats
-        
-        conn = sqlite3.connect(str(db_path))
-        cursor = conn.cursor()
+
+        cursor = _get_stats_connection().cursor()
 
         # フィルタ条件の構築 (metricsテーブル)
         where_clause = "WHERE ai_score IS NOT NULL"
@@ -812,10 +1152,17 @@ async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
             ae_join = "JOIN metrics m ON agent_executions.request_id = m.id"
             where_clause_ae = "WHERE m.timestamp >= date('now', 'localtime')"
 
-        # 今日の統計
+        # 今日の統計と全体メトリクス（同じ絞り込みなので1回の走査で集計）
         cursor.execute(f"""
             SELECT AVG(ai_score), COUNT(*),
-                   SUM(CASE WHEN ai_score >= 0.7 THEN 1 ELSE 0 END) * 1.0 / COUNT(*)
+                   SUM(CASE WHEN ai_score >= 0.7 THEN 1 ELSE 0 END) * 1.0 / COUNT(*),
+                   AVG(task_complexity),
+                   AVG(delegation_count),
+                   AVG(CASE WHEN todo_used = 1 THEN 1.0 ELSE 0 END) * 100,
+                   AVG(history_turns),
+                   AVG(summary_depth),
+                   AVG(prompt_specificity),
+                   SUM(CASE WHEN summary_depth > 0 THEN 1 ELSE 0 END)
             FROM metrics
             {where_clause}
         """, params)
@@ -825,19 +1172,7 @@ async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
         success_rate = row[2] or 0
 
         # 全体メトリクス
-        cursor.execute(f"""
-            SELECT
-                AVG(task_complexity),
-                AVG(delegation_count),
-                AVG(CASE WHEN todo_used = 1 THEN 1.0 ELSE 0 END) * 100,
-                AVG(history_turns),
-                AVG(summary_depth),
-                AVG(prompt_specificity),
-                SUM(CASE WHEN summary_depth > 0 THEN 1 ELSE 0 END)
-            FROM metrics
-            {where_clause}
-        """, params)
-        metrics_row = cursor.fetchone()
+        metrics_row = row[3:]
         overall_metrics = {
             "avg_complexity": round(metrics_row[0] or 0, 1),
             "avg_delegation": round(metrics_row[1] or 0, 1),
@@ -862,14 +1197,15 @@ async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
             for r in cursor.fetchall()
         ]
 
-        # 最新タスク
+        # 最新タスク（直近5件）とスコア推移（直近10件）を1クエリで取得
         cursor.execute(f"""
             SELECT task_summary, ai_score, task_complexity, timestamp
             FROM metrics
             {where_clause}
             ORDER BY id DESC
-            LIMIT 5
+            LIMIT 10
         """, params)
+        latest_rows = cursor.fetchall()
         recent_tasks = [
             {
                 "task": r[0][:40] + "..." if r[0] and len(r[0]) > 40 else (r[0] or ""),
@@ -877,17 +1213,11 @@ async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
                 "complexity": r[2] or 0,
                 "time": r[3].split("T")[1][:5] if r[3] and "T" in r[3] else ""
             }
-            for r in cursor.fetchall()
+            for r in latest_rows[:5]
         ]
 
         # スコア推移（直近10件）
-        cursor.execute(f"""
-            SELECT ai_score FROM metrics
-            {where_clause}
-            ORDER BY id DESC
-            LIMIT 10
-        """, params)
-        score_trend = [r[0] for r in cursor.fetchall()][::-1]
+        score_trend = [r[1] for r in reversed(latest_rows)]
 
         # エージェント別統計（新テーブル優先、フォールバックあり）
         agent_stats = {}
@@ -935,57 +1265,38 @@ async def get_stats(session_id: Optional[str] = None, scope: str = "all"):
             pass  # テーブルがまだ存在しない場合
 
         # 新テーブルにデータがない場合は旧方式でフォールバック
+        # agents_selected（JSON配列）を json_each で展開し、SQLite 側でエージェントごとに集計する
         if not agent_stats:
             cursor.execute(f"""
-                SELECT agents_selected, ai_score, task_complexity, delegation_count, todo_used
-                FROM metrics
+                SELECT
+                    je.value,
+                    COUNT(*) AS total,
+                    SUM(CASE WHEN ai_score >= 0.7 THEN 1 ELSE 0 END),
+                    AVG(ai_score),
+                    SUM(COALESCE(task_complexity, 0)) * 1.0 / COUNT(*),
+                    SUM(COALESCE(delegation_count, 0)) * 1.0 / COUNT(*),
+                    SUM(CASE WHEN todo_used THEN 1 ELSE 0 END) * 100.0 / COUNT(*)
+                FROM metrics,
+                     json_each(CASE WHEN json_valid(agents_selected) AND json_type(agents_selected) = 'array'
+                                    THEN agents_selected ELSE '[]' END) AS je
                 {where_clause} AND agents_selected IS NOT NULL
+                GROUP BY je.value
+                -- 件数の多い順、同数なら最初に現れた行の順、さらに名前順（上位10件）
+                ORDER BY total DESC, MIN(metrics.id), MIN(je.key), je.value
+                LIMIT 10
             """, params)
-            rows = cursor.fetchall()
-
-            from collections import defaultdict
-            agent_counts = defaultdict(int)
-            agent_scores = defaultdict(float)
-            agent_success = defaultdict(int)
-            agent_complexity = defaultdict(float)
-            agent_delegation = defaultdict(float)
-            agent_todo = defaultdict(int)
-
-            for agents_json, score, complexity, delegation, todo in rows:
-                try:
-                    agents = json.loads(agents_json)
-                    if isinstance(agents, list):
-                        for agent in agents:
-                            agent_counts[agent] += 1
-                            agent_scores[agent] += score
-                            if score >= 0.7:
-                                agent_success[agent] += 1
-                            agent_complexity[agent] += (complexity or 0)
-                            agent_delegation[agent] += (delegation or 0)
-                            if todo:
-                                agent_todo[agent] += 1
-                except Exception:
-                    continue
-
-            for agent, count in agent_counts.items():
-                avg_score = agent_scores[agent] / count
+            for agent, count, success, avg_score, avg_complexity, avg_delegation, todo_usage in cursor.fetchall():
                 agent_stats[agent] = {
                     "total": count,
-                    "success": agent_success[agent],
+                    "success": success,
                     "avg_score": round(avg_score, 2),
-                    "avg_complexity": round(agent_complexity[agent] / count, 1),
-                    "avg_delegation": round(agent_delegation[agent] / count, 1),
-                    "todo_usage": round(agent_todo[agent] / count * 100, 1),
+                    "avg_complexity": round(avg_complexity, 1),
+                    "avg_delegation": round(avg_delegation, 1),
+                    "todo_usage": round(todo_usage, 1),
                     "summaries": 0,
                     "avg_history_turns": 0
                 }
 
-            # 上位10件に絞る（countの多い順）
-            sorted_agents = sorted(agent_stats.items(), key=lambda x: x[1]["total"], reverse=True)[:10]
-            agent_stats = dict(sorted_agents)
-
-        conn.close()
-        
         return {
             "today_avg_score": round(today_avg, 2),
             "today_count": today_count,
@@ -1021,7 +1332,7 @@ async def chat(req: ChatRequest):
     # 添付ファイルを処理
     message = req.message
     if req.attachments:
-        expanded_message, _ = process_attachments(req.attachments, req.message)
+        expanded_message, _ = await process_attachments(req.attachments, req.message)
         message = expanded_message
 
     # セッション準備
@@ -1049,49 +1360,62 @@ async def chat(req: ChatRequest):
 async def chat_stream(req: ChatRequest):
     """チャット（ストリーミング）- Server-Sent Events with real-time tool updates"""
 
-    # イベントキュー（スレッド間通信用）
-    event_queue = queue.Queue()
+    # イベントキュー（ワーカースレッドからは call_soon_threadsafe 経由で投入）
+    loop = asyncio.get_running_loop()
+    event_queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: Dict[str, Any]) -> None:
+        try:
+            loop.call_soon_threadsafe(event_queue.put_nowait, event)
+        except RuntimeError:
+            # クライアント切断後にループが閉じている場合は破棄
+            pass
 
     # thinking イベントのバッチ化用
-    thinking_buffer = ""
-    last_thinking_time = 0
+    thinking_buffer: List[str] = []
+    thinking_size = 0
+    last_thinking_time = 0.0
     last_agent_name = "orchestrator"
 
     # 進捗コールバック
     def progress_callback(event_type: str, name: str = None, detail: str = "", agent_name: str = None, parent_agent: str = None, status: str = "running", tool_name: str = None, content: str = None, result: str = None, **kwargs):
-        nonlocal thinking_buffer, last_thinking_time, last_agent_name
+        nonlocal thinking_size, last_thinking_time, last_agent_name
         
         current_agent = agent_name or last_agent_name or "orchestrator"
         last_agent_name = current_agent
 
         if event_type == "thinking":
-            thinking_buffer += (content or "")
-            current_time = time.time()
+            if content:
+                thinking_buffer.append(content)
+                thinking_size += len(content)
+            current_time = time.monotonic()
             # 100文字以上、または0.2秒経過したら送信
-            if len(thinking_buffer) >= 100 or (current_time - last_thinking_time) >= 0.2:
-                event_queue.put({
+            if thinking_size >= 100 or (current_time - last_thinking_time) >= 0.2:
+                emit({
                     "type": "thinking",
-                    "content": thinking_buffer,
+                    "content": "".join(thinking_buffer),
                     "agent": current_agent
                 })
-                thinking_buffer = ""
+                thinking_buffer.clear()
+                thinking_size = 0
                 last_thinking_time = current_time
             return
 
         # 思考以外のイベントが発生した場合はバッファをフラッシュ（順序維持）
         if thinking_buffer:
-            event_queue.put({
+            emit({
                 "type": "thinking",
-                "content": thinking_buffer,
+                "content": "".join(thinking_buffer),
                 "agent": current_agent
             })
-            thinking_buffer = ""
+            thinking_buffer.clear()
+            thinking_size = 0
             
         if event_type == "flush":
             return
 
         if event_type == "chunk":
-            event_queue.put({
+            emit({
                 "type": "chunk",
                 "content": content,
                 "agent": current_agent
@@ -1114,14 +1438,14 @@ async def chat_stream(req: ChatRequest):
         if event_type == "recall":
             results = kwargs.get("results", [])
             for res in results:
-                event_queue.put({
+                emit({
                     "type": "recall",
                     "recall_type": "Memory",
                     "query": detail or "Semantic Recall",
                     "details": res.get("content", "") if isinstance(res, dict) else str(res)
                 })
         elif event_type == "delegate" and status == "running":
-            event_queue.put({
+            emit({
                 "type": "recall",
                 "recall_type": "Delegation",
                 "query": f"→ @{clean_name}",
@@ -1129,7 +1453,7 @@ async def chat_stream(req: ChatRequest):
             })
         elif event_type == "tool" and status == "completed":
             # ツール実行結果もインサイトに表示
-            event_queue.put({
+            emit({
                 "type": "recall",
                 "recall_type": "Tool",
                 "query": f"🛠️ {tool_name or clean_name}",
@@ -1147,7 +1471,7 @@ async def chat_stream(req: ChatRequest):
             "name": clean_name,
             "detail": detail
         }
-        event_queue.put(data)
+        emit(data)
 
     # Orchestrator をコールバック付きで作成
     # 作業ディレクトリ: リクエスト > 環境変数 > カレントディレクトリ
@@ -1167,7 +1491,7 @@ async def chat_stream(req: ChatRequest):
         session_id = orchestrator.create_session(title=req.message[:50])
 
     # 添付ファイルを処理してメッセージを拡張
-    expanded_message, temp_files = process_attachments(req.attachments, req.message)
+    expanded_message, temp_files = await process_attachments(req.attachments, req.message)
 
     # キャンセルイベントを確実にクリアしてから新規登録
     # (過去のリクエストでキャンセル状態が残っているのを防ぐ)
@@ -1178,21 +1502,6 @@ async def chat_stream(req: ChatRequest):
     result_holder = {"response": None, "error": None, "cancelled": False, "temp_files": temp_files}
     stop_event = threading.Event()
 
-    # プロンプトの拡張
-    expanded_message = req.message
-    if req.attachments:
-        expanded_message += "\n\nFiles attached to this message:"
-        for att in req.attachments:
-            att_name = att.get("name", "unknown")
-            att_path = att.get("path") or (att.get("data")[:50] + "..." if att.get("data") else "unknown")
-            att_type = att.get("type", "file")
-            if att_type == "image":
-                expanded_message += f"\n- [Image: {att_name}] Path: {att_path}"
-                expanded_message += "\n  Note: Use the `analyze_image` tool to see this image if needed."
-            else:
-                expanded_message += f"\n- [File: {att_name}] Path: {att_path}"
-                expanded_message += f"\n  Note: Use the `file_upload` tool to read this file."
-
     def run_orchestrator():
         try:
             result_holder["response"] = orchestrator.run_sync(expanded_message, session_id=session_id)
@@ -1201,7 +1510,7 @@ async def chat_stream(req: ChatRequest):
         except OperationCancelled:
             result_holder["cancelled"] = True
             # キャンセル時は特別なイベントを投げる
-            event_queue.put({"type": "cancelled", "message": "Task was cancelled by user."})
+            emit({"type": "cancelled", "message": "Task was cancelled by user."})
         except Exception as e:
             result_holder["error"] = str(e)
         finally:
@@ -1209,7 +1518,7 @@ async def chat_stream(req: ChatRequest):
             # 万が一の漏れを防ぐためここでも呼ぶ。ただし二重呼び出しは問題ない設計。
             clear_cancel_event(session_id)
             if not stop_event.is_set():
-                event_queue.put({"type": "done"})
+                emit({"type": "done"})
 
     # バックグラウンドで実行
     thread = threading.Thread(target=run_orchestrator, daemon=True)
@@ -1218,49 +1527,46 @@ async def chat_stream(req: ChatRequest):
     async def generate():
         # 開始イベント
         yield f"data: {json.dumps({'type': 'start', 'session_id': session_id})}\n\n"
-        await asyncio.sleep(0.01)
 
         has_sent_chunks = False
 
         try:
             while True:
                 try:
-                    # ノンブロッキングでキューをチェック
-                    event = event_queue.get(timeout=0.1)
-
-                    if event["type"] == "done":
-                        # 完了 - チャンクが一度も送られていない場合のみ、最終結果を送信
-                        if result_holder["cancelled"]:
-                            # キャンセルメッセージは別途送信済み（type: cancelled）だが、
-                            # クライアント側の処理確実化のために status: cancelled も送る
-                            yield f"data: {json.dumps({'type': 'status', 'status': 'cancelled', 'content': 'Operation cancelled.'})}\n\n"
-                        elif result_holder["error"]:
-                            yield f"data: {json.dumps({'type': 'error', 'message': result_holder['error']})}\n\n"
-                        elif not has_sent_chunks:
-                            response = result_holder["response"] or ""
-                            # verbose でない場合はフィルタリング
-                            response = filter_response_for_display(response, req.verbose)
-                            # 結果をチャンクで送信
-                            chunk_size = 100
-                            for i in range(0, len(response), chunk_size):
-                                chunk = response[i:i+chunk_size]
-                                yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-                                await asyncio.sleep(0.01)
-
-                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
-                        break
-                    elif event["type"] == "chunk":
-                        has_sent_chunks = True
-                        yield f"data: {json.dumps(event)}\n\n"
-                        await asyncio.sleep(0.01)
-                    else:
-                        # 進捗イベント
-                        yield f"data: {json.dumps(event)}\n\n"
-                        await asyncio.sleep(0.01)
-
-                except queue.Empty:
-                    # キューが空 - 少し待つ
-                    await asyncio.sleep(0.05)
+                    # イベントが来るまでループに制御を返して待機
+                    event = await asyncio.wait_for(event_queue.get(), timeout=_SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 長時間イベントがない場合はコメント行でハートビート（接続維持）
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if event["type"] == "done":
+                    # 完了 - チャンクが一度も送られていない場合のみ、最終結果を送信
+                    if result_holder["cancelled"]:
+                        # キャンセルメッセージは別途送信済み（type: cancelled）だが、
+                        # クライアント側の処理確実化のために status: cancelled も送る
+                        yield f"data: {json.dumps({'type': 'status', 'status': 'cancelled', 'content': 'Operation cancelled.'})}\n\n"
+                    elif result_holder["error"]:
+                        yield f"data: {json.dumps({'type': 'error', 'message': result_holder['error']})}\n\n"
+                    elif not has_sent_chunks:
+                        response = result_holder["response"] or ""
+                        # verbose でない場合はフィルタリング
+                        response = filter_response_for_display(response, req.verbose)
+                        # 結果をチャンクで送信
+                        chunk_size = 100
+                        for i in range(0, len(response), chunk_size):
+                            chunk = response[i:i+chunk_size]
+                            yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
+                            await asyncio.sleep(0.01)
+
+                    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                    break
+                elif event["type"] == "chunk":
+                    has_sent_chunks = True
+                    yield f"data: {json.dumps(event)}\n\n"
+                else:
+                    # 進捗イベント
+                    yield f"data: {json.dumps(event)}\n\n"
         finally:
             stop_event.set()
             # 一時ファイルのクリーンアップ
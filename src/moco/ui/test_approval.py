@@ -4,6 +4,7 @@
 moco/ui/api.py の承認関連エンドポイントのテスト
 - /api/sessions/{session_id}/approve: 承認要求の送信
 - /api/approvals/{approval_id}/respond: 承認/拒否のレスポンス
+- セッションごとの承認待ち索引（latest_pending_approval）と asyncio.Event による待機
 """
 
 import pytest
@@ -18,7 +19,7 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from moco.ui.api import app, session_logger, pending_approvals, pending_approvals_lock, approval_manager
+from moco.ui.api import app, session_logger, pending_approvals, session_pending_approvals, approval_manager
 
 
 class TestApprovalAPI:
@@ -46,15 +47,14 @@ class TestApprovalAPI:
         approval_id = str(uuid.uuid4())
         
         # 承認要求を登録
-        with pending_approvals_lock:
-            event = threading.Event()
-            pending_approvals[approval_id] = {
-                "event": event,
-                "decision": False,
-                "tool": "test_tool",
-                "args": {"param": "value"},
-                "session_id": session_id
-            }
+        event = threading.Event()
+        pending_approvals[approval_id] = {
+            "event": event,
+            "decision": False,
+            "tool": "test_tool",
+            "args": {"param": "value"},
+            "session_id": session_id
+        }
         
         return approval_id, session_id
 
@@ -78,11 +78,10 @@ class TestApprovalAPI:
         
         # 承認要求が登録されているか確認
         approval_id = data["approval_id"]
-        with pending_approvals_lock:
-            assert approval_id in pending_approvals
-            assert pending_approvals[approval_id]["tool"] == "test_tool"
-            assert pending_approvals[approval_id]["args"] == {"param": "value"}
-            assert not pending_approvals[approval_id]["decision"]
+        assert approval_id in pending_approvals
+        assert pending_approvals[approval_id]["tool"] == "test_tool"
+        assert pending_approvals[approval_id]["args"] == {"param": "value"}
+        assert not pending_approvals[approval_id]["decision"]
 
     def test_create_approval_session_not_found(self, client):
         """承認要求の作成 - セッション不存在"""
@@ -135,9 +134,8 @@ class TestApprovalAPI:
         assert data["decision"]
         
         # 承認要求のdecisionがTrueになっているか確認
-        with pending_approvals_lock:
-            assert pending_approvals[approval_id]["decision"]
-            assert pending_approvals[approval_id]["event"].is_set()
+        assert pending_approvals[approval_id]["decision"]
+        assert pending_approvals[approval_id]["event"].is_set()
 
     def test_respond_approval_reject(self, client, setup_approval):
         """承認要求への拒否レスポンス"""
@@ -154,9 +152,8 @@ class TestApprovalAPI:
         assert not data["decision"]
         
         # 承認要求のdecisionがFalseになっているか確認
-        with pending_approvals_lock:
-            assert not pending_approvals[approval_id]["decision"]
-            assert pending_approvals[approval_id]["event"].is_set()
+        assert not pending_approvals[approval_id]["decision"]
+        assert pending_approvals[approval_id]["event"].is_set()
 
     def test_respond_approval_twice(self, client, setup_approval):
         """承認要求への二重レスポンス"""
@@ -196,9 +193,7 @@ class TestApprovalAPI:
         approval_id, _ = setup_approval
         
         # 承認要求を削除（期限切れをシミュレート）
-        with pending_approvals_lock:
-            if approval_id in pending_approvals:
-                del pending_approvals[approval_id]
+        pending_approvals.pop(approval_id, None)
         
         response = client.post(
             f"/api/approvals/{approval_id}/respond",
@@ -228,6 +223,64 @@ class TestApprovalAPI:
         
         assert response.status_code == 422
 
+    # === 4. セッション単位の承認（最新の承認待ちへの応答） ===
+
+    def test_approve_latest_registered_directly(self, client, mock_session, setup_approval):
+        """pending_approvals へ直接登録された承認待ちにもセッション経由で応答できる"""
+        approval_id, session_id = setup_approval
+
+        with patch.object(session_logger, 'get_session', return_value=mock_session):
+            response = client.post(
+                f"/api/sessions/{session_id}/approve",
+                json={"approved": True}
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ok"
+        assert data["approval_id"] == approval_id
+        assert pending_approvals[approval_id]["decision"]
+        assert pending_approvals[approval_id]["event"].is_set()
+        pending_approvals.pop(approval_id, None)
+
+    def test_approve_latest_uses_newest_request(self, client, mock_session):
+        """索引に載った承認待ちのうち最新のものに応答する"""
+        session_id = mock_session["session_id"]
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+        for approval_id in (first, second):
+            pending_approvals[approval_id] = {
+                "event": threading.Event(),
+                "decision": False,
+                "tool": "test_tool",
+                "args": {},
+                "session_id": session_id
+            }
+            session_pending_approvals[session_id].append(approval_id)
+
+        with patch.object(session_logger, 'get_session', return_value=mock_session):
+            response = client.post(f"/api/sessions/{session_id}/approve", json={"approved": False})
+
+        data = response.json()
+        assert data["status"] == "ok"
+        assert data["approval_id"] == second
+        assert pending_approvals[second]["event"].is_set()
+        assert not pending_approvals[first]["event"].is_set()
+        for approval_id in (first, second):
+            pending_approvals.pop(approval_id, None)
+        session_pending_approvals.pop(session_id, None)
+
+    def test_approve_latest_no_pending(self, client):
+        """承認待ちがないセッションへの応答は not_found"""
+        session = {"session_id": "no-pending-session"}
+        with patch.object(session_logger, 'get_session', return_value=session):
+            response = client.post(
+                "/api/sessions/no-pending-session/approve",
+                json={"approved": True}
+            )
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "not_found"
+
 
 class TestApprovalManager:
     """ApprovalManagerの単体テスト"""
@@ -300,6 +353,47 @@ class TestApprovalManager:
         # タイムアウト時はFalse（却下扱い）
         assert not decision
 
+    @pytest.mark.asyncio
+    async def test_session_index_follows_requests(self, approval_mgr):
+        """承認待ち索引は作成順に積まれ、決定後に取り除かれる"""
+        session_id = "index-session"
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+
+        with patch.object(approval_mgr, '_send_to_session', return_value=True):
+            await approval_mgr.create_approval_request(first, "test_tool", {}, session_id)
+            await approval_mgr.create_approval_request(second, "test_tool", {}, session_id)
+
+        assert isinstance(approval_mgr.pending_approvals[first]["event"], asyncio.Event)
+        assert list(approval_mgr.session_pending[session_id]) == [first, second]
+        assert approval_mgr.latest_pending_approval(session_id) == second
+
+        await approval_mgr.respond_to_approval(second, True)
+        assert await approval_mgr.wait_for_decision(second, timeout=1.0)
+        assert approval_mgr.latest_pending_approval(session_id) == first
+
+        # 索引を経由せずに取り除かれたものは遅延的に掃除される
+        approval_mgr.pending_approvals.pop(first, None)
+        assert approval_mgr.latest_pending_approval(session_id) is None
+        assert session_id not in approval_mgr.session_pending
+
+    @pytest.mark.asyncio
+    async def test_event_is_set_on_response(self, approval_mgr):
+        """応答すると asyncio.Event がセットされ、待機中のタスクが決定を受け取る"""
+        approval_id = str(uuid.uuid4())
+
+        with patch.object(approval_mgr, '_send_to_session', return_value=True):
+            await approval_mgr.create_approval_request(approval_id, "test_tool", {}, "event-session")
+
+        event = approval_mgr.pending_approvals[approval_id]["event"]
+        waiter = asyncio.create_task(approval_mgr.wait_for_decision(approval_id, timeout=1.0))
+        await asyncio.sleep(0)
+        assert not event.is_set()
+
+        assert await approval_mgr.respond_to_approval(approval_id, True)
+        assert event.is_set()
+        assert await waiter
+        assert approval_id not in approval_mgr.pending_approvals
+
     @pytest.mark.asyncio
     async def test_respond_to_nonexistent_approval(self, approval_mgr):
         """存在しない承認要求への応答"""
@@ -339,6 +433,29 @@ class TestApprovalManager:
         await approval_mgr.unregister_websocket(session_id, ws2)
         assert session_id not in approval_mgr.session_websockets
 
+    @pytest.mark.asyncio
+    async def test_failed_send_unregisters_websocket(self, approval_mgr):
+        """送信に失敗した WebSocket は送信タスク側で登録解除される"""
+        session_id = "failing-ws-session"
+
+        class BrokenWebSocket:
+            async def send_text(self, text):
+                raise RuntimeError("connection closed")
+
+        ws = BrokenWebSocket()
+        await approval_mgr.register_websocket(session_id, ws)
+
+        # キューに積んだ時点では True を返す
+        assert await approval_mgr._send_to_session(session_id, {"type": "test"})
+        for _ in range(10):
+            if session_id not in approval_mgr.session_websockets:
+                break
+            await asyncio.sleep(0.01)
+
+        assert session_id not in approval_mgr.session_websockets
+        assert id(ws) not in approval_mgr._ws_senders
+        assert not await approval_mgr._send_to_session(session_id, {"type": "test"})
+
     @pytest.mark.asyncio
     async def test_send_to_session_no_websocket(self, approval_mgr):
         """WebSocketがないセッションへの送信"""
@@ -0,0 +1,75 @@
+"""
+ファイル閲覧 API のテスト
+
+moco/ui/api.py の /api/file エンドポイントのテスト
+- 作業ディレクトリ配下のファイル内容と行数を返すこと
+- 作業ディレクトリの外は 403 になること
+- 上限サイズ（MOCO_MAX_FILE_CONTENT_SIZE）を超えると 413、0 なら無制限、不正値なら既定値であること
+"""
+
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from moco.config import DEFAULT_MAX_FILE_CONTENT_SIZE, Settings, reload_settings
+from moco.ui.api import app
+
+
+class TestFileContentAPI:
+    """/api/file のテストクラス"""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        """作業ディレクトリを tmp_path にしたテストクライアント"""
+        monkeypatch.setenv("MOCO_WORKING_DIRECTORY", str(tmp_path))
+        yield TestClient(app)
+        monkeypatch.undo()
+        reload_settings()
+
+    def test_returns_content_and_line_count(self, client, tmp_path):
+        """ファイル内容と行数を返す"""
+        (tmp_path / "hello.txt").write_text("a\nb\nc", encoding="utf-8")
+
+        response = client.get("/api/file", params={"path": "hello.txt"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["content"] == "a\nb\nc"
+        assert data["line_count"] == 3
+
+    def test_outside_working_directory(self, client):
+        """作業ディレクトリ外へのアクセスは拒否する"""
+        response = client.get("/api/file", params={"path": "../../etc/passwd"})
+
+        assert response.status_code == 403
+
+    def test_too_large_file(self, client, tmp_path, monkeypatch):
+        """上限サイズを超えるファイルは 413"""
+        monkeypatch.setenv("MOCO_MAX_FILE_CONTENT_SIZE", "4")
+        reload_settings()
+        (tmp_path / "big.txt").write_text("12345", encoding="utf-8")
+
+        response = client.get("/api/file", params={"path": "big.txt"})
+
+        assert response.status_code == 413
+
+    def test_size_limit_disabled(self, client, tmp_path, monkeypatch):
+        """上限サイズ 0 なら大きさに関係なく返す"""
+        monkeypatch.setenv("MOCO_MAX_FILE_CONTENT_SIZE", "0")
+        reload_settings()
+        (tmp_path / "big.txt").write_text("12345", encoding="utf-8")
+
+        response = client.get("/api/file", params={"path": "big.txt"})
+
+        assert response.status_code == 200
+        assert response.json()["content"] == "12345"
+
+    def test_invalid_size_limit_falls_back_to_default(self, monkeypatch):
+        """MOCO_MAX_FILE_CONTENT_SIZE が不正値なら既定値を使う"""
+        monkeypatch.setenv("MOCO_MAX_FILE_CONTENT_SIZE", "10MB")
+
+        assert Settings.from_env().max_file_content_size == DEFAULT_MAX_FILE_CONTENT_SIZE